@@ -0,0 +1,130 @@
+"""
+設定の読み書きモジュール
+GUI版・CLI版で共通の設定を.envファイルに保存する
+"""
+
+import os
+import logging
+from dotenv import load_dotenv, set_key
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+env_file = os.path.join(script_dir, '.env')
+
+def load_settings():
+    """設定を.envファイルから読み込む"""
+    if os.path.exists(env_file):
+        load_dotenv(env_file)
+        return {
+            'input_file': os.getenv('INPUT_FILE', ''),
+            'output_dir': os.getenv('OUTPUT_DIR', ''),
+            'split_duration': int(os.getenv('SPLIT_DURATION', '90')),
+            'preserve_quality': os.getenv('PRESERVE_QUALITY', 'True').lower() == 'true',
+            'auto_open_folder': os.getenv('AUTO_OPEN_FOLDER', 'True').lower() == 'true',
+            'split_engine': os.getenv('SPLIT_ENGINE', 'reencode'),
+            'jobs': int(os.getenv('JOBS', str(os.cpu_count() or 1))),
+            'pcm_cache': os.getenv('PCM_CACHE', 'False').lower() == 'true',
+            'pcm_cache_mb': int(os.getenv('PCM_CACHE_MB', '10240')),
+            'batch_jobs': int(os.getenv('BATCH_JOBS', '2')),
+            'watch_dir': os.getenv('WATCH_DIR', ''),
+            'snap_window_sec': int(os.getenv('SNAP_WINDOW_SEC', '0')),
+            'split_mode': os.getenv('SPLIT_MODE', 'duration'),
+            'min_part_minutes': int(os.getenv('MIN_PART_MINUTES', '30')),
+            'max_part_minutes': int(os.getenv('MAX_PART_MINUTES', '90')),
+            'max_part_mb': int(os.getenv('MAX_PART_MB', '25')),
+            'cutlist_path': os.getenv('CUTLIST', ''),
+            'output_target': os.getenv('OUTPUT_TARGET', 'audio'),
+            'dataset_window_sec': float(os.getenv('DATASET_WINDOW_SEC', '10')),
+            'dataset_hop_sec': float(os.getenv('DATASET_HOP_SEC', '10')),
+            'dataset_sample_rate': int(os.getenv('DATASET_SAMPLE_RATE', '16000')),
+            'dataset_channels': int(os.getenv('DATASET_CHANNELS', '1')),
+            'dataset_shard_mb': int(os.getenv('DATASET_SHARD_MB', '256')),
+            'renditions': os.getenv('RENDITIONS', ''),
+            'output_format': os.getenv('OUTPUT_FORMAT', 'mp3'),
+            'output_bitrate': os.getenv('OUTPUT_BITRATE', ''),
+            'output_vbr_quality': os.getenv('OUTPUT_VBR_QUALITY', ''),
+            'output_speed': os.getenv('OUTPUT_SPEED', ''),
+            'match_source': os.getenv('MATCH_SOURCE', 'True').lower() == 'true',
+            'output_sample_rate': os.getenv('OUTPUT_SAMPLE_RATE', ''),
+            'output_channels': os.getenv('OUTPUT_CHANNELS', ''),
+            'encoder_preset': os.getenv('ENCODER_PRESET', 'balanced')
+        }
+    return {
+        'input_file': '',
+        'output_dir': '',
+        'split_duration': 90,
+        'preserve_quality': True,
+        'auto_open_folder': True,
+        'split_engine': 'reencode',
+        'jobs': os.cpu_count() or 1,
+        'pcm_cache': False,
+        'pcm_cache_mb': 10240,
+        'batch_jobs': 2,
+        'watch_dir': '',
+        'snap_window_sec': 0,
+        'split_mode': 'duration',
+        'min_part_minutes': 30,
+        'max_part_minutes': 90,
+        'max_part_mb': 25,
+        'cutlist_path': '',
+        'output_target': 'audio',
+        'dataset_window_sec': 10.0,
+        'dataset_hop_sec': 10.0,
+        'dataset_sample_rate': 16000,
+        'dataset_channels': 1,
+        'dataset_shard_mb': 256,
+        'renditions': '',
+        'output_format': 'mp3',
+        'output_bitrate': '',
+        'output_vbr_quality': '',
+        'output_speed': '',
+        'match_source': True,
+        'output_sample_rate': '',
+        'output_channels': '',
+        'encoder_preset': 'balanced'
+    }
+
+def save_settings(settings):
+    """設定を.envファイルに保存"""
+    try:
+        # .envファイルが存在しない場合は作成
+        if not os.path.exists(env_file):
+            with open(env_file, 'w', encoding='utf-8') as f:
+                pass
+        
+        # 設定を保存
+        set_key(env_file, 'INPUT_FILE', settings['input_file'])
+        set_key(env_file, 'OUTPUT_DIR', settings['output_dir'])
+        set_key(env_file, 'SPLIT_DURATION', str(settings['split_duration']))
+        set_key(env_file, 'PRESERVE_QUALITY', str(settings['preserve_quality']))
+        set_key(env_file, 'AUTO_OPEN_FOLDER', str(settings['auto_open_folder']))
+        set_key(env_file, 'SPLIT_ENGINE', settings['split_engine'])
+        set_key(env_file, 'JOBS', str(settings['jobs']))
+        set_key(env_file, 'PCM_CACHE', str(settings['pcm_cache']))
+        set_key(env_file, 'PCM_CACHE_MB', str(settings['pcm_cache_mb']))
+        set_key(env_file, 'BATCH_JOBS', str(settings['batch_jobs']))
+        set_key(env_file, 'WATCH_DIR', settings['watch_dir'])
+        set_key(env_file, 'SNAP_WINDOW_SEC', str(settings['snap_window_sec']))
+        set_key(env_file, 'SPLIT_MODE', settings['split_mode'])
+        set_key(env_file, 'MIN_PART_MINUTES', str(settings['min_part_minutes']))
+        set_key(env_file, 'MAX_PART_MINUTES', str(settings['max_part_minutes']))
+        set_key(env_file, 'MAX_PART_MB', str(settings['max_part_mb']))
+        set_key(env_file, 'CUTLIST', settings['cutlist_path'])
+        set_key(env_file, 'OUTPUT_TARGET', settings['output_target'])
+        set_key(env_file, 'DATASET_WINDOW_SEC', str(settings['dataset_window_sec']))
+        set_key(env_file, 'DATASET_HOP_SEC', str(settings['dataset_hop_sec']))
+        set_key(env_file, 'DATASET_SAMPLE_RATE', str(settings['dataset_sample_rate']))
+        set_key(env_file, 'DATASET_CHANNELS', str(settings['dataset_channels']))
+        set_key(env_file, 'DATASET_SHARD_MB', str(settings['dataset_shard_mb']))
+        set_key(env_file, 'RENDITIONS', settings['renditions'])
+        set_key(env_file, 'OUTPUT_FORMAT', settings['output_format'])
+        set_key(env_file, 'OUTPUT_BITRATE', settings['output_bitrate'])
+        set_key(env_file, 'OUTPUT_VBR_QUALITY', settings['output_vbr_quality'])
+        set_key(env_file, 'OUTPUT_SPEED', settings['output_speed'])
+        set_key(env_file, 'MATCH_SOURCE', str(settings['match_source']))
+        set_key(env_file, 'OUTPUT_SAMPLE_RATE', settings['output_sample_rate'])
+        set_key(env_file, 'OUTPUT_CHANNELS', settings['output_channels'])
+        set_key(env_file, 'ENCODER_PRESET', settings['encoder_preset'])
+        
+        logging.info("設定を.envファイルに保存しました")
+    except Exception as e:
+        logging.error(f"設定の保存に失敗: {str(e)}")
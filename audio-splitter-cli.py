@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+MP3音声ファイル分割ツール - CLI版
+GUI版と同じ分割エンジンを使い、進捗をJSON行形式で標準出力に出力する
+
+使用例:
+    audio-splitter-cli.py split input.mp3 -o out --minutes 90 --jobs 8
+    audio-splitter-cli.py split recordings/ "archive/*.mp3" -o out --batch-jobs 4
+    audio-splitter-cli.py watch inbox/ -o out
+"""
+
+import os
+import sys
+import json
+import signal
+import logging
+import argparse
+import threading
+
+import batch
+import encoders
+import split_engine
+import watch_folder
+from app_settings import load_settings
+from cancel_token import CancelToken
+
+
+# 一括処理では複数スレッドから出力するため、1行ずつ排他して書き出す
+_emit_lock = threading.Lock()
+
+
+def emit(event, **fields):
+    """進捗イベントをJSON 1行で標準出力に書き出す"""
+    line = json.dumps({'event': event, **fields}, ensure_ascii=False)
+    with _emit_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+def cancel_on_signals():
+    """Ctrl+C・SIGTERMで処理を中断し、SIGUSR1・SIGUSR2で一時停止・再開するトークンを作成"""
+    cancel = CancelToken()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: cancel.cancel())
+    # SIGUSR1・SIGUSR2の無いWindowsでは一時停止に対応しない
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: cancel.pause())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: cancel.resume())
+    return cancel
+
+
+def build_settings(args):
+    """.envの設定をデフォルトとして、コマンドライン引数で上書きした設定を作成"""
+    settings = load_settings()
+    overrides = {
+        'split_duration': args.minutes,
+        'split_engine': args.engine,
+        'jobs': args.jobs,
+        'preserve_quality': args.preserve_quality,
+        'pcm_cache': args.pcm_cache,
+        'batch_jobs': args.batch_jobs,
+        'snap_window_sec': args.snap_window,
+        'split_mode': args.mode,
+        'min_part_minutes': args.min_minutes,
+        'max_part_minutes': args.max_minutes,
+        'max_part_mb': args.max_mb,
+        'cutlist_path': args.cutlist,
+        'output_target': args.target,
+        'dataset_window_sec': args.window,
+        'dataset_hop_sec': args.hop,
+        'dataset_sample_rate': args.rate,
+        'dataset_channels': args.channels,
+        'dataset_shard_mb': args.shard_mb,
+        'renditions': args.renditions,
+        'output_format': args.format,
+        'output_bitrate': args.bitrate,
+        'output_vbr_quality': args.vbr_quality,
+        'output_speed': args.speed,
+        'match_source': args.match_source,
+        'output_sample_rate': args.sample_rate,
+        'output_channels': args.output_channels,
+        'encoder_preset': args.preset,
+    }
+    # カットリストを指定した場合は分割基準の指定が無くてもカットリストで分割する
+    if args.cutlist and args.mode is None:
+        overrides['split_mode'] = 'cutlist'
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+
+def settings_error(settings):
+    """分割設定の検証 (問題があればエラーメッセージを返す)"""
+    if settings['output_target'] == 'dataset':
+        if settings['dataset_window_sec'] <= 0 or settings['dataset_hop_sec'] <= 0:
+            return "窓の長さとホップ幅は0より大きく設定してください"
+        return None
+    try:
+        encoders.resolve(settings)
+        split_engine.parse_renditions(settings['renditions'])
+    except ValueError as e:
+        return str(e)
+    if settings['split_mode'] == 'silence':
+        if settings['max_part_minutes'] <= settings['min_part_minutes']:
+            return "パートの最長は最短より長く設定してください"
+    elif settings['split_mode'] == 'cutlist':
+        if not settings['cutlist_path'] or not os.path.isfile(settings['cutlist_path']):
+            return "カットリストが見つかりません"
+    elif settings['split_mode'] == 'size':
+        if settings['max_part_mb'] <= 0:
+            return "最大ファイルサイズは1MB以上で設定してください"
+    elif settings['split_duration'] <= 0:
+        return "分割時間は1分以上で設定してください"
+    return None
+
+
+def command_split(args):
+    """splitサブコマンド: 音声ファイルを分割 (複数指定・フォルダ・グロブは一括処理)"""
+    settings = build_settings(args)
+    error = settings_error(settings)
+    if error:
+        emit('error', message=error)
+        return 1
+
+    inputs = batch.expand_inputs(args.input)
+    if not inputs:
+        emit('error', message="対象の音声ファイルが見つかりません")
+        return 1
+    for input_path in inputs:
+        if not os.path.isfile(input_path):
+            emit('error', input=input_path, message="入力ファイルが見つかりません")
+            return 1
+
+    if len(args.input) > 1 or any(batch.is_batch_input(p) for p in args.input):
+        output_root = args.output or settings['output_dir'] or os.getcwd()
+        return run_batch(inputs, output_root, settings)
+    args.input = inputs[0]
+    output_path = args.output or settings['output_dir'] or os.path.dirname(os.path.abspath(args.input))
+
+    logging.info(f"分割処理開始 - 入力: {args.input}, 出力: {output_path}, 分割時間: {settings['split_duration']}分")
+    emit('start', input=args.input, output=output_path, engine=settings['split_engine'],
+         minutes=settings['split_duration'])
+    try:
+        total_chunks = split_engine.split_file(
+            args.input, output_path, settings,
+            lambda progress, text: emit('progress', input=args.input, percent=round(progress, 1), message=text),
+            cancel_on_signals()
+        )
+    except Exception as e:
+        logging.error(f"分割処理中にエラーが発生: {str(e)}", exc_info=True)
+        emit('error', input=args.input, message=str(e))
+        return 1
+    if total_chunks is None:
+        emit('cancelled', input=args.input)
+        return 130
+
+    emit('done', input=args.input, output=output_path, parts=total_chunks)
+    return 0
+
+
+def run_batch(inputs, output_root, settings):
+    """複数ファイルを一括処理し、ファイルごとの結果と集計を出力"""
+    emit('batch_start', files=len(inputs), output=output_root, batch_jobs=settings['batch_jobs'])
+    cancel = cancel_on_signals()
+    results = batch.run_batch(
+        inputs, output_root, settings,
+        lambda progress, text: emit('batch_progress', percent=round(progress, 1), message=text),
+        cancel,
+        lambda input_path, progress, text: emit('progress', input=input_path, percent=round(progress, 1),
+                                                message=text)
+    )
+    if cancel.cancelled:
+        emit('cancelled')
+        return 130
+
+    for result in results:
+        if result['status'] == 'done':
+            emit('done', input=result['input'], output=result['output'], parts=result['parts'])
+        else:
+            emit(result['status'], input=result['input'], message=result.get('error', ''))
+    summary = batch.summarize(results)
+    emit('summary', **summary)
+    return 0 if summary['error'] == 0 else 1
+
+
+def command_watch(args):
+    """watchサブコマンド: 監視フォルダに置かれた音声ファイルを自動で分割し続ける"""
+    settings = build_settings(args)
+    error = settings_error(settings)
+    if error:
+        emit('error', message=error)
+        return 1
+
+    watch_dir = args.watch_dir or settings['watch_dir']
+    if not watch_dir or not os.path.isdir(watch_dir):
+        emit('error', message="監視フォルダが見つかりません (引数または.envのWATCH_DIRで指定してください)")
+        return 1
+    output_root = args.output or settings['output_dir'] or watch_dir
+
+    daemon = watch_folder.WatchDaemon(watch_dir, output_root, settings, emit)
+    # SIGTERMでも処理中のジョブを中断して状態を保存してから終了する
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
+    except (OSError, RuntimeError) as e:
+        logging.error(f"監視中にエラーが発生: {str(e)}", exc_info=True)
+        emit('error', message=str(e))
+        return 1
+    emit('stopped')
+    return 0
+
+
+def add_split_options(parser):
+    """分割設定のオプションを追加 (split・watch共通)"""
+    parser.add_argument('--minutes', type=int, help="分割時間 (分)")
+    parser.add_argument('--mode', choices=list(split_engine.SPLIT_MODES), help="分割基準")
+    parser.add_argument('--min-minutes', type=int, help="無音位置で分割する場合のパートの最短 (分)")
+    parser.add_argument('--max-minutes', type=int, help="無音位置で分割する場合のパートの最長 (分)")
+    parser.add_argument('--max-mb', type=int, help="ファイルサイズ基準で分割する場合のパートの最大サイズ (MB)")
+    parser.add_argument('--cutlist', metavar='FILE', help="切り出す範囲のリスト (CSV・JSON・キューシート)")
+    parser.add_argument('--engine', choices=list(split_engine.SPLIT_ENGINES), help="分割方式")
+    parser.add_argument('--jobs', type=int, help="並列数")
+    parser.add_argument('--batch-jobs', type=int, help="同時に処理するファイル数")
+    parser.add_argument('--preserve-quality', action=argparse.BooleanOptionalAction, default=None,
+                        help="再エンコード時に高品質を保持 (入力と同じビットレート、入力が不明な場合はMP3で320kbps)")
+    parser.add_argument('--format', choices=list(encoders.ENCODERS), help="出力形式")
+    parser.add_argument('--bitrate', help="出力のビットレート (例: 96k、空欄でエンコーダの既定値)")
+    parser.add_argument('--vbr-quality', metavar='Q', help="出力のVBR品質 (MP3: 0〜9、AAC: 0.1〜2、指定時はビットレートより優先)")
+    parser.add_argument('--preset', choices=list(encoders.ENCODER_PRESETS),
+                        help="エンコーダプリセット (fast: 高速、balanced: 標準、archival: 高品質)")
+    parser.add_argument('--speed', metavar='LEVEL', help="エンコード速度の個別指定 (MP3・Opus・FLACの-compression_level、プリセットより優先)")
+    parser.add_argument('--match-source', action=argparse.BooleanOptionalAction, default=None,
+                        help="ビットレート未指定時に入力のビットレートに合わせる")
+    parser.add_argument('--sample-rate', metavar='HZ', help="出力のサンプリングレート (省略時は入力のまま)")
+    parser.add_argument('--output-channels', metavar='N', help="出力のチャンネル数 (省略時は入力のまま)")
+    parser.add_argument('--snap-window', type=int, metavar='SEC',
+                        help="分割位置の前後SEC秒で最も静かな位置で区切る (0で無効)")
+    parser.add_argument('--renditions', metavar='SPEC',
+                        help="1回のデコードで複数形式を同時出力 (例: mp3:320k,opus:64k:mono,wav:16000hz:mono)")
+    parser.add_argument('--target', choices=['audio', 'dataset'],
+                        help="書き出し先 (audio: 音声ファイル、dataset: 学習用の.npyシャードとJSON目次)")
+    parser.add_argument('--window', type=float, metavar='SEC', help="データセットの窓の長さ (秒)")
+    parser.add_argument('--hop', type=float, metavar='SEC', help="データセットの窓のホップ幅 (秒)")
+    parser.add_argument('--rate', type=int, help="データセットのサンプリングレート (Hz)")
+    parser.add_argument('--channels', type=int, help="データセットのチャンネル数")
+    parser.add_argument('--shard-mb', type=int, help="データセットの1シャードの最大サイズ (MB)")
+    parser.add_argument('--pcm-cache', action=argparse.BooleanOptionalAction, default=None,
+                        help="デコード結果をキャッシュ")
+
+
+def parse_args(argv):
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(prog='audio-splitter', description="音声ファイルを時間ごとに分割します")
+    parser.add_argument('-v', '--verbose', action='store_true', help="詳細なログを標準エラー出力に表示")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help="音声ファイルを分割")
+    split_parser.add_argument('input', nargs='+', help="入力ファイル・フォルダ・グロブ (複数指定で一括処理)")
+    split_parser.add_argument('-o', '--output', help="出力フォルダ (省略時は.envのOUTPUT_DIRまたは入力と同じフォルダ、"
+                                                     "一括処理ではファイルごとのサブフォルダを作成)")
+    add_split_options(split_parser)
+    split_parser.set_defaults(handler=command_split)
+
+    watch_parser = subparsers.add_parser('watch', help="監視フォルダに置かれた音声ファイルを自動で分割")
+    watch_parser.add_argument('watch_dir', nargs='?', help="監視フォルダ (省略時は.envのWATCH_DIR)")
+    watch_parser.add_argument('-o', '--output', help="出力フォルダ (省略時は.envのOUTPUT_DIRまたは監視フォルダ、"
+                                                     "ファイルごとのサブフォルダを作成)")
+    add_split_options(watch_parser)
+    watch_parser.set_defaults(handler=command_watch)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """メイン関数"""
+    args = parse_args(argv)
+    # 標準出力はJSON進捗専用のため、ログは標準エラー出力へ
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
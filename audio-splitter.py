@@ -11,21 +11,19 @@ import logging
 from pathlib import Path
 from tkinter import *
 from tkinter import ttk, filedialog, messagebox
-from pydub import AudioSegment
 import queue
 import time
 import subprocess
-import shutil
-import locale
-from dotenv import load_dotenv, set_key
-
-# システムのデフォルトエンコーディングを取得
-SYSTEM_ENCODING = locale.getpreferredencoding()
+import audio_probe
+import split_engine
+import encoders
+import batch
+import job_state
+from cancel_token import CancelToken
+from app_settings import script_dir, load_settings, save_settings
 
 # ロギングの設定
-script_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(script_dir, 'audio-splitter.log')
-env_file = os.path.join(script_dir, '.env')
 
 # 既存のログファイルを削除
 if os.path.exists(log_file):
@@ -46,62 +44,8 @@ logging.basicConfig(
 
 logging.info(f"ログファイルを作成しました: {log_file}")
 
-def load_settings():
-    """設定を.envファイルから読み込む"""
-    if os.path.exists(env_file):
-        load_dotenv(env_file)
-        return {
-            'input_file': os.getenv('INPUT_FILE', ''),
-            'output_dir': os.getenv('OUTPUT_DIR', ''),
-            'split_duration': int(os.getenv('SPLIT_DURATION', '90')),
-            'preserve_quality': os.getenv('PRESERVE_QUALITY', 'True').lower() == 'true',
-            'auto_open_folder': os.getenv('AUTO_OPEN_FOLDER', 'True').lower() == 'true'
-        }
-    return {
-        'input_file': '',
-        'output_dir': '',
-        'split_duration': 90,
-        'preserve_quality': True,
-        'auto_open_folder': True
-    }
-
-def save_settings(settings):
-    """設定を.envファイルに保存"""
-    try:
-        # .envファイルが存在しない場合は作成
-        if not os.path.exists(env_file):
-            with open(env_file, 'w', encoding='utf-8') as f:
-                pass
-        
-        # 設定を保存
-        set_key(env_file, 'INPUT_FILE', settings['input_file'])
-        set_key(env_file, 'OUTPUT_DIR', settings['output_dir'])
-        set_key(env_file, 'SPLIT_DURATION', str(settings['split_duration']))
-        set_key(env_file, 'PRESERVE_QUALITY', str(settings['preserve_quality']))
-        set_key(env_file, 'AUTO_OPEN_FOLDER', str(settings['auto_open_folder']))
-        
-        logging.info("設定を.envファイルに保存しました")
-    except Exception as e:
-        logging.error(f"設定の保存に失敗: {str(e)}")
-
-def check_ffmpeg():
-    """FFmpegが利用可能かチェック"""
-    try:
-        ffmpeg_path = shutil.which('ffmpeg')
-        if not ffmpeg_path:
-            logging.error("FFmpegが見つかりません")
-            return False
-        
-        result = subprocess.run([ffmpeg_path, '-version'], 
-                              capture_output=True, 
-                              encoding=SYSTEM_ENCODING,
-                              errors='replace',
-                              check=True)
-        logging.info(f"FFmpegバージョン: {result.stdout.split('\\n')[0]}")
-        return True
-    except (subprocess.SubprocessError, FileNotFoundError) as e:
-        logging.error(f"FFmpegの確認に失敗: {str(e)}")
-        return False
+# 入力欄の変更が止まってから情報を取得するまでの待ち時間 (ミリ秒)
+PROBE_DEBOUNCE_MS = 300
 
 class AudioSplitterGUI:
     def __init__(self, root):
@@ -114,16 +58,24 @@ class AudioSplitterGUI:
         self.check_progress()
         
         # FFmpegの確認
-        if not check_ffmpeg():
+        if not split_engine.check_ffmpeg():
             messagebox.showerror("エラー", "FFmpegがインストールされていないか、パスが通っていません。\nFFmpegをインストールしてから再起動してください。")
             self.root.destroy()
             return
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # .envから読み込んだ入力ファイルの情報を表示
+        if self.input_file.get():
+            self.on_input_file_change()
+        
+        # 前回完了しなかったジョブがあれば再開を確認
+        self.offer_resume()
     
     def setup_window(self):
         """ウィンドウの基本設定"""
         self.root.title("Audio Splitter")
-        self.root.geometry("600x700")  # 縦幅を480から700に変更
-        self.root.minsize(600, 700)    # 最小サイズも設定
+        self.root.geometry("640x800")  # 設定項目はタブに分けて縦幅を抑える
+        self.root.minsize(640, 760)    # 最小サイズも設定
         self.root.resizable(True, True)
         
         # アイコンとスタイル設定
@@ -153,7 +105,32 @@ class AudioSplitterGUI:
         self.split_duration = IntVar(value=settings['split_duration'])
         self.preserve_quality = BooleanVar(value=settings['preserve_quality'])
         self.auto_open_folder = BooleanVar(value=settings['auto_open_folder'])
+        self.split_engine = StringVar(value=settings['split_engine'] if settings['split_engine'] in split_engine.SPLIT_ENGINES else 'reencode')
+        self.jobs = IntVar(value=settings['jobs'])
+        self.pcm_cache = BooleanVar(value=settings['pcm_cache'])
+        self.pcm_cache_mb = settings['pcm_cache_mb']
+        self.batch_jobs = IntVar(value=settings['batch_jobs'])
+        self.watch_dir = settings['watch_dir']
+        self.snap_window_sec = IntVar(value=settings['snap_window_sec'])
+        self.split_mode = StringVar(value=settings['split_mode'] if settings['split_mode'] in split_engine.SPLIT_MODES else 'duration')
+        self.min_part_minutes = IntVar(value=settings['min_part_minutes'])
+        self.max_part_minutes = IntVar(value=settings['max_part_minutes'])
+        self.max_part_mb = IntVar(value=settings['max_part_mb'])
+        self.cutlist_path = StringVar(value=settings['cutlist_path'])
+        self.renditions = StringVar(value=settings['renditions'])
+        self.output_format = StringVar(value=settings['output_format'] if settings['output_format'] in encoders.ENCODERS else 'mp3')
+        self.encoder_preset = StringVar(value=settings['encoder_preset'] if settings['encoder_preset'] in encoders.ENCODER_PRESETS else 'balanced')
+        # ビットレート・VBR品質・速度プリセット・サンプリングレートなどは.envで設定し、そのまま引き継ぐ
+        self.encoder_settings = {key: settings[key] for key in ('output_bitrate', 'output_vbr_quality', 'output_speed',
+                                                                'match_source', 'output_sample_rate', 'output_channels')}
+        self.export_dataset = BooleanVar(value=settings['output_target'] == 'dataset')
+        self.dataset_settings = {key: value for key, value in settings.items() if key.startswith('dataset_')}
         self.current_operation = None
+        self.cancel_token = None
+        self.saved_job = job_state.SavedJob(os.path.join(script_dir, job_state.JOB_FILENAME))
+        self.closing = False
+        self._probe_generation = 0
+        self._probe_after_id = None
     
     def setup_ui(self):
         """UIコンポーネントの作成"""
@@ -185,6 +162,10 @@ class AudioSplitterGUI:
         self.input_entry.grid(row=0, column=0, sticky=(W, E), padx=(0, 10))
         
         ttk.Button(input_frame, text="📁 選択", command=self.select_input_file).grid(row=0, column=1)
+        ttk.Button(input_frame, text="📂 フォルダ", command=self.select_input_folder).grid(row=0, column=2, padx=(5, 0))
+        
+        ttk.Label(input_frame, text="複数ファイルは「;」区切り、フォルダやワイルドカード (*.mp3) 指定で一括処理",
+                  style='Info.TLabel').grid(row=1, column=0, columnspan=3, sticky=W, pady=(3, 0))
         row += 1
         
         # 出力フォルダ選択
@@ -201,10 +182,15 @@ class AudioSplitterGUI:
         ttk.Button(output_frame, text="📁 選択", command=self.select_output_dir).grid(row=0, column=1)
         row += 1
         
-        # 設定セクション
-        settings_frame = ttk.LabelFrame(main_frame, text="分割設定", padding="15")
-        settings_frame.grid(row=row, column=0, columnspan=3, sticky=(W, E), pady=(0, 15))
+        # 設定セクション (項目が多く縦に収まらないため、分割設定と出力設定をタブに分ける)
+        settings_notebook = ttk.Notebook(main_frame)
+        settings_notebook.grid(row=row, column=0, columnspan=3, sticky=(W, E), pady=(0, 15))
+        settings_frame = ttk.Frame(settings_notebook, padding="15")
         settings_frame.columnconfigure(1, weight=1)
+        settings_notebook.add(settings_frame, text="分割設定")
+        output_settings_frame = ttk.Frame(settings_notebook, padding="15")
+        output_settings_frame.columnconfigure(1, weight=1)
+        settings_notebook.add(output_settings_frame, text="出力設定")
         row += 1
         
         # 分割時間設定
@@ -213,8 +199,8 @@ class AudioSplitterGUI:
         duration_frame = ttk.Frame(settings_frame)
         duration_frame.grid(row=0, column=1, sticky=(W, E), pady=5, padx=(10, 0))
         
-        duration_spinbox = ttk.Spinbox(duration_frame, from_=1, to=300, width=8, textvariable=self.split_duration)
-        duration_spinbox.grid(row=0, column=0, sticky=W)
+        self.duration_spinbox = ttk.Spinbox(duration_frame, from_=1, to=300, width=8, textvariable=self.split_duration)
+        self.duration_spinbox.grid(row=0, column=0, sticky=W)
         
         ttk.Label(duration_frame, text="分", style='Info.TLabel').grid(row=0, column=1, sticky=W, padx=(5, 0))
         
@@ -226,16 +212,140 @@ class AudioSplitterGUI:
         ttk.Button(preset_frame, text="60分", width=6, command=lambda: self.split_duration.set(60)).grid(row=0, column=1, padx=2)
         ttk.Button(preset_frame, text="90分", width=6, command=lambda: self.split_duration.set(90)).grid(row=0, column=2, padx=2)
         
+        # 分割基準設定
+        ttk.Label(settings_frame, text="分割基準:").grid(row=1, column=0, sticky=W, pady=5)
+        
+        mode_frame = ttk.Frame(settings_frame)
+        mode_frame.grid(row=1, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        
+        self.mode_combo = ttk.Combobox(mode_frame, state='readonly', width=28,
+                                       values=list(split_engine.SPLIT_MODES.values()))
+        self.mode_combo.set(split_engine.SPLIT_MODES[self.split_mode.get()])
+        self.mode_combo.grid(row=0, column=0, sticky=W)
+        self.mode_combo.bind('<<ComboboxSelected>>', self.on_split_mode_change)
+        
+        self.min_part_spinbox = ttk.Spinbox(mode_frame, from_=1, to=600, width=5, textvariable=self.min_part_minutes)
+        self.min_part_spinbox.grid(row=0, column=1, sticky=W, padx=(10, 0))
+        ttk.Label(mode_frame, text="〜", style='Info.TLabel').grid(row=0, column=2, padx=3)
+        self.max_part_spinbox = ttk.Spinbox(mode_frame, from_=1, to=600, width=5, textvariable=self.max_part_minutes)
+        self.max_part_spinbox.grid(row=0, column=3, sticky=W)
+        ttk.Label(mode_frame, text="分", style='Info.TLabel').grid(row=0, column=4, sticky=W, padx=(5, 0))
+        self.max_size_spinbox = ttk.Spinbox(mode_frame, from_=1, to=10000, width=6, textvariable=self.max_part_mb)
+        self.max_size_spinbox.grid(row=0, column=5, sticky=W, padx=(15, 0))
+        ttk.Label(mode_frame, text="MB", style='Info.TLabel').grid(row=0, column=6, sticky=W, padx=(5, 0))
+        
+        # カットリスト設定
+        ttk.Label(settings_frame, text="カットリスト:").grid(row=2, column=0, sticky=W, pady=5)
+        
+        cutlist_frame = ttk.Frame(settings_frame)
+        cutlist_frame.grid(row=2, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        cutlist_frame.columnconfigure(0, weight=1)
+        
+        self.cutlist_entry = ttk.Entry(cutlist_frame, textvariable=self.cutlist_path)
+        self.cutlist_entry.grid(row=0, column=0, sticky=(W, E), padx=(0, 10))
+        self.cutlist_button = ttk.Button(cutlist_frame, text="📁 選択", command=self.select_cutlist)
+        self.cutlist_button.grid(row=0, column=1)
+        
+        # 分割エンジン設定
+        ttk.Label(settings_frame, text="分割方式:").grid(row=3, column=0, sticky=W, pady=5)
+        
+        self.engine_combo = ttk.Combobox(settings_frame, state='readonly', width=30,
+                                         values=list(split_engine.SPLIT_ENGINES.values()))
+        self.engine_combo.set(split_engine.SPLIT_ENGINES[self.split_engine.get()])
+        self.engine_combo.grid(row=3, column=1, sticky=W, pady=5, padx=(10, 0))
+        self.engine_combo.bind('<<ComboboxSelected>>', self.on_engine_change)
+        
+        # 並列数設定
+        ttk.Label(settings_frame, text="並列数:").grid(row=4, column=0, sticky=W, pady=5)
+        
+        jobs_frame = ttk.Frame(settings_frame)
+        jobs_frame.grid(row=4, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        
+        self.jobs_spinbox = ttk.Spinbox(jobs_frame, from_=1, to=64, width=8, textvariable=self.jobs)
+        self.jobs_spinbox.grid(row=0, column=0, sticky=W)
+        
+        ttk.Label(jobs_frame, text="プロセス (ストリームコピー・並列再エンコード・クリップ抽出時)", style='Info.TLabel').grid(row=0, column=1, sticky=W, padx=(5, 0))
+        
+        # 一括処理の同時実行数設定
+        ttk.Label(settings_frame, text="同時処理:").grid(row=5, column=0, sticky=W, pady=5)
+        
+        batch_frame = ttk.Frame(settings_frame)
+        batch_frame.grid(row=5, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        
+        ttk.Spinbox(batch_frame, from_=1, to=32, width=8, textvariable=self.batch_jobs).grid(row=0, column=0, sticky=W)
+        
+        ttk.Label(batch_frame, text="ファイル (一括処理時)", style='Info.TLabel').grid(row=0, column=1, sticky=W, padx=(5, 0))
+        
+        # 分割位置を無音に合わせる範囲の設定
+        ttk.Label(settings_frame, text="無音調整:").grid(row=6, column=0, sticky=W, pady=5)
+        
+        snap_frame = ttk.Frame(settings_frame)
+        snap_frame.grid(row=6, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        
+        self.snap_spinbox = ttk.Spinbox(snap_frame, from_=0, to=300, width=8, textvariable=self.snap_window_sec)
+        self.snap_spinbox.grid(row=0, column=0, sticky=W)
+        
+        ttk.Label(snap_frame, text="秒 (分割位置の前後で最も静かな位置で区切る、0で無効)", style='Info.TLabel').grid(row=0, column=1, sticky=W, padx=(5, 0))
+        self.update_mode_options()
+        
+        # 出力形式設定
+        ttk.Label(output_settings_frame, text="出力形式:").grid(row=0, column=0, sticky=W, pady=5)
+        
+        format_frame = ttk.Frame(output_settings_frame)
+        format_frame.grid(row=0, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        
+        self.format_combo = ttk.Combobox(format_frame, state='readonly', width=30,
+                                         values=[encoder['label'] for encoder in encoders.ENCODERS.values()])
+        self.format_combo.set(encoders.ENCODERS[self.output_format.get()]['label'])
+        self.format_combo.grid(row=0, column=0, sticky=W)
+        self.format_combo.bind('<<ComboboxSelected>>', self.on_format_change)
+        
+        ttk.Label(format_frame, text="(ビットレート・VBR品質・速度は.envで設定)", style='Info.TLabel').grid(row=0, column=1, sticky=W, padx=(5, 0))
+        
+        # エンコーダプリセット設定
+        ttk.Label(output_settings_frame, text="エンコード:").grid(row=1, column=0, sticky=W, pady=5)
+        
+        preset_frame = ttk.Frame(output_settings_frame)
+        preset_frame.grid(row=1, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        
+        self.preset_combo = ttk.Combobox(preset_frame, state='readonly', width=30,
+                                         values=list(encoders.ENCODER_PRESETS.values()))
+        self.preset_combo.set(encoders.ENCODER_PRESETS[self.encoder_preset.get()])
+        self.preset_combo.grid(row=0, column=0, sticky=W)
+        self.preset_combo.bind('<<ComboboxSelected>>', self.on_preset_change)
+        
+        ttk.Label(preset_frame, text="(高速ほどエンコード時間が短く、音質はわずかに下がります)", style='Info.TLabel').grid(row=0, column=1, sticky=W, padx=(5, 0))
+        
+        # 同時出力設定
+        ttk.Label(output_settings_frame, text="同時出力:").grid(row=2, column=0, sticky=W, pady=5)
+        
+        renditions_frame = ttk.Frame(output_settings_frame)
+        renditions_frame.grid(row=2, column=1, sticky=(W, E), pady=5, padx=(10, 0))
+        renditions_frame.columnconfigure(0, weight=1)
+        
+        ttk.Entry(renditions_frame, textvariable=self.renditions).grid(row=0, column=0, sticky=(W, E))
+        ttk.Label(renditions_frame, text="例: mp3:320k,opus:64k:mono,wav:16000hz:mono (1回のデコードで形式ごとのフォルダに出力、空欄で無効)",
+                  style='Info.TLabel').grid(row=1, column=0, sticky=W, pady=(3, 0))
+        
         # オプション設定
-        options_frame = ttk.Frame(settings_frame)
-        options_frame.grid(row=1, column=0, columnspan=2, sticky=(W, E), pady=(10, 0))
+        options_frame = ttk.Frame(output_settings_frame)
+        options_frame.grid(row=3, column=0, columnspan=2, sticky=(W, E), pady=(10, 0))
         
-        ttk.Checkbutton(options_frame, text="高品質を保持 (処理時間が長くなります)", 
-                       variable=self.preserve_quality).grid(row=0, column=0, sticky=W)
+        self.quality_check = ttk.Checkbutton(options_frame, text="高品質を保持 (入力と同じビットレートで書き出します)", 
+                                             variable=self.preserve_quality)
+        self.quality_check.grid(row=0, column=0, sticky=W)
+        self.update_engine_options()
         
         ttk.Checkbutton(options_frame, text="完了後に出力フォルダを開く", 
                        variable=self.auto_open_folder).grid(row=1, column=0, sticky=W, pady=(5, 0))
         
+        self.pcm_cache_check = ttk.Checkbutton(options_frame, text="デコード結果をキャッシュ (同じファイルの再分割を高速化)", 
+                                               variable=self.pcm_cache)
+        self.pcm_cache_check.grid(row=2, column=0, sticky=W, pady=(5, 0))
+        
+        ttk.Checkbutton(options_frame, text="学習用データセット (.npy) として書き出す (窓の長さなどは.envで設定)", 
+                       variable=self.export_dataset).grid(row=3, column=0, sticky=W, pady=(5, 0))
+        
         # ファイル情報表示
         self.info_frame = ttk.LabelFrame(main_frame, text="ファイル情報", padding="15")
         self.info_frame.grid(row=row, column=0, columnspan=3, sticky=(W, E), pady=(0, 15))
@@ -266,9 +376,13 @@ class AudioSplitterGUI:
                                       style='Accent.TButton')
         self.start_button.grid(row=0, column=0, padx=(0, 10))
         
+        self.pause_button = ttk.Button(button_frame, text="⏸ 一時停止", command=self.toggle_pause, 
+                                      state='disabled')
+        self.pause_button.grid(row=0, column=1, padx=(0, 10))
+        
         self.cancel_button = ttk.Button(button_frame, text="❌ キャンセル", command=self.cancel_operation, 
                                        state='disabled')
-        self.cancel_button.grid(row=0, column=1)
+        self.cancel_button.grid(row=0, column=2)
         
         # 入力ファイル変更時のイベント
         self.input_file.trace('w', self.on_input_file_change)
@@ -276,13 +390,14 @@ class AudioSplitterGUI:
     def select_input_file(self):
         """入力ファイル選択"""
         logging.debug("ファイル選択ダイアログを表示")
-        filename = filedialog.askopenfilename(
-            title="MP3ファイルを選択",
+        filenames = filedialog.askopenfilenames(
+            title="MP3ファイルを選択 (複数選択で一括処理)",
             filetypes=[("MP3ファイル", "*.mp3"), ("音声ファイル", "*.mp3 *.wav *.m4a"), ("すべてのファイル", "*.*")]
         )
-        if filename:
-            logging.info(f"入力ファイルを選択: {filename}")
-            self.input_file.set(filename)
+        if filenames:
+            filename = filenames[0]
+            logging.info(f"入力ファイルを選択: {', '.join(filenames)}")
+            self.input_file.set(f"{batch.INPUT_SEPARATOR} ".join(filenames))
             # 出力フォルダが未設定の場合、入力ファイルと同じフォルダを設定
             if not self.output_dir.get():
                 self.output_dir.set(os.path.dirname(filename))
@@ -290,6 +405,16 @@ class AudioSplitterGUI:
             # 設定を保存
             self.save_current_settings()
     
+    def select_input_folder(self):
+        """入力フォルダ選択 (フォルダ内の音声ファイルを一括処理)"""
+        directory = filedialog.askdirectory(title="一括処理するフォルダを選択")
+        if directory:
+            logging.info(f"入力フォルダを選択: {directory}")
+            self.input_file.set(directory)
+            if not self.output_dir.get():
+                self.output_dir.set(directory)
+            self.save_current_settings()
+    
     def select_output_dir(self):
         """出力フォルダ選択"""
         directory = filedialog.askdirectory(title="出力フォルダを選択")
@@ -298,98 +423,230 @@ class AudioSplitterGUI:
             # 設定を保存
             self.save_current_settings()
     
+    def select_cutlist(self):
+        """カットリスト選択"""
+        filename = filedialog.askopenfilename(
+            title="カットリストを選択",
+            filetypes=[("カットリスト", "*.csv *.json *.cue"), ("すべてのファイル", "*.*")]
+        )
+        if filename:
+            self.cutlist_path.set(filename)
+    
+    def on_engine_change(self, event=None):
+        """分割方式変更時の処理"""
+        label = self.engine_combo.get()
+        for engine, engine_label in split_engine.SPLIT_ENGINES.items():
+            if engine_label == label:
+                self.split_engine.set(engine)
+                break
+        logging.debug(f"分割方式を変更: {self.split_engine.get()}")
+        self.update_engine_options()
+        self.save_current_settings()
+    
+    def on_format_change(self, event=None):
+        """出力形式変更時の処理"""
+        label = self.format_combo.get()
+        for output_format, encoder in encoders.ENCODERS.items():
+            if encoder['label'] == label:
+                self.output_format.set(output_format)
+                break
+        logging.debug(f"出力形式を変更: {self.output_format.get()}")
+        self.update_engine_options()
+        self.save_current_settings()
+    
+    def on_preset_change(self, event=None):
+        """エンコーダプリセット変更時の処理"""
+        label = self.preset_combo.get()
+        for preset, preset_label in encoders.ENCODER_PRESETS.items():
+            if preset_label == label:
+                self.encoder_preset.set(preset)
+                break
+        logging.debug(f"エンコーダプリセットを変更: {self.encoder_preset.get()}")
+        self.save_current_settings()
+    
+    def update_engine_options(self):
+        """分割方式に応じてオプションの有効/無効を切り替え"""
+        # ストリームコピー・フレーム分割 (MP3出力時) は再エンコードせず、可逆・非圧縮の形式はビットレートが無いため品質設定は無関係
+        output_format = self.output_format.get()
+        if ((self.split_engine.get() in split_engine.PASSTHROUGH_ENGINES and output_format == 'mp3')
+                or encoders.ENCODERS[output_format]['high_bitrate'] is None):
+            self.quality_check.config(state='disabled')
+        else:
+            self.quality_check.config(state='normal')
+        
+        # キャッシュはデコードを伴う方式でのみ有効
+        if self.split_engine.get() in ('reencode', 'stream', 'clips'):
+            self.pcm_cache_check.config(state='normal')
+        else:
+            self.pcm_cache_check.config(state='disabled')
+        
+        # 並列数はパートごとにFFmpegを起動する方式でのみ有効
+        if self.split_engine.get() in ('copy', 'parallel', 'clips'):
+            self.jobs_spinbox.config(state='normal')
+        else:
+            self.jobs_spinbox.config(state='disabled')
+    
+    def on_split_mode_change(self, event=None):
+        """分割基準の選択変更時の処理"""
+        label = self.mode_combo.get()
+        for key, value in split_engine.SPLIT_MODES.items():
+            if value == label:
+                self.split_mode.set(key)
+                break
+        self.update_mode_options()
+    
+    def update_mode_options(self):
+        """分割基準に応じて設定項目の有効/無効を切り替え"""
+        # 無音位置で分割する場合は分割時間の代わりにパートの長さの範囲を使う
+        # ファイルサイズ基準の場合は最大サイズだけを使う
+        mode = self.split_mode.get()
+        self.duration_spinbox.config(state='normal' if mode == 'duration' else 'disabled')
+        self.snap_spinbox.config(state='normal' if mode == 'duration' else 'disabled')
+        self.min_part_spinbox.config(state='normal' if mode == 'silence' else 'disabled')
+        self.max_part_spinbox.config(state='normal' if mode == 'silence' else 'disabled')
+        self.max_size_spinbox.config(state='normal' if mode == 'size' else 'disabled')
+        self.cutlist_entry.config(state='normal' if mode == 'cutlist' else 'disabled')
+        self.cutlist_button.config(state='normal' if mode == 'cutlist' else 'disabled')
+    
     def on_input_file_change(self, *args):
-        """入力ファイル変更時の処理"""
+        """入力ファイル変更時の処理 (入力が落ち着いてからバックグラウンドで情報を取得)"""
+        # 古いパスに対する取得処理は世代番号の更新で中断させる
+        self._probe_generation += 1
+        if self._probe_after_id is not None:
+            self.root.after_cancel(self._probe_after_id)
+        self._probe_after_id = self.root.after(PROBE_DEBOUNCE_MS, self.start_probe)
+    
+    def start_probe(self):
+        """ファイル情報の取得をバックグラウンドで開始"""
+        self._probe_after_id = None
         filepath = self.input_file.get()
-        if filepath and os.path.exists(filepath):
-            try:
-                logging.debug(f"音声ファイルの情報を読み込み開始: {filepath}")
-                # ファイル名をエンコード
-                encoded_path = str(Path(filepath).resolve())
-                logging.debug(f"エンコードされたパス: {encoded_path}")
-                
-                # 一時ファイルを作成
-                temp_dir = os.path.join(script_dir, 'temp')
-                os.makedirs(temp_dir, exist_ok=True)
-                temp_file = os.path.join(temp_dir, 'temp_audio.wav')
-                
-                # FFmpegで変換
-                ffmpeg_cmd = [
-                    'ffmpeg', '-y',
-                    '-i', encoded_path,
-                    '-acodec', 'pcm_s16le',
-                    '-vn',
-                    '-f', 'wav',
-                    temp_file
-                ]
-                logging.debug(f"FFmpegコマンド: {' '.join(ffmpeg_cmd)}")
-                
-                result = subprocess.run(ffmpeg_cmd, 
-                                     capture_output=True, 
-                                     encoding=SYSTEM_ENCODING,
-                                     errors='replace',
-                                     check=True)
-                logging.debug(f"FFmpeg出力: {result.stdout}")
-                
-                # 変換したファイルを読み込み
-                audio = AudioSegment.from_file(temp_file)
-                duration_seconds = len(audio) / 1000
-                duration_minutes = duration_seconds / 60
-                duration_hours = duration_minutes / 60
-                
-                file_size = os.path.getsize(filepath) / (1024 * 1024)  # MB
-                
-                if duration_hours >= 1:
-                    duration_text = f"{int(duration_hours)}時間{int(duration_minutes % 60)}分"
-                else:
-                    duration_text = f"{int(duration_minutes)}分{int(duration_seconds % 60)}秒"
-                
-                info_text = f"📊 再生時間: {duration_text} | ファイルサイズ: {file_size:.1f}MB"
-                self.info_label.config(text=info_text)
-                logging.info(f"音声ファイル情報取得成功 - 再生時間: {duration_text}, サイズ: {file_size:.1f}MB")
-                
-                # 一時ファイルを削除
-                try:
-                    os.remove(temp_file)
-                except Exception as e:
-                    logging.warning(f"一時ファイルの削除に失敗: {str(e)}")
-                
-            except subprocess.CalledProcessError as e:
-                error_msg = f"FFmpegの処理に失敗: {e.stderr}"
-                logging.error(error_msg)
-                self.info_label.config(text="⚠️ ファイル情報を読み取れませんでした")
-                messagebox.showerror("エラー", error_msg)
-            except Exception as e:
-                logging.error(f"ファイル情報の読み取りに失敗: {str(e)}", exc_info=True)
-                self.info_label.config(text="⚠️ ファイル情報を読み取れませんでした")
-                messagebox.showerror("エラー", f"ファイルの読み取りに失敗しました：\n{str(e)}")
+        if batch.is_batch_input(filepath):
+            probe_thread = threading.Thread(target=self.batch_probe_thread, args=(filepath, self._probe_generation))
+            probe_thread.daemon = True
+            probe_thread.start()
+        elif filepath and os.path.isfile(filepath):
+            self.info_label.config(text="⏳ ファイル情報を読み込み中...")
+            probe_thread = threading.Thread(target=self.probe_thread, args=(filepath, self._probe_generation))
+            probe_thread.daemon = True
+            probe_thread.start()
         else:
             self.info_label.config(text="ファイルを選択してください")
             logging.debug("ファイルが選択されていないか、存在しません")
     
+    def probe_thread(self, filepath, generation):
+        """ファイル情報の取得（バックグラウンド）"""
+        try:
+            logging.debug(f"音声ファイルの情報を読み込み開始: {filepath}")
+            # ファイル名をエンコード
+            encoded_path = str(Path(filepath).resolve())
+            logging.debug(f"エンコードされたパス: {encoded_path}")
+            
+            # ヘッダ情報のみを読み取る (デコードしない)
+            info = audio_probe.probe(encoded_path, lambda: generation != self._probe_generation)
+            duration_seconds = info['duration_ms'] / 1000
+            duration_minutes = duration_seconds / 60
+            duration_hours = duration_minutes / 60
+            
+            file_size = os.path.getsize(filepath) / (1024 * 1024)  # MB
+            
+            if duration_hours >= 1:
+                duration_text = f"{int(duration_hours)}時間{int(duration_minutes % 60)}分"
+            else:
+                duration_text = f"{int(duration_minutes)}分{int(duration_seconds % 60)}秒"
+            
+            info_text = f"📊 再生時間: {duration_text} | ファイルサイズ: {file_size:.1f}MB"
+            format_text = audio_probe.format_info(info)
+            if format_text:
+                info_text += f"\n🎧 {format_text}"
+            logging.info(f"音声ファイル情報取得成功 - 再生時間: {duration_text}, サイズ: {file_size:.1f}MB, 形式: {format_text}")
+            self.progress_queue.put(("file_info", generation, info_text, None))
+            
+        except audio_probe.ProbeCancelled:
+            logging.debug(f"古いパスの情報取得を中断しました: {filepath}")
+        except subprocess.CalledProcessError as e:
+            error_msg = f"FFprobeの処理に失敗: {e.stderr}"
+            logging.error(error_msg)
+            self.progress_queue.put(("file_info", generation, "⚠️ ファイル情報を読み取れませんでした", error_msg))
+        except Exception as e:
+            logging.error(f"ファイル情報の読み取りに失敗: {str(e)}", exc_info=True)
+            self.progress_queue.put(("file_info", generation, "⚠️ ファイル情報を読み取れませんでした",
+                                     f"ファイルの読み取りに失敗しました：\n{str(e)}"))
+    
+    def batch_probe_thread(self, patterns, generation):
+        """一括処理の対象ファイル数を取得（バックグラウンド）"""
+        try:
+            inputs = batch.expand_inputs(batch.split_patterns(patterns))
+            if inputs:
+                total_size = sum(os.path.getsize(p) for p in inputs if os.path.isfile(p)) / (1024 * 1024)
+                info_text = f"📚 一括処理: {len(inputs)}件のファイル | 合計サイズ: {total_size:.1f}MB"
+            else:
+                info_text = "⚠️ 対象の音声ファイルが見つかりません"
+            self.progress_queue.put(("file_info", generation, info_text, None))
+        except Exception as e:
+            # 確認中に削除されたファイル・読めないフォルダなどで情報表示が止まらないようにする
+            logging.error(f"一括処理の対象ファイルの確認に失敗: {str(e)}", exc_info=True)
+            self.progress_queue.put(("file_info", generation, "⚠️ 対象ファイルを確認できませんでした",
+                                     f"一括処理の対象ファイルの確認に失敗しました：\n{str(e)}"))
+    
     def start_splitting(self):
         """分割処理開始"""
         if not self.validate_inputs():
             return
         
+        if batch.is_batch_input(self.input_file.get()):
+            self.start_operation(self.batch_split_thread)
+        else:
+            # 単一ファイルの処理は一時停止中の終了や異常終了の後も続きから再開できるよう状態を保存する
+            self.saved_job.start(self.input_file.get(), self.output_dir.get(), self.current_settings())
+            self.start_operation(self.split_audio_thread)
+    
+    def start_operation(self, target):
+        """UIを処理中の状態にしてバックグラウンドで処理を実行"""
         # UI状態変更
         self.start_button.config(state='disabled')
+        self.pause_button.config(state='normal', text="⏸ 一時停止")
         self.cancel_button.config(state='normal')
         self.progress_bar.config(value=0)
         self.progress_label.config(text="準備中...")
         
         # バックグラウンドで処理実行
-        self.current_operation = threading.Thread(target=self.split_audio_thread)
+        self.cancel_token = CancelToken()
+        self.current_operation = threading.Thread(target=target)
         self.current_operation.daemon = True
         self.current_operation.start()
     
+    def offer_resume(self):
+        """前回完了しなかったジョブがあれば、続きから再開するか確認"""
+        if not self.saved_job.resumable():
+            return
+        job = self.saved_job.data
+        message = (f"前回の処理が完了していません。\n\n{job['input']}\n\n"
+                   "続きから再開しますか？ (書き出し済みのパートは飛ばします)")
+        if not messagebox.askyesno("再開", message):
+            self.saved_job.clear()
+            return
+        logging.info(f"前回のジョブを再開: {job['input']}")
+        self.input_file.set(job['input'])
+        self.output_dir.set(job['output'])
+        self.saved_job.set_status('running')
+        self.start_operation(self.split_audio_thread)
+    
     def validate_inputs(self):
         """入力値の検証"""
         if not self.input_file.get():
             messagebox.showerror("エラー", "入力ファイルを選択してください")
             return False
         
-        if not os.path.exists(self.input_file.get()):
+        if batch.is_batch_input(self.input_file.get()):
+            inputs = batch.expand_inputs(batch.split_patterns(self.input_file.get()))
+            missing = [p for p in inputs if not os.path.isfile(p)]
+            if not inputs:
+                messagebox.showerror("エラー", "対象の音声ファイルが見つかりません")
+                return False
+            if missing:
+                messagebox.showerror("エラー", f"入力ファイルが見つかりません：\n{missing[0]}")
+                return False
+        elif not os.path.exists(self.input_file.get()):
             messagebox.showerror("エラー", "入力ファイルが見つかりません")
             return False
         
@@ -397,7 +654,26 @@ class AudioSplitterGUI:
             messagebox.showerror("エラー", "出力フォルダを選択してください")
             return False
         
-        if self.split_duration.get() <= 0:
+        try:
+            encoders.resolve(self.current_settings())
+            split_engine.parse_renditions(self.renditions.get())
+        except ValueError as e:
+            messagebox.showerror("エラー", str(e))
+            return False
+        
+        if self.split_mode.get() == 'silence':
+            if self.max_part_minutes.get() <= self.min_part_minutes.get():
+                messagebox.showerror("エラー", "パートの最長は最短より長く設定してください")
+                return False
+        elif self.split_mode.get() == 'cutlist':
+            if not os.path.isfile(self.cutlist_path.get()):
+                messagebox.showerror("エラー", "カットリストが見つかりません")
+                return False
+        elif self.split_mode.get() == 'size':
+            if self.max_part_mb.get() <= 0:
+                messagebox.showerror("エラー", "最大ファイルサイズは1MB以上で設定してください")
+                return False
+        elif self.split_duration.get() <= 0:
             messagebox.showerror("エラー", "分割時間は1分以上で設定してください")
             return False
         
@@ -406,85 +682,122 @@ class AudioSplitterGUI:
     def split_audio_thread(self):
         """分割処理（バックグラウンド）"""
         try:
-            input_path = self.input_file.get()
-            output_path = self.output_dir.get()
-            duration_minutes = self.split_duration.get()
-            
-            logging.info(f"分割処理開始 - 入力: {input_path}, 出力: {output_path}, 分割時間: {duration_minutes}分")
-            
-            # 出力ディレクトリ作成
-            os.makedirs(output_path, exist_ok=True)
+            # 再開時も前回と同じ設定で続きを書き出すため、ジョブに保存した入力・出力・設定を使う
+            input_path = self.saved_job.data['input']
+            output_path = self.saved_job.data['output']
+            settings = self.saved_job.data['settings']
             
-            # 進捗更新
-            self.progress_queue.put(("progress", 10, "音声ファイルを読み込み中..."))
+            logging.info(f"分割処理開始 - 入力: {input_path}, 出力: {output_path}, 分割時間: {settings['split_duration']}分")
             
-            # 音声ファイル読み込み
-            logging.debug("音声ファイルの読み込み開始")
-            audio = AudioSegment.from_file(input_path)
-            logging.debug("音声ファイルの読み込み完了")
+            total_chunks = split_engine.split_file(
+                input_path, output_path, settings,
+                lambda progress, text: self.progress_queue.put(("progress", progress, text)),
+                self.cancel_token
+            )
+            if total_chunks is None:
+                if self.closing:
+                    # 終了による中断は次回起動時に再開できるよう、ジョブ状態を残す
+                    self.saved_job.set_status(self.saved_job.data['status'])
+                else:
+                    self.saved_job.clear()
+                self.progress_queue.put(("cancelled",))
+                return
+            self.saved_job.clear()
             
-            # 分割計算
-            chunk_duration_ms = duration_minutes * 60 * 1000
-            total_chunks = int(len(audio) / chunk_duration_ms) + (1 if len(audio) % chunk_duration_ms > 0 else 0)
+            self.progress_queue.put(("progress", 100, "完了！"))
+            if settings['output_target'] == 'dataset':
+                self.progress_queue.put(("success", f"✅ 書き出し完了！ {total_chunks}個の窓を書き出しました"))
+            else:
+                self.progress_queue.put(("success", f"✅ 分割完了！ {total_chunks}個のファイルが作成されました"))
             
-            logging.info(f"分割数: {total_chunks}個")
+            # フォルダを開く
+            if self.auto_open_folder.get():
+                self.open_output_folder()
+                
+        except Exception as e:
+            logging.error(f"分割処理中にエラーが発生: {str(e)}", exc_info=True)
+            self.saved_job.clear()
+            self.progress_queue.put(("error", f"エラーが発生しました: {str(e)}"))
+    
+    def batch_split_thread(self):
+        """一括分割処理（バックグラウンド）"""
+        try:
+            inputs = batch.expand_inputs(batch.split_patterns(self.input_file.get()))
+            output_path = self.output_dir.get()
+            settings = self.current_settings()
             
-            # ファイル名準備
-            input_filename = Path(input_path).stem
+            logging.info(f"一括処理開始 - {len(inputs)}件, 出力: {output_path}, 同時処理: {settings['batch_jobs']}ファイル")
             
-            self.progress_queue.put(("progress", 20, f"{total_chunks}個のファイルに分割します"))
+            results = batch.run_batch(
+                inputs, output_path, settings,
+                lambda progress, text: self.progress_queue.put(("progress", progress, text)),
+                self.cancel_token
+            )
+            if self.cancel_token.cancelled:
+                self.progress_queue.put(("cancelled",))
+                return
             
-            # 分割処理
-            for i in range(total_chunks):
-                if getattr(self.current_operation, '_stop_requested', False):
-                    logging.info("処理がキャンセルされました")
-                    self.progress_queue.put(("error", "処理がキャンセルされました"))
-                    return
-                
-                start_time = i * chunk_duration_ms
-                end_time = min((i + 1) * chunk_duration_ms, len(audio))
-                
-                chunk = audio[start_time:end_time]
-                
-                # 出力ファイル名
-                output_filename = f"{input_filename}_part{i+1:02d}.mp3"
-                output_file_path = os.path.join(output_path, output_filename)
-                
-                logging.debug(f"分割ファイル作成中: {output_filename}")
-                
-                # 進捗更新
-                progress = 20 + (i / total_chunks) * 70
-                self.progress_queue.put(("progress", progress, f"分割中... ({i+1}/{total_chunks})"))
-                
-                # エクスポート設定
-                export_params = {"format": "mp3"}
-                if self.preserve_quality.get():
-                    export_params["bitrate"] = "320k"
-                
-                chunk.export(output_file_path, **export_params)
-                logging.debug(f"分割ファイル作成完了: {output_filename}")
+            summary = batch.summarize(results)
+            logging.info(f"一括処理完了 - {summary}")
+            message = (f"✅ 一括処理完了！ 成功 {summary['done']}件 / 失敗 {summary['error']}件"
+                       f" (合計 {summary['parts']}個のファイルを作成)")
+            failures = [f"・{Path(r['input']).name}: {r['error']}" for r in results if r['status'] == 'error']
+            if failures:
+                message += "\n\n失敗したファイル:\n" + "\n".join(failures[:10])
             
-            logging.info("分割処理が正常に完了")
             self.progress_queue.put(("progress", 100, "完了！"))
-            self.progress_queue.put(("success", f"✅ 分割完了！ {total_chunks}個のファイルが作成されました"))
+            if summary['done'] == 0:
+                self.progress_queue.put(("error", message))
+                return
+            self.progress_queue.put(("success", message))
             
-            # フォルダを開く
             if self.auto_open_folder.get():
                 self.open_output_folder()
-                
+        
         except Exception as e:
-            logging.error(f"分割処理中にエラーが発生: {str(e)}", exc_info=True)
+            logging.error(f"一括処理中にエラーが発生: {str(e)}", exc_info=True)
             self.progress_queue.put(("error", f"エラーが発生しました: {str(e)}"))
     
     def cancel_operation(self):
         """処理キャンセル"""
         if self.current_operation and self.current_operation.is_alive():
-            self.current_operation._stop_requested = True
-            self.reset_ui_state()
+            # 子プロセスの終了と書きかけの出力の削除はワーカー側で行い、完了の通知でUIを戻す
+            self.cancel_button.config(state='disabled')
+            self.pause_button.config(state='disabled')
+            self.progress_label.config(text="中断しています...")
+            self.cancel_token.cancel()
+    
+    def toggle_pause(self):
+        """一時停止・再開の切り替え (FFmpegの子プロセスを止め、新しいパートの書き出しを待たせる)"""
+        if not (self.current_operation and self.current_operation.is_alive()):
+            return
+        if self.cancel_token.paused:
+            self.cancel_token.resume()
+            self.saved_job.set_status('running')
+            self.pause_button.config(text="⏸ 一時停止")
+            self.progress_label.config(text="再開しました")
+        else:
+            self.cancel_token.pause()
+            self.saved_job.set_status('paused')
+            self.pause_button.config(text="▶ 再開")
+            if self.saved_job.data is not None:
+                self.progress_label.config(text="⏸ 一時停止中 (アプリを終了しても次回起動時に続きから再開できます)")
+            else:
+                self.progress_label.config(text="⏸ 一時停止中")
+    
+    def on_closing(self):
+        """ウィンドウを閉じる時の処理 (処理中の子プロセスを終了させてからアプリを終了)"""
+        if self.current_operation and self.current_operation.is_alive():
+            self.closing = True
+            self.cancel_token.cancel()
+            # ワーカーがジョブ状態を保存し終えるまで待つ
+            self.current_operation.join(timeout=5)
+        self.root.destroy()
     
     def reset_ui_state(self):
         """UI状態リセット"""
         self.start_button.config(state='normal')
+        self.pause_button.config(state='disabled', text="⏸ 一時停止")
         self.cancel_button.config(state='disabled')
         self.progress_bar.config(value=0)
         self.progress_label.config(text="")
@@ -522,6 +835,18 @@ class AudioSplitterGUI:
                     self.progress_label.config(text=f"❌ {message}", style='Error.TLabel')
                     self.reset_ui_state()
                     messagebox.showerror("エラー", message)
+                
+                elif msg_type == "cancelled":
+                    self.reset_ui_state()
+                    self.progress_label.config(text="⏹ 処理がキャンセルされました", style='Info.TLabel')
+                
+                elif msg_type == "file_info":
+                    generation, info_text, error_msg = data
+                    # 入力が変わった後に届いた古い結果は破棄
+                    if generation == self._probe_generation:
+                        self.info_label.config(text=info_text)
+                        if error_msg:
+                            messagebox.showerror("エラー", error_msg)
         
         except queue.Empty:
             pass
@@ -529,27 +854,42 @@ class AudioSplitterGUI:
         # 100ms後に再チェック
         self.root.after(100, self.check_progress)
 
-    def save_current_settings(self):
-        """現在の設定を保存"""
-        settings = {
+    def current_settings(self):
+        """現在の設定を辞書で取得"""
+        return {
             'input_file': self.input_file.get(),
             'output_dir': self.output_dir.get(),
             'split_duration': self.split_duration.get(),
             'preserve_quality': self.preserve_quality.get(),
-            'auto_open_folder': self.auto_open_folder.get()
+            'auto_open_folder': self.auto_open_folder.get(),
+            'split_engine': self.split_engine.get(),
+            'jobs': self.jobs.get(),
+            'pcm_cache': self.pcm_cache.get(),
+            'pcm_cache_mb': self.pcm_cache_mb,
+            'batch_jobs': self.batch_jobs.get(),
+            'watch_dir': self.watch_dir,
+            'snap_window_sec': self.snap_window_sec.get(),
+            'split_mode': self.split_mode.get(),
+            'min_part_minutes': self.min_part_minutes.get(),
+            'max_part_minutes': self.max_part_minutes.get(),
+            'max_part_mb': self.max_part_mb.get(),
+            'cutlist_path': self.cutlist_path.get(),
+            'renditions': self.renditions.get(),
+            'output_format': self.output_format.get(),
+            'encoder_preset': self.encoder_preset.get(),
+            **self.encoder_settings,
+            'output_target': 'dataset' if self.export_dataset.get() else 'audio',
+            **self.dataset_settings
         }
-        save_settings(settings)
+    
+    def save_current_settings(self):
+        """現在の設定を保存"""
+        save_settings(self.current_settings())
 
 
 def main():
     """メイン関数"""
-    try:
-        logging.info("アプリケーション初期化開始")
-        from pydub import AudioSegment
-    except ImportError:
-        logging.error("pydubライブラリがインストールされていません")
-        messagebox.showerror("エラー", "pydubライブラリがインストールされていません。\n\npip install pydub\n\nを実行してください。")
-        return
+    logging.info("アプリケーション初期化開始")
     
     root = Tk()
     app = AudioSplitterGUI(root)
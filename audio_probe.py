@@ -0,0 +1,290 @@
+"""
+音声ファイル情報の取得モジュール
+コンテナのヘッダだけを読み、デコードせずに再生時間・コーデック等を取得する
+"""
+
+import os
+import json
+import shutil
+import struct
+import logging
+import subprocess
+from pathlib import Path
+
+import mp3_frames
+import probe_cache
+
+# MP4のサンプルエントリ名とコーデック名の対応
+MP4_CODECS = {
+    b'mp4a': 'aac',
+    b'alac': 'alac',
+    b'Opus': 'opus',
+    b'fLaC': 'flac',
+    b'ac-3': 'ac3',
+    b'ec-3': 'eac3',
+    b'.mp3': 'mp3',
+}
+
+# ffprobe実行中に中断要求を確認する間隔 (秒)
+PROBE_POLL_INTERVAL = 0.05
+
+# MP4で子ボックスを持つコンテナボックス
+MP4_CONTAINERS = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+
+# WAVのフォーマットタグとコーデック名の対応
+WAV_FORMATS = {
+    1: 'pcm_s{bits}le',
+    3: 'pcm_f{bits}le',
+    6: 'pcm_alaw',
+    7: 'pcm_mulaw',
+}
+
+
+def _result(duration_ms, codec, bit_rate, sample_rate, channels):
+    """解析結果を共通の辞書形式にする"""
+    return {
+        'duration_ms': int(duration_ms),
+        'codec': codec,
+        'bit_rate': int(bit_rate),
+        'sample_rate': int(sample_rate),
+        'channels': int(channels)
+    }
+
+
+def probe_mp3(path):
+    """MP3の先頭フレームとXing/VBRIタグから情報を取得"""
+    with open(path, 'rb') as f:
+        audio_start, audio_end = mp3_frames.find_audio_range(f)
+        frames = mp3_frames.iter_frames(f, audio_start, audio_end)
+        first = next(frames, None)
+        if first is None:
+            return None
+        offset, header = first
+        vbr_tag = mp3_frames.read_vbr_tag(f, offset, header)
+        if vbr_tag is not None and not vbr_tag.get('frames'):
+            # フレーム数の無いタグはCBR推定に使えないため、次のフレームから推定する
+            first = next(frames, None)
+            if first is None:
+                return None
+            offset, header = first
+            vbr_tag = None
+
+    audio_bytes = audio_end - offset
+    if vbr_tag is not None:
+        samples = vbr_tag['frames'] * header['samples']
+        lame = vbr_tag['lame']
+        if lame is not None:
+            delay_bits = int.from_bytes(lame[mp3_frames.LAME_DELAY_OFFSET:mp3_frames.LAME_DELAY_OFFSET + 3], 'big')
+            samples = max(0, samples - (delay_bits >> 12) - (delay_bits & 0xFFF))
+        duration_ms = samples * 1000 / header['sample_rate']
+        audio_bytes = vbr_tag.get('bytes') or audio_bytes
+        bit_rate = audio_bytes * 8000 / duration_ms if duration_ms else header['bitrate']
+    else:
+        # タグが無い場合は先頭フレームのビットレートによるCBR推定
+        bit_rate = header['bitrate']
+        duration_ms = audio_bytes * 8000 / bit_rate
+    return _result(duration_ms, 'mp3', bit_rate, header['sample_rate'], header['channels'])
+
+
+def probe_wav(path):
+    """WAV (RIFF) のfmt/dataチャンクから情報を取得"""
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                chunk_size = 0
+            elif chunk_id == b'data':
+                data_offset = f.tell()
+                break
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    if fmt is None or len(fmt) < 16:
+        return None
+    format_tag, channels, sample_rate, byte_rate, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == 0xFFFE and len(fmt) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE はサブフォーマットGUIDの先頭がフォーマットタグ
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+    if not byte_rate:
+        return None
+    # ストリーミング書き出し中などでサイズが未確定の場合はファイル末尾までをデータとみなす
+    available = os.path.getsize(path) - data_offset
+    data_size = chunk_size if 0 < chunk_size <= available else available
+    codec = WAV_FORMATS.get(format_tag, 'wav').format(bits=bits)
+    return _result(data_size * 1000 / byte_rate, codec, byte_rate * 8, sample_rate, channels)
+
+
+def _iter_boxes(f, start, end):
+    """MP4ボックスを (種類, 本体の開始位置, 終了位置) として順に返す"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        body = pos + 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            body += 8
+        elif size == 0:
+            size = end - pos
+        if size < body - pos:
+            return
+        yield box_type, body, min(pos + size, end)
+        pos += size
+
+
+def probe_mp4(path):
+    """MP4/M4Aのmvhd・stsdボックスから情報を取得"""
+    file_size = os.path.getsize(path)
+    info = {}
+
+    def walk(f, start, end, in_sound_track=False):
+        for box_type, body, box_end in _iter_boxes(f, start, end):
+            if box_type == b'mvhd':
+                f.seek(body)
+                version = f.read(4)[0]
+                if version == 1:
+                    f.seek(body + 20)
+                    timescale, duration = struct.unpack('>IQ', f.read(12))
+                else:
+                    f.seek(body + 12)
+                    timescale, duration = struct.unpack('>II', f.read(8))
+                if timescale:
+                    info['duration_ms'] = duration * 1000 / timescale
+            elif box_type == b'trak':
+                # 音声トラック (hdlrがsoun) のみを対象にする
+                sound = any(t == b'mdia' and _is_sound_media(f, b, e) for t, b, e in _iter_boxes(f, body, box_end))
+                if sound and 'codec' not in info:
+                    walk(f, body, box_end, True)
+            elif box_type == b'stsd' and in_sound_track:
+                f.seek(body + 8)
+                entry = f.read(36)
+                if len(entry) == 36:
+                    info['codec'] = MP4_CODECS.get(entry[4:8], entry[4:8].decode('latin-1').strip())
+                    info['channels'], = struct.unpack('>H', entry[24:26])
+                    info['sample_rate'] = struct.unpack('>I', entry[32:36])[0] >> 16
+            elif box_type in MP4_CONTAINERS:
+                walk(f, body, box_end, in_sound_track)
+
+    with open(path, 'rb') as f:
+        first = next(_iter_boxes(f, 0, file_size), None)
+        if first is None or first[0] != b'ftyp':
+            return None
+        walk(f, 0, file_size)
+
+    if 'duration_ms' not in info or 'codec' not in info:
+        return None
+    duration_ms = info['duration_ms']
+    bit_rate = file_size * 8000 / duration_ms if duration_ms else 0
+    return _result(duration_ms, info['codec'], bit_rate, info.get('sample_rate', 0), info.get('channels', 0))
+
+
+def _is_sound_media(f, start, end):
+    """mdiaボックスのhdlrが音声 (soun) かどうか"""
+    for box_type, body, _ in _iter_boxes(f, start, end):
+        if box_type == b'hdlr':
+            f.seek(body + 8)
+            return f.read(4) == b'soun'
+    return False
+
+
+class ProbeCancelled(Exception):
+    """情報取得が中断された"""
+
+
+def probe_ffprobe(path, should_stop=None):
+    """ffprobeで音声ストリームの情報を取得 (中断時はffprobeを終了させる)"""
+    ffprobe_path = shutil.which('ffprobe') or 'ffprobe'
+    ffprobe_cmd = [
+        ffprobe_path, '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'format=duration,bit_rate:stream=codec_name,sample_rate,channels,bit_rate',
+        '-of', 'json',
+        path
+    ]
+    logging.debug(f"FFprobeコマンド: {' '.join(ffprobe_cmd)}")
+    process = subprocess.Popen(ffprobe_cmd,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               encoding='utf-8',
+                               errors='replace')
+    try:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=PROBE_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if should_stop is not None and should_stop():
+                    raise ProbeCancelled(path)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, ffprobe_cmd, stdout, stderr)
+    data = json.loads(stdout or '{}')
+    stream = (data.get('streams') or [{}])[0]
+    fmt = data.get('format', {})
+    if 'duration' not in fmt:
+        raise ValueError("音声の再生時間を取得できませんでした")
+    return _result(float(fmt['duration']) * 1000,
+                   stream.get('codec_name', ''),
+                   stream.get('bit_rate') or fmt.get('bit_rate') or 0,
+                   stream.get('sample_rate') or 0,
+                   stream.get('channels') or 0)
+
+
+# 拡張子ごとのヘッダ解析関数
+NATIVE_PROBES = {
+    '.mp3': probe_mp3,
+    '.wav': probe_wav,
+    '.m4a': probe_mp4,
+    '.mp4': probe_mp4,
+    '.m4b': probe_mp4,
+}
+
+
+def probe(path, should_stop=None):
+    """音声ファイルの情報を取得 (解析済みのファイルはキャッシュを使用)"""
+    info = probe_cache.get(path, 'probe')
+    if info is None:
+        info = probe_uncached(path, should_stop)
+        probe_cache.put(path, 'probe', info)
+    return info
+
+
+def probe_uncached(path, should_stop=None):
+    """音声ファイルの情報を取得 (ヘッダ解析に失敗した場合はffprobeを使用)"""
+    native_probe = NATIVE_PROBES.get(Path(path).suffix.lower())
+    if native_probe is not None:
+        try:
+            info = native_probe(path)
+            if info is not None and info['duration_ms'] > 0:
+                logging.debug(f"ヘッダ解析で情報を取得: {info}")
+                return info
+        except (OSError, ValueError, struct.error, ZeroDivisionError) as e:
+            logging.warning(f"ヘッダ解析に失敗したためffprobeを使用します: {str(e)}")
+    if should_stop is not None and should_stop():
+        raise ProbeCancelled(path)
+    return probe_ffprobe(path, should_stop)
+
+
+def format_info(info):
+    """情報表示用の文字列を作成 (例: mp3 128kbps 44.1kHz ステレオ)"""
+    texts = [info['codec']] if info.get('codec') else []
+    if info.get('bit_rate'):
+        texts.append(f"{round(info['bit_rate'] / 1000)}kbps")
+    if info.get('sample_rate'):
+        texts.append(f"{info['sample_rate'] / 1000:g}kHz")
+    if info.get('channels'):
+        texts.append({1: 'モノラル', 2: 'ステレオ'}.get(info['channels'], f"{info['channels']}ch"))
+    return ' '.join(texts)
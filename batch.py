@@ -0,0 +1,125 @@
+"""
+一括分割モジュール
+複数の入力ファイル (ファイル・グロブ・フォルダ指定) をキューに入れ、複数ファイルを並行して分割する
+"""
+
+import os
+import glob
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import split_engine
+from cancel_token import CancelToken
+
+# フォルダ指定時に対象とする音声ファイルの拡張子
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.m4b', '.mp4', '.aac', '.flac', '.ogg', '.opus', '.wma')
+
+# GUIの入力欄で複数の指定を区切る文字
+INPUT_SEPARATOR = ';'
+
+
+def split_patterns(text):
+    """入力欄の文字列を個々の指定に分ける (既存ファイル名そのものは分けない)"""
+    if os.path.isfile(text):
+        return [text]
+    return [pattern.strip() for pattern in text.split(INPUT_SEPARATOR) if pattern.strip()]
+
+
+def is_batch_input(text):
+    """入力欄の指定が一括処理 (複数ファイル・グロブ・フォルダ) かどうか"""
+    if not text or os.path.isfile(text):
+        return False
+    patterns = split_patterns(text)
+    return len(patterns) > 1 or any(os.path.isdir(p) or glob.has_magic(p) for p in patterns)
+
+
+def expand_inputs(patterns):
+    """ファイル・グロブ・フォルダの指定から入力ファイルの一覧を作成"""
+    inputs = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(str(p) for p in Path(pattern).iterdir()
+                             if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS)
+        elif glob.has_magic(pattern):
+            matches = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        else:
+            matches = [pattern]
+        inputs.extend(matches)
+
+    # 同じファイルが複数回指定された場合は最初の1回だけ処理する
+    seen = set()
+    unique_inputs = []
+    for path in inputs:
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique_inputs.append(path)
+    return unique_inputs
+
+
+def output_dirs_for(inputs, output_root):
+    """入力ファイルごとの出力サブフォルダを決める (同名ファイルは連番で区別)"""
+    used = {}
+    output_dirs = []
+    for path in inputs:
+        stem = Path(path).stem
+        used[stem] = used.get(stem, 0) + 1
+        name = stem if used[stem] == 1 else f"{stem}_{used[stem]}"
+        output_dirs.append(os.path.join(output_root, name))
+    return output_dirs
+
+
+def run_batch(inputs, output_root, settings, progress, cancel, file_progress=None):
+    """複数ファイルを並行して分割し、ファイルごとの結果を返す (中断時は実行中のファイルも即座に中断する)"""
+    total_files = len(inputs)
+    output_dirs = output_dirs_for(inputs, output_root)
+    file_percents = [0.0] * total_files
+    lock = threading.Lock()
+
+    def report(i, percent, text):
+        # ファイルごとの進捗を平均して全体の進捗とする
+        with lock:
+            file_percents[i] = percent
+            overall = sum(file_percents) / total_files
+        if file_progress is not None:
+            file_progress(inputs[i], percent, text)
+        progress(overall, f"一括処理中... ({Path(inputs[i]).name}: {text})")
+
+    def run_one(i):
+        if cancel.cancelled:
+            return {'input': inputs[i], 'output': output_dirs[i], 'status': 'cancelled', 'parts': 0}
+        logging.info(f"一括処理: {inputs[i]} -> {output_dirs[i]}")
+        # 書きかけの出力の削除がほかのファイルに及ばないよう、ファイルごとに子トークンを使う
+        file_cancel = CancelToken(cancel)
+        try:
+            parts = split_engine.split_file(inputs[i], output_dirs[i], settings,
+                                            lambda percent, text: report(i, percent, text), file_cancel)
+        except Exception as e:
+            logging.error(f"分割処理中にエラーが発生: {inputs[i]}: {str(e)}", exc_info=True)
+            return {'input': inputs[i], 'output': output_dirs[i], 'status': 'error', 'parts': 0, 'error': str(e)}
+        finally:
+            file_cancel.close()
+        if parts is None:
+            return {'input': inputs[i], 'output': output_dirs[i], 'status': 'cancelled', 'parts': 0}
+        report(i, 100, "完了")
+        return {'input': inputs[i], 'output': output_dirs[i], 'status': 'done', 'parts': parts}
+
+    results = [None] * total_files
+    with ThreadPoolExecutor(max_workers=max(1, settings['batch_jobs'])) as executor:
+        futures = {executor.submit(run_one, i): i for i in range(total_files)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def summarize(results):
+    """一括処理結果の集計"""
+    return {
+        'files': len(results),
+        'done': sum(1 for r in results if r['status'] == 'done'),
+        'error': sum(1 for r in results if r['status'] == 'error'),
+        'cancelled': sum(1 for r in results if r['status'] == 'cancelled'),
+        'parts': sum(r['parts'] for r in results),
+    }
@@ -0,0 +1,261 @@
+"""
+処理の中断・一時停止モジュール
+中断要求を分割エンジン全体に伝え、実行中のFFmpeg子プロセスの終了と書きかけの出力ファイルの削除を行う
+一時停止中は子プロセスをSIGSTOPで止め、ワーカープールからの新しい子プロセスの起動を待たせる
+"""
+
+import os
+import locale
+import signal
+import logging
+import threading
+import subprocess
+from contextlib import contextmanager
+
+# 子プロセスのエラー出力のエンコーディング
+SYSTEM_ENCODING = locale.getpreferredencoding()
+
+# 一時停止中に中断要求を確認する間隔 (秒)
+PAUSE_POLL_INTERVAL = 0.1
+
+
+class Cancelled(Exception):
+    """処理が中断された"""
+
+
+class CancelToken:
+    """中断・一時停止の要求を表すトークン (呼び出すと中断要求の有無を返すため、従来のshould_stopとしても使える)"""
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        # セットされている間は実行中、クリアされている間は一時停止中
+        self._running = threading.Event()
+        self._running.set()
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._partial_outputs = set()
+        self._callbacks = []
+        self._children = set()
+        self._output_callbacks = []
+        self._parent = parent
+        if parent is not None:
+            # 親 (一括処理全体など) が中断・一時停止されたら子 (ファイルごと) も中断・一時停止する
+            parent.on_cancel(self.cancel)
+            with parent._lock:
+                parent._children.add(self)
+                if not parent._running.is_set():
+                    self._running.clear()
+
+    def __call__(self):
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        """中断要求があったかどうか"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """中断を要求し、登録済みの子プロセスをすぐに終了させる"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            # 一時停止中の待機も解除する (停止中のプロセスもSIGKILLで終了できる)
+            self._running.set()
+            processes = list(self._processes)
+            callbacks = list(self._callbacks)
+        logging.info(f"中断要求: 子プロセス{len(processes)}個を終了します")
+        for process in processes:
+            _kill(process)
+        for callback in callbacks:
+            callback()
+
+    @property
+    def paused(self):
+        """一時停止中かどうか"""
+        return not self._running.is_set()
+
+    def pause(self):
+        """一時停止: 実行中の子プロセスを止め、新しい子プロセスの起動を再開まで待たせる"""
+        with self._lock:
+            if self._event.is_set() or not self._running.is_set():
+                return
+            self._running.clear()
+            processes = list(self._processes)
+            children = list(self._children)
+        logging.info(f"一時停止: 子プロセス{len(processes)}個を停止します")
+        for process in processes:
+            _send_signal(process, 'SIGSTOP')
+        for child in children:
+            child.pause()
+
+    def resume(self):
+        """一時停止を解除して子プロセスを再開させる"""
+        with self._lock:
+            if self._running.is_set():
+                return
+            self._running.set()
+            processes = list(self._processes)
+            children = list(self._children)
+        logging.info(f"再開: 子プロセス{len(processes)}個を再開します")
+        for process in processes:
+            _send_signal(process, 'SIGCONT')
+        for child in children:
+            child.resume()
+
+    def wait_if_paused(self):
+        """一時停止中は再開または中断されるまで待つ"""
+        while not self._running.wait(PAUSE_POLL_INTERVAL):
+            if self._event.is_set():
+                return
+
+    def check(self):
+        """一時停止中は再開まで待ち、中断要求があれば例外を送出"""
+        self.wait_if_paused()
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout):
+        """中断要求があるかtimeout秒経つまで待つ (中断要求があればTrue)"""
+        return self._event.wait(timeout)
+
+    def on_cancel(self, callback):
+        """中断時に呼び出す関数を登録 (中断済みならすぐに呼び出す)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        """中断時に呼び出す関数の登録を解除"""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @contextmanager
+    def callback(self, callback):
+        """with文の間だけ中断時に呼び出す関数を登録 (ワーカープールの待機中のジョブの取り消しなど)"""
+        self.on_cancel(callback)
+        try:
+            yield
+        finally:
+            self.remove_callback(callback)
+
+    def close(self):
+        """親トークンとの連動を解除 (常駐プロセスでジョブごとの子トークンが溜まらないようにする)"""
+        if self._parent is not None:
+            self._parent.remove_callback(self.cancel)
+            with self._parent._lock:
+                self._parent._children.discard(self)
+            self._parent = None
+
+    def popen(self, cmd, **kwargs):
+        """子プロセスを起動して登録 (一時停止中は再開まで待ち、中断済みなら起動せずに例外を送出)"""
+        self.wait_if_paused()
+        with self._lock:
+            # 起動と登録の間に中断・一時停止されて取りこぼさないよう、ロック内で起動する
+            if self._event.is_set():
+                raise Cancelled()
+            process = subprocess.Popen(cmd, **kwargs)
+            self._processes.add(process)
+            if not self._running.is_set():
+                _send_signal(process, 'SIGSTOP')
+        return process
+
+    def release(self, process):
+        """終了した子プロセスの登録を解除"""
+        with self._lock:
+            self._processes.discard(process)
+
+    def run(self, cmd, input=None):
+        """子プロセスを実行して標準出力を返す (中断時は例外を送出、失敗時はCalledProcessError)"""
+        process = self.popen(cmd, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            stdout, stderr = process.communicate(input)
+        except (BrokenPipeError, OSError):
+            # 中断で子プロセスが終了すると書き込みに失敗する
+            if self._event.is_set():
+                raise Cancelled()
+            raise
+        finally:
+            if process.poll() is None:
+                _kill(process)
+                # 終了を待ってゾンビプロセスを残さない
+                process.wait()
+            self.release(process)
+        if self._event.is_set():
+            raise Cancelled()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stdout,
+                                                stderr.decode(SYSTEM_ENCODING, errors='replace'))
+        return stdout
+
+    def track_output(self, path):
+        """書き出しを始めた出力ファイルを登録 (完了前に中断されたら削除する)"""
+        with self._lock:
+            if self._event.is_set():
+                raise Cancelled()
+            self._partial_outputs.add(path)
+
+    def output_done(self, path):
+        """書き出しが完了した出力ファイルの登録を解除し、書き出し完了時に呼び出す関数に通知"""
+        with self._lock:
+            self._partial_outputs.discard(path)
+            callbacks = list(self._output_callbacks)
+        for callback in callbacks:
+            callback(path)
+
+    @contextmanager
+    def output_callback(self, callback):
+        """with文の間だけ書き出し完了時に呼び出す関数を登録 (マニフェストへの記録など)"""
+        with self._lock:
+            self._output_callbacks.append(callback)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._output_callbacks.remove(callback)
+
+    @contextmanager
+    def writing(self, path):
+        """with文の間だけ出力ファイルを書きかけとして登録"""
+        self.track_output(path)
+        yield path
+        self.output_done(path)
+
+    def remove_partial_outputs(self):
+        """書きかけの出力ファイルを削除"""
+        with self._lock:
+            paths = list(self._partial_outputs)
+            self._partial_outputs.clear()
+        for path in paths:
+            try:
+                os.remove(path)
+                logging.info(f"書きかけの出力を削除しました: {path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning(f"書きかけの出力を削除できませんでした: {path}: {str(e)}")
+
+
+def _send_signal(process, name):
+    """子プロセスにシグナルを送る (SIGSTOPの無いWindowsでは新しい子プロセスの起動を待たせるだけになる)"""
+    signum = getattr(signal, name, None)
+    if signum is None:
+        return
+    try:
+        if process.poll() is None:
+            process.send_signal(signum)
+    except OSError:
+        pass
+
+
+def _kill(process):
+    """子プロセスを強制終了 (終了済みなら何もしない)"""
+    try:
+        if process.poll() is None:
+            process.kill()
+    except OSError:
+        pass
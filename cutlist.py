@@ -0,0 +1,160 @@
+"""
+カットリスト読み込みモジュール
+CSV・JSON・キューシートで指定された (開始, 終了, 名前) の範囲を分割区間のリストに変換する
+"""
+
+import os
+import re
+import csv
+import json
+from pathlib import Path
+
+# キューシートのINDEXは1秒75フレーム
+CUE_FRAMES_PER_SECOND = 75
+
+# ファイル名に使えない文字
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def parse_time(value):
+    """時刻の指定をミリ秒に変換 (秒数・"MM:SS"・"HH:MM:SS.mmm" に対応)"""
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        fields = text.split(':')
+        if not text or len(fields) > 3:
+            raise ValueError(f"時刻の形式が正しくありません: {value}")
+        seconds = 0.0
+        for field in fields:
+            seconds = seconds * 60 + float(field)
+    if seconds < 0:
+        raise ValueError(f"時刻が負の値です: {value}")
+    return int(round(seconds * 1000))
+
+
+def safe_name(name):
+    """範囲の名前をファイル名に使える形にする"""
+    name = UNSAFE_FILENAME_CHARS.sub('_', name or '').strip().strip('.')
+    return name[:100]
+
+
+def make_range(start, end, name):
+    """1範囲分の区間を作成 (終了が空欄なら音声の末尾まで)"""
+    start_ms = parse_time(start)
+    end_ms = None if end is None or str(end).strip() == '' else parse_time(end)
+    if end_ms is not None and end_ms <= start_ms:
+        raise ValueError(f"終了時刻が開始時刻以前です: {start} - {end}")
+    return {'start_ms': start_ms, 'end_ms': end_ms, 'name': safe_name(name)}
+
+
+def load_csv(path):
+    """CSV (開始, 終了, 名前) を読み込む (見出し行は自動で読み飛ばす)"""
+    ranges = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for line_no, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                ranges.append(make_range(row[0], row[1] if len(row) > 1 else None, row[2] if len(row) > 2 else ''))
+            except ValueError as e:
+                if line_no == 1 and not ranges:
+                    continue
+                raise ValueError(f"{Path(path).name} {line_no}行目: {str(e)}")
+    return ranges
+
+
+def load_json(path):
+    """JSON ([{"start", "end", "name"}, ...] または [[開始, 終了, 名前], ...]) を読み込む"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('ranges', data.get('cuts'))
+    if not isinstance(data, list):
+        raise ValueError("JSONのカットリストは範囲の配列で指定してください")
+
+    ranges = []
+    for item in data:
+        if isinstance(item, dict):
+            ranges.append(make_range(item['start'], item.get('end'), item.get('name', item.get('title', ''))))
+        else:
+            ranges.append(make_range(item[0], item[1] if len(item) > 1 else None, item[2] if len(item) > 2 else ''))
+    return ranges
+
+
+def read_cue_text(path):
+    """キューシートを読み込む (日本語環境で多いShift_JISにも対応)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    for encoding in ('utf-8-sig', 'cp932'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+def load_cue(path):
+    """キューシートを読み込む (各トラックは次のトラックの開始まで、最終トラックは末尾まで)"""
+    tracks = []
+    for line in read_cue_text(path).splitlines():
+        fields = line.strip().split(None, 1)
+        if not fields:
+            continue
+        keyword = fields[0].upper()
+        value = fields[1] if len(fields) > 1 else ''
+        if keyword == 'TRACK':
+            tracks.append({'name': '', 'index00': None, 'index01': None})
+        elif tracks and keyword == 'TITLE':
+            tracks[-1]['name'] = value.strip().strip('"')
+        elif tracks and keyword == 'INDEX':
+            number, _, position = value.partition(' ')
+            minutes, seconds, frames = (int(v) for v in position.strip().split(':'))
+            ms = (minutes * 60 + seconds) * 1000 + frames * 1000 // CUE_FRAMES_PER_SECOND
+            if int(number) in (0, 1):
+                tracks[-1][f"index{int(number):02d}"] = ms
+
+    ranges = []
+    for i, track in enumerate(tracks):
+        if track['index01'] is None:
+            raise ValueError(f"トラック{i + 1}にINDEX 01がありません")
+        end_ms = None
+        if i + 1 < len(tracks):
+            following = tracks[i + 1]
+            end_ms = following['index00'] if following['index00'] is not None else following['index01']
+        ranges.append({'start_ms': track['index01'], 'end_ms': end_ms, 'name': safe_name(track['name'])})
+    return ranges
+
+
+LOADERS = {
+    '.csv': load_csv,
+    '.json': load_json,
+    '.cue': load_cue,
+}
+
+
+def load(path, total_ms):
+    """カットリストを読み込み、分割区間のリストを作成 (重複・不連続な範囲もそのまま扱う)"""
+    if not os.path.isfile(path):
+        raise ValueError(f"カットリストが見つかりません: {path}")
+    loader = LOADERS.get(Path(path).suffix.lower())
+    if loader is None:
+        raise ValueError("カットリストはCSV・JSON・キューシート (.cue) のみ対応しています")
+    ranges = loader(path)
+    if not ranges:
+        raise ValueError("カットリストに範囲が含まれていません")
+
+    parts = []
+    for i, cut in enumerate(ranges):
+        if cut['start_ms'] >= total_ms:
+            raise ValueError(f"{i + 1}番目の範囲の開始が音声の長さを超えています")
+        # 終了が空欄または音声の長さを超える範囲は末尾まで書き出す
+        to_end = cut['end_ms'] is None or cut['end_ms'] >= total_ms
+        parts.append({
+            'index': i + 1,
+            'start_ms': cut['start_ms'],
+            'end_ms': total_ms if to_end else cut['end_ms'],
+            'name': cut['name'],
+            'to_end': to_end
+        })
+    return parts
@@ -0,0 +1,187 @@
+"""
+学習用データセット書き出しモジュール
+入力を1回だけデコードし、一定長の窓をホップ幅ずつずらしてメモリマップ可能な.npyシャードに書き出す
+"""
+
+import os
+import logging
+import subprocess
+from pathlib import Path
+
+import audio_probe
+import job_state
+import split_engine
+
+# デコーダから一度に読み込むPCMのサイズ (バイト)
+READ_BLOCK_SIZE = 1024 * 1024
+
+INDEX_FILENAME = 'index.json'
+
+
+def require_numpy():
+    """NumPyを読み込む (起動時には読み込まず、データセットを書き出す時だけ読み込む、無い場合はエラー)"""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("データセットの書き出しにはNumPyが必要です (pip install numpy)")
+    return numpy
+
+
+def _finalize_shard(path, rows, row_shape):
+    """書き込み済みの行数に合わせて.npyのヘッダのshapeを書き換え、余りを切り詰める"""
+    np = require_numpy()
+    with open(path, 'r+b') as f:
+        major, _ = np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f) if major == 1 else np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+        header = repr({'descr': np.dtype('<i2').str, 'fortran_order': False, 'shape': (rows, *row_shape)})
+        # ヘッダ長は変えずに空白で埋める (データ位置がずれないようにする)
+        prefix_size = 10 if major == 1 else 12
+        f.seek(prefix_size)
+        f.write(header.encode('latin1').ljust(data_offset - prefix_size - 1) + b'\n')
+        f.truncate(data_offset + rows * int(np.prod(row_shape)) * 2)
+
+
+class ShardWriter:
+    """窓を一定数ずつ.npyシャード (行 = 窓, int16) に書き込む"""
+
+    def __init__(self, output_path, stem, windows_per_shard, row_shape, cancel):
+        self.output_path = output_path
+        self.cancel = cancel
+        self.stem = stem
+        self.windows_per_shard = windows_per_shard
+        self.row_shape = row_shape
+        self.shards = []
+        self.array = None
+        self.rows = 0
+
+    def _open_shard(self):
+        """新しいシャードを作成"""
+        np = require_numpy()
+        filename = f"{self.stem}_{len(self.shards):05d}.npy"
+        # 目次を書き出すまでは書きかけとして扱い、中断時は削除する
+        self.cancel.track_output(os.path.join(self.output_path, filename))
+        self.array = np.lib.format.open_memmap(os.path.join(self.output_path, filename), mode='w+',
+                                               dtype='<i2', shape=(self.windows_per_shard, *self.row_shape))
+        self.shards.append({'file': filename, 'windows': 0})
+        self.rows = 0
+
+    def write(self, window):
+        """窓を1つ書き込み、(シャード番号, 行番号) を返す"""
+        if self.array is None:
+            self._open_shard()
+        self.array[self.rows] = window
+        position = (len(self.shards) - 1, self.rows)
+        self.rows += 1
+        self.shards[-1]['windows'] = self.rows
+        if self.rows == self.windows_per_shard:
+            self._close_shard()
+        return position
+
+    def _close_shard(self):
+        """現在のシャードを書き出して閉じる"""
+        self.array.flush()
+        del self.array
+        self.array = None
+        if self.rows < self.windows_per_shard:
+            _finalize_shard(os.path.join(self.output_path, self.shards[-1]['file']), self.rows, self.row_shape)
+
+    def close(self):
+        """書きかけのシャードを閉じる"""
+        if self.array is not None:
+            self._close_shard()
+
+
+def export(input_path, output_path, settings, progress, cancel):
+    """入力をストリーミングで窓に切り出して.npyシャードとJSON目次に書き出す (窓の数を返す)"""
+    np = require_numpy()
+    sample_rate = settings['dataset_sample_rate']
+    channels = settings['dataset_channels']
+    window_samples = int(settings['dataset_window_sec'] * sample_rate)
+    hop_samples = int(settings['dataset_hop_sec'] * sample_rate)
+    if window_samples <= 0 or hop_samples <= 0:
+        raise ValueError("窓の長さとホップ幅は0より大きく設定してください")
+    row_shape = (window_samples, channels)
+    window_bytes = window_samples * channels * 2
+    windows_per_shard = max(1, settings['dataset_shard_mb'] * 1024 * 1024 // window_bytes)
+
+    os.makedirs(output_path, exist_ok=True)
+    progress(10, "音声ファイル情報を取得中...")
+    info = audio_probe.probe(input_path, cancel)
+    total_samples = max(1, info['duration_ms'] * sample_rate // 1000)
+    progress(20, f"{window_samples / sample_rate:g}秒の窓を{hop_samples / sample_rate:g}秒ごとに書き出します")
+
+    stem = Path(input_path).stem
+    writer = ShardWriter(output_path, stem, windows_per_shard, row_shape, cancel)
+    windows = []
+    # 窓の先頭より前のサンプルは捨て、バッファには重なり分と読み込み途中の分だけを保持する
+    buffer = np.zeros((0, channels), dtype='<i2')
+    buffer_start = 0
+    carry = b''
+    decoder_cmd = split_engine.pcm_decoder_command(input_path, sample_rate, channels)
+    logging.debug(f"デコーダコマンド: {' '.join(decoder_cmd)}")
+    decoder = cancel.popen(decoder_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def emit_window(start, samples):
+        window = buffer[start - buffer_start:start - buffer_start + samples]
+        if samples < window_samples:
+            # 末尾の窓は無音で埋め、有効なサンプル数を目次に記録する
+            window = np.concatenate((window, np.zeros((window_samples - samples, channels), dtype='<i2')))
+        shard, row = writer.write(window)
+        windows.append({'shard': shard, 'row': row, 'offset_samples': start,
+                        'offset_ms': start * 1000 // sample_rate, 'valid_samples': samples})
+
+    try:
+        next_start = 0
+        while True:
+            data = decoder.stdout.read(READ_BLOCK_SIZE)
+            # 中断でデコーダが終了した場合は、読み込み途中の窓を書き出さずに抜ける
+            cancel.check()
+            if not data:
+                break
+            data = carry + data
+            usable = len(data) - len(data) % (channels * 2)
+            carry = data[usable:]
+            block = np.frombuffer(data[:usable], dtype='<i2').reshape(-1, channels)
+            buffer = np.concatenate((buffer, block))
+
+            while next_start + window_samples <= buffer_start + len(buffer):
+                emit_window(next_start, window_samples)
+                next_start += hop_samples
+            # 次の窓の先頭より前は不要
+            drop = min(next_start - buffer_start, len(buffer))
+            buffer = buffer[drop:]
+            buffer_start += drop
+            progress(20 + min(buffer_start / total_samples, 1) * 70, f"書き出し中... ({len(windows)}窓)")
+
+        split_engine.finish_process(decoder, 'ffmpeg (decoder)')
+        # 最後の窓に入りきらなかった残りがあれば、無音で埋めた窓として書き出す
+        end = buffer_start + len(buffer)
+        if next_start < end and (not windows or end > windows[-1]['offset_samples'] + window_samples):
+            emit_window(next_start, end - next_start)
+        writer.close()
+    finally:
+        if decoder.poll() is None:
+            decoder.kill()
+            decoder.wait()
+        decoder.stdout.close()
+        decoder.stderr.close()
+        cancel.release(decoder)
+        writer.close()
+
+    index = {
+        'source': os.path.abspath(input_path),
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'dtype': 'int16',
+        'window_samples': window_samples,
+        'hop_samples': hop_samples,
+        'shards': writer.shards,
+        'windows': windows,
+    }
+    # 書き込み途中で終了しても、前回の目次が壊れたり書きかけの目次が残ったりしないようにする
+    job_state.write_json_atomic(os.path.join(output_path, INDEX_FILENAME), index)
+    for shard in writer.shards:
+        cancel.output_done(os.path.join(output_path, shard['file']))
+    logging.info(f"データセットを書き出しました: {len(windows)}窓, {len(writer.shards)}シャード")
+    return len(windows)
@@ -0,0 +1,205 @@
+"""
+出力形式のエンコーダ登録モジュール
+形式ごとのFFmpegエンコーダ・拡張子・ビットレート・VBR品質・エンコード速度・プリセットの指定方法をまとめる
+"""
+
+# 形式ごとの設定
+#   extension: 出力ファイルの拡張子
+#   codec: FFmpegのエンコーダ名
+#   high_bitrate: 「高品質を保持」時のビットレート (Noneはビットレート指定なし)
+#   typical_bit_rate: ビットレート未指定時の目安 (ファイルサイズの見積もり用、Noneは非圧縮相当で見積もる)
+#   vbr_option / vbr_range: VBR品質の指定オプションと範囲 (Noneは非対応)
+#   speed_option / speed_range: エンコード速度の個別指定のオプションと範囲 (Noneは非対応)
+#   presets: エンコーダプリセットごとのアルゴリズム品質の引数 (LAMEの-q、Opusのcomplexity、AACのコーダ・帯域)
+ENCODERS = {
+    'mp3': {
+        'label': 'MP3',
+        'extension': '.mp3',
+        'codec': 'libmp3lame',
+        'high_bitrate': '320k',
+        'typical_bit_rate': 128000,
+        'vbr_option': '-q:a', 'vbr_range': (0, 9),
+        'speed_option': '-compression_level', 'speed_range': (0, 9),
+        'presets': {'fast': ['-compression_level', '7'], 'balanced': ['-compression_level', '3'],
+                    'archival': ['-compression_level', '0']},
+    },
+    'opus': {
+        'label': 'Opus (音声向け・小サイズ)',
+        'extension': '.opus',
+        'codec': 'libopus',
+        'high_bitrate': '192k',
+        'typical_bit_rate': 96000,
+        'vbr_option': None, 'vbr_range': None,
+        'speed_option': '-compression_level', 'speed_range': (0, 10),
+        'presets': {'fast': ['-compression_level', '4'], 'balanced': ['-compression_level', '8'],
+                    'archival': ['-compression_level', '10']},
+    },
+    'aac': {
+        'label': 'AAC (.m4a)',
+        'extension': '.m4a',
+        'codec': 'aac',
+        'high_bitrate': '256k',
+        'typical_bit_rate': 128000,
+        'vbr_option': '-q:a', 'vbr_range': (0.1, 2),
+        'speed_option': None, 'speed_range': None,
+        # 高品質は帯域を20kHzまで残し、ノイズ成分を擬似ノイズに置き換えない (PNS無効)
+        'presets': {'fast': ['-aac_coder', 'fast'], 'balanced': ['-aac_coder', 'twoloop'],
+                    'archival': ['-aac_coder', 'twoloop', '-cutoff', '20000', '-aac_pns', '0']},
+    },
+    'flac': {
+        'label': 'FLAC (可逆圧縮)',
+        'extension': '.flac',
+        'codec': 'flac',
+        'high_bitrate': None,
+        'typical_bit_rate': None,
+        'vbr_option': None, 'vbr_range': None,
+        'speed_option': '-compression_level', 'speed_range': (0, 12),
+        'presets': {'fast': ['-compression_level', '0'], 'balanced': ['-compression_level', '5'],
+                    'archival': ['-compression_level', '8']},
+    },
+    'wav': {
+        'label': 'WAV (非圧縮)',
+        'extension': '.wav',
+        'codec': 'pcm_s16le',
+        'high_bitrate': None,
+        'typical_bit_rate': None,
+        'vbr_option': None, 'vbr_range': None,
+        'speed_option': None, 'speed_range': None,
+        'presets': {},
+    },
+}
+
+
+# エンコーダプリセット (設定値: 表示名)
+ENCODER_PRESETS = {
+    'fast': '高速 (音声の一括処理向け)',
+    'balanced': '標準',
+    'archival': '高品質 (保存用・低速)',
+}
+
+# 入力に合わせる場合に使う標準的なビットレート (kbps)
+STANDARD_KBPS = (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+# 入力のビットレートの揺らぎ (VBR・コンテナのオーバーヘッド) として許容する割合
+MATCH_TOLERANCE = 0.95
+
+
+def get_encoder(output_format):
+    """形式の設定を取得 (不明な形式はエラー)"""
+    if output_format not in ENCODERS:
+        raise ValueError(f"出力形式が不明です: {output_format} (対応形式: {', '.join(ENCODERS)})")
+    return ENCODERS[output_format]
+
+
+def _number_in_range(value, value_range, name):
+    """数値の指定を検証"""
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name}は数値で指定してください: {value}")
+    if not value_range[0] <= number <= value_range[1]:
+        raise ValueError(f"{name}は{value_range[0]}〜{value_range[1]}の範囲で指定してください: {value}")
+    return f"{number:g}"
+
+
+def encoder_args(output_format, bitrate='', vbr_quality='', speed='', preserve_quality=False, preset='balanced'):
+    """形式ごとのFFmpegエンコーダ引数を作成 (空欄の項目はエンコーダの既定値)"""
+    encoder = get_encoder(output_format)
+    if preset not in ENCODER_PRESETS:
+        raise ValueError(f"エンコーダプリセットが不明です: {preset} (対応: {', '.join(ENCODER_PRESETS)})")
+    codec_args = ['-c:a', encoder['codec']]
+    if vbr_quality != '' and vbr_quality is not None:
+        if encoder['vbr_option'] is None:
+            raise ValueError(f"{encoder['label']}はVBR品質の指定に対応していません")
+        codec_args += [encoder['vbr_option'], _number_in_range(vbr_quality, encoder['vbr_range'], "VBR品質")]
+    elif bitrate:
+        if encoder['high_bitrate'] is None:
+            raise ValueError(f"{encoder['label']}はビットレートの指定に対応していません")
+        codec_args += ['-b:a', bitrate]
+    elif preserve_quality and encoder['high_bitrate']:
+        codec_args += ['-b:a', encoder['high_bitrate']]
+    if speed != '' and speed is not None:
+        if encoder['speed_option'] is None:
+            raise ValueError(f"{encoder['label']}はエンコード速度の指定に対応していません")
+        codec_args += [encoder['speed_option'], _number_in_range(speed, encoder['speed_range'], "エンコード速度")]
+    else:
+        # 速度の個別指定が無ければプリセットのアルゴリズム品質を使う
+        codec_args += encoder['presets'].get(preset, [])
+    return codec_args
+
+
+def matched_bitrate(output_format, source_bit_rate, preserve_quality):
+    """入力のビットレートに合わせた出力のビットレート (高品質時は高品質の値、それ以外は目安の値が上限)"""
+    encoder = get_encoder(output_format)
+    if encoder['high_bitrate'] is None or not source_bit_rate:
+        return ''
+    source_kbps = source_bit_rate / 1000 * MATCH_TOLERANCE
+    kbps = next((k for k in STANDARD_KBPS if k >= source_kbps), STANDARD_KBPS[-1])
+    ceiling = parse_bitrate(encoder['high_bitrate']) if preserve_quality else encoder['typical_bit_rate']
+    return f"{min(kbps * 1000, ceiling) // 1000}k"
+
+
+def _positive_int(value, name):
+    """サンプリングレート・チャンネル数の指定を検証 (空欄はNone)"""
+    if value == '' or value is None:
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name}は整数で指定してください: {value}")
+    if number <= 0:
+        raise ValueError(f"{name}は1以上で指定してください: {value}")
+    return number
+
+
+def resolve(settings, source=None):
+    """設定と入力の情報 (audio_probe.probeの結果) から出力形式 (形式名・拡張子・エンコーダ引数) を決める"""
+    output_format = settings['output_format']
+    encoder = get_encoder(output_format)
+    bitrate = settings['output_bitrate']
+    # ビットレートの指定が無ければ入力のビットレートに合わせる (低ビットレートの入力を320kbpsに膨らませない)
+    if not bitrate and settings['output_vbr_quality'] == '' and settings['match_source'] and source:
+        bitrate = matched_bitrate(output_format, source.get('bit_rate'), settings['preserve_quality'])
+    codec_args = encoder_args(output_format, bitrate, settings['output_vbr_quality'],
+                              settings['output_speed'], settings['preserve_quality'], settings['encoder_preset'])
+    # サンプリングレート・チャンネル数は指定が無ければ入力のまま (FFmpegの既定動作) にする
+    sample_rate = _positive_int(settings['output_sample_rate'], "出力のサンプリングレート")
+    channels = _positive_int(settings['output_channels'], "出力のチャンネル数")
+    if sample_rate:
+        codec_args += ['-ar', str(sample_rate)]
+    if channels:
+        codec_args += ['-ac', str(channels)]
+    return {
+        'format': output_format,
+        'extension': encoder['extension'],
+        'codec_args': codec_args,
+        'preset': settings['encoder_preset'],
+        'preserve_quality': settings['preserve_quality'],
+        # 同時出力でビットレートの指定が無い形式も、同じ規則で入力のビットレートに合わせる
+        'source_bit_rate': (source or {}).get('bit_rate') if settings['match_source'] else None,
+        'sample_rate': sample_rate,
+        'channels': channels,
+    }
+
+
+def parse_bitrate(bitrate):
+    """ビットレートの指定 ("128k" など) をbpsに変換"""
+    text = bitrate.strip().lower()
+    if text.endswith('k'):
+        return int(float(text[:-1]) * 1000)
+    if text.endswith('m'):
+        return int(float(text[:-1]) * 1000 * 1000)
+    return int(text)
+
+
+def estimated_bit_rate(encoding, sample_rate, channels):
+    """書き出すファイルのビットレートの目安 (bps)"""
+    codec_args = encoding['codec_args']
+    if '-b:a' in codec_args:
+        return parse_bitrate(codec_args[codec_args.index('-b:a') + 1])
+    encoder = ENCODERS[encoding['format']]
+    if encoder['vbr_option'] in codec_args:
+        # VBRは内容によって変動するため、高品質時のビットレートを上限として見積もる
+        return parse_bitrate(encoder['high_bitrate'])
+    typical = encoder['typical_bit_rate']
+    # 可逆・非圧縮の形式は非圧縮PCMのビットレートを上限として見積もる
+    return typical or (encoding['sample_rate'] or sample_rate) * (encoding['channels'] or channels) * 16
@@ -0,0 +1,67 @@
+"""
+ジョブ状態の保存モジュール
+処理中・一時停止中のジョブ (入力・出力・設定) を保存し、アプリを再起動しても同じ設定で再開できるようにする
+(書き出し済みのパートは出力フォルダのマニフェストで判定して飛ばす)
+"""
+
+import os
+import json
+import logging
+import threading
+
+JOB_FILENAME = '.audio-splitter-job.json'
+
+
+def write_json_atomic(path, data):
+    """一時ファイルに書いてから置き換える (書き込み途中で終了しても壊れない)"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class SavedJob:
+    """1件のジョブの状態をJSONファイルに保存する"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"ジョブ状態ファイルの読み込みに失敗したため破棄します: {str(e)}")
+
+    def resumable(self):
+        """前回の処理が完了せずに終了している (一時停止中・処理中に終了した) かどうか"""
+        return self.data is not None and self.data.get('status') in ('running', 'paused')
+
+    def start(self, input_path, output_path, settings):
+        """新しいジョブを記録"""
+        with self.lock:
+            self.data = {'input': input_path, 'output': output_path, 'settings': settings, 'status': 'running'}
+            self._save()
+
+    def set_status(self, status):
+        """ジョブの状態 (running・paused) を保存"""
+        with self.lock:
+            if self.data is None:
+                return
+            self.data['status'] = status
+            self._save()
+
+    def clear(self):
+        """完了・中止したジョブの記録を削除"""
+        with self.lock:
+            self.data = None
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _save(self):
+        write_json_atomic(self.path, self.data)
@@ -0,0 +1,131 @@
+"""
+出力マニフェストモジュール
+出力フォルダに分割計画・出力に影響する設定・パートごとの書き出し状態 (サイズ・ハッシュ) を保存し、
+同じ入力・設定で再実行した時に書き出し済みのパートを検証して飛ばせるようにする
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+import job_state
+
+# マニフェストのファイル名 (出力フォルダに「.入力ファイル名.audio-splitter.json」として保存)
+MANIFEST_SUFFIX = '.audio-splitter.json'
+
+# 出力ファイルの内容に影響する設定 (並列数・キャッシュなどは出力が変わらないため含めない)
+OUTPUT_PARAMETERS = (
+    'split_duration', 'preserve_quality', 'split_engine', 'snap_window_sec', 'split_mode',
+    'min_part_minutes', 'max_part_minutes', 'max_part_mb', 'cutlist_path', 'renditions',
+    'output_format', 'output_bitrate', 'output_vbr_quality', 'output_speed', 'match_source',
+    'output_sample_rate', 'output_channels', 'encoder_preset',
+)
+
+# 書き出し状態を保存する最短間隔 (秒)、多数のパートで毎回fsyncしないようにする
+SAVE_INTERVAL = 1.0
+# ハッシュ計算時の読み込み単位 (バイト)
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def manifest_path(input_path, output_path):
+    """入力ファイルに対応するマニフェストのパス"""
+    return os.path.join(output_path, f".{Path(input_path).stem}{MANIFEST_SUFFIX}")
+
+
+def source_key(input_path, settings):
+    """入力ファイルと出力に影響する設定 (これが前回と一致する場合だけ書き出し済みのパートを再利用する)"""
+    stat = os.stat(input_path)
+    key = {
+        'input': os.path.realpath(input_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'parameters': {name: settings[name] for name in OUTPUT_PARAMETERS},
+    }
+    if settings['split_mode'] == 'cutlist':
+        # 同じパスのカットリストが編集された場合も最初から書き出す
+        cutlist_stat = os.stat(settings['cutlist_path'])
+        key['cutlist'] = [cutlist_stat.st_size, cutlist_stat.st_mtime_ns]
+    return key
+
+
+def file_hash(path):
+    """ファイルのSHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """1つの入力ファイルの分割計画と書き出し状態"""
+
+    def __init__(self, input_path, output_path, settings):
+        self.path = manifest_path(input_path, output_path)
+        self.output_path = output_path
+        self.key = source_key(input_path, settings)
+        self.lock = threading.Lock()
+        self.saved_at = 0.0
+        self.data = self._load()
+
+    def _load(self):
+        """前回のマニフェストを読み込む (入力・設定が異なる場合はNone)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"マニフェストの読み込みに失敗したため、最初から書き出します: {str(e)}")
+            return None
+        if data.get('key') != self.key:
+            logging.info("入力ファイルまたは設定が前回と異なるため、最初から書き出します")
+            return None
+        return data
+
+    @property
+    def plan(self):
+        """前回と同じ入力・設定の場合は保存済みの分割計画 (それ以外はNone)"""
+        return self.data['plan'] if self.data else None
+
+    def start(self, parts):
+        """新しい分割計画を記録 (前回の書き出し状態は破棄する)"""
+        with self.lock:
+            self.data = {'key': self.key, 'plan': parts, 'status': 'running', 'outputs': {}}
+            self._save()
+
+    def verified(self, path):
+        """出力ファイルが書き出し完了時のサイズ・ハッシュのまま残っているかどうか"""
+        with self.lock:
+            entry = self.data['outputs'].get(os.path.relpath(path, self.output_path))
+        if entry is None or entry['status'] != 'done':
+            return False
+        try:
+            if os.path.getsize(path) != entry['size']:
+                return False
+            return file_hash(path) == entry['sha256']
+        except OSError:
+            return False
+
+    def add_output(self, path):
+        """書き出しが完了した出力ファイルのサイズ・ハッシュを記録"""
+        entry = {'status': 'done', 'size': os.path.getsize(path), 'sha256': file_hash(path)}
+        with self.lock:
+            self.data['outputs'][os.path.relpath(path, self.output_path)] = entry
+            if time.monotonic() - self.saved_at >= SAVE_INTERVAL:
+                self._save()
+
+    def save(self, status=None):
+        """書き出し状態を保存 (statusを渡すとジョブの状態も更新する)"""
+        with self.lock:
+            if status is not None:
+                self.data['status'] = status
+            self._save()
+
+    def _save(self):
+        job_state.write_json_atomic(self.path, self.data)
+        self.saved_at = time.monotonic()
@@ -0,0 +1,395 @@
+"""
+MPEGオーディオ (Layer III) フレーム解析モジュール
+デコードやサブプロセスを使わずに、MP3をフレーム境界のバイト範囲で分割する
+"""
+
+import os
+import struct
+from functools import lru_cache
+
+# ビットレート表 (kbps) : MPEG-1 / MPEG-2・2.5 の Layer III
+BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+# サンプリングレート表 (バージョンID別)
+SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+# 同一ストリームとみなすヘッダのビット (同期・バージョン・レイヤー・サンプリングレート)
+STREAM_MASK = 0xFFFE0C00
+
+# LAMEタグ内の各フィールドの位置 (LAMEタグ先頭からのオフセット)
+LAME_TAG_SIZE = 36
+LAME_DELAY_OFFSET = 21
+LAME_MUSIC_LENGTH_OFFSET = 28
+LAME_TAG_CRC_OFFSET = 34
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+# 目次 (チェックポイント) を記録するフレーム間隔 (44.1kHzで約1秒)
+CHECKPOINT_INTERVAL = 38
+
+
+def _build_crc16_table():
+    """CRC-16 (多項式0x8005, LAMEタグと同じ方式) のテーブルを作成"""
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+_CRC16_TABLE = _build_crc16_table()
+
+
+def crc16(data, crc=0):
+    """LAMEタグで使われるCRC-16を計算"""
+    table = _CRC16_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+@lru_cache(maxsize=4096)
+def parse_header(header):
+    """32bitのフレームヘッダを解析 (Layer III以外や不正な値はNone)"""
+    if header & 0xFFE00000 != 0xFFE00000:
+        return None
+    version_id = (header >> 19) & 0x3
+    layer = (header >> 17) & 0x3
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0x3
+    if version_id == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version_id == 3
+    bitrate = (BITRATES_V1 if mpeg1 else BITRATES_V2)[bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version_id][sample_rate_index]
+    padding = (header >> 9) & 0x1
+    mono = (header >> 6) & 0x3 == 3
+    samples = 1152 if mpeg1 else 576
+
+    if mpeg1:
+        side_info_size = 17 if mono else 32
+    else:
+        side_info_size = 9 if mono else 17
+
+    return {
+        'version_id': version_id,
+        'bitrate': bitrate,
+        'bitrate_index': bitrate_index,
+        'sample_rate': sample_rate,
+        'samples': samples,
+        'channels': 1 if mono else 2,
+        'side_info_size': side_info_size,
+        'protected': not (header >> 16) & 0x1,
+        'frame_size': samples // 8 * bitrate // sample_rate + padding,
+    }
+
+
+def _syncsafe(data):
+    """ID3v2の同期安全整数を変換"""
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def find_audio_range(f):
+    """ID3v2/ID3v1/APEタグを除いた音声データの範囲 (開始, 終了) を取得"""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+
+    # 先頭のID3v2タグ (複数連続している場合もある)
+    start = 0
+    while True:
+        f.seek(start)
+        tag = f.read(10)
+        if len(tag) < 10 or tag[:3] != b'ID3':
+            break
+        start += 10 + _syncsafe(tag[6:10]) + (10 if tag[5] & 0x10 else 0)
+
+    # 末尾のID3v1タグ (拡張タグ "TAG+" を含む)
+    if end - start >= 128:
+        f.seek(end - 128)
+        if f.read(3) == b'TAG':
+            end -= 128
+            if end - start >= 227:
+                f.seek(end - 227)
+                if f.read(4) == b'TAG+':
+                    end -= 227
+
+    # 末尾のAPEタグ
+    if end - start >= 32:
+        f.seek(end - 32)
+        footer = f.read(32)
+        if footer[:8] == b'APETAGEX':
+            tag_size, _, flags = struct.unpack('<III', footer[12:24])
+            end -= tag_size + (32 if flags & 0x80000000 else 0)
+
+    return start, max(start, end)
+
+
+def iter_frames(f, start, end):
+    """指定範囲のフレームを (オフセット, ヘッダ情報) として順に返す"""
+    pos = start
+    buf = b''
+    buf_start = start
+    while pos + 4 <= end:
+        if pos + 4 > buf_start + len(buf):
+            f.seek(pos)
+            buf = f.read(min(READ_BLOCK_SIZE, end - pos))
+            buf_start = pos
+            if len(buf) < 4:
+                return
+
+        i = pos - buf_start
+        header_int = int.from_bytes(buf[i:i + 4], 'big')
+        header = parse_header(header_int)
+        if header is not None and pos + header['frame_size'] <= end:
+            # 次のフレームヘッダが読める場合は整合性も確認 (誤同期の防止)
+            j = i + header['frame_size']
+            if j + 4 > len(buf) or \
+                    int.from_bytes(buf[j:j + 4], 'big') & STREAM_MASK == header_int & STREAM_MASK:
+                yield pos, header
+                pos += header['frame_size']
+                continue
+
+        # 同期が外れた場合は次の0xFFを探す
+        next_sync = buf.find(b'\xff', i + 1)
+        pos = buf_start + (next_sync if next_sync >= 0 else len(buf))
+
+
+def read_vbr_tag(f, offset, header):
+    """先頭フレームのXing/Info/VBRIタグを解析 (無ければNone)"""
+    f.seek(offset)
+    frame = f.read(header['frame_size'])
+    xing_offset = 4 + header['side_info_size'] + (2 if header['protected'] else 0)
+    tag_id = frame[xing_offset:xing_offset + 4]
+
+    if tag_id in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', frame[xing_offset + 4:xing_offset + 8])[0]
+        pos = xing_offset + 8
+        info = {'vbr': tag_id == b'Xing', 'lame': None}
+        if flags & 0x1:
+            info['frames'] = struct.unpack('>I', frame[pos:pos + 4])[0]
+            pos += 4
+        if flags & 0x2:
+            info['bytes'] = struct.unpack('>I', frame[pos:pos + 4])[0]
+            pos += 4
+        if flags & 0x4:
+            pos += 100
+        if flags & 0x8:
+            pos += 4
+        lame = frame[pos:pos + LAME_TAG_SIZE]
+        if len(lame) == LAME_TAG_SIZE and lame[:4].isalpha():
+            info['lame'] = lame
+        return info
+
+    if frame[36:40] == b'VBRI':
+        return {
+            'vbr': True,
+            'lame': None,
+            'bytes': struct.unpack('>I', frame[46:50])[0],
+            'frames': struct.unpack('>I', frame[50:54])[0],
+        }
+    return None
+
+
+def build_index(path, checkpoint_interval=CHECKPOINT_INTERVAL):
+    """MP3ファイルを走査してフレームの目次を作成"""
+    with open(path, 'rb') as f:
+        audio_start, audio_end = find_audio_range(f)
+        f.seek(0)
+        id3v2_size = audio_start
+
+        frames = iter_frames(f, audio_start, audio_end)
+        first = next(frames, None)
+        if first is None:
+            raise ValueError("MPEGオーディオ (Layer III) のフレームが見つかりません")
+
+        first_offset, first_header = first
+        vbr_tag = read_vbr_tag(f, first_offset, first_header)
+        enc_delay = enc_padding = 0
+        lame = None
+        if vbr_tag is not None:
+            # タグフレームは音声として扱わない
+            lame = vbr_tag['lame']
+            if lame is not None:
+                delay_bits = int.from_bytes(lame[LAME_DELAY_OFFSET:LAME_DELAY_OFFSET + 3], 'big')
+                enc_delay, enc_padding = delay_bits >> 12, delay_bits & 0xFFF
+            first = next(frames, None)
+            if first is None:
+                raise ValueError("音声フレームが含まれていません")
+
+        offset, header = first
+        checkpoints = [offset]
+        bitrates = {header['bitrate']}
+        last_end = offset + header['frame_size']
+        frame_count = 1
+        for offset, header in frames:
+            if frame_count % checkpoint_interval == 0:
+                checkpoints.append(offset)
+            bitrates.add(header['bitrate'])
+            last_end = offset + header['frame_size']
+            frame_count += 1
+
+    total_samples = frame_count * first_header['samples']
+    return {
+        'id3v2_size': id3v2_size,
+        'audio_start': checkpoints[0],
+        'audio_end': last_end,
+        'frame_count': frame_count,
+        'samples_per_frame': first_header['samples'],
+        'sample_rate': first_header['sample_rate'],
+        'channels': first_header['channels'],
+        'vbr': len(bitrates) > 1,
+        'bit_rate': bitrates.pop() if len(bitrates) == 1 else
+            int((last_end - checkpoints[0]) * 8 * first_header['sample_rate'] / total_samples),
+        'duration_ms': int(max(0, total_samples - enc_delay - enc_padding) * 1000 / first_header['sample_rate']),
+        'enc_delay': enc_delay,
+        'enc_padding': enc_padding,
+        'lame_tag': lame.hex() if lame is not None else '',
+        'checkpoint_interval': checkpoint_interval,
+        'checkpoints': checkpoints,
+    }
+
+
+def frame_offset(f, index, frame_no):
+    """フレーム番号に対応するバイトオフセットを取得"""
+    if frame_no >= index['frame_count']:
+        return index['audio_end']
+    checkpoint, remainder = divmod(frame_no, index['checkpoint_interval'])
+    pos = index['checkpoints'][checkpoint]
+    if remainder:
+        for n, (offset, header) in enumerate(iter_frames(f, pos, index['audio_end'])):
+            if n == remainder:
+                return offset
+        return index['audio_end']
+    return pos
+
+
+def ms_to_frame(index, ms):
+    """時刻 (ミリ秒) に最も近いフレーム境界のフレーム番号を取得"""
+    # 先頭はエンコーダ遅延の途中から音声が始まるため、丸めで先頭フレームを落とさないよう常にフレーム0とする
+    if ms <= 0:
+        return 0
+    samples = ms * index['sample_rate'] / 1000 + index['enc_delay']
+    frame_no = int(samples / index['samples_per_frame'] + 0.5)
+    return max(0, min(frame_no, index['frame_count']))
+
+
+def frame_to_ms(index, frame_no):
+    """フレーム境界の時刻 (ミリ秒) を取得 (ms_to_frameの逆変換)"""
+    samples = frame_no * index['samples_per_frame'] - index['enc_delay']
+    return max(0, int(samples * 1000 / index['sample_rate']))
+
+
+def size_limited_cuts(f, index, max_bytes):
+    """各パートの音声データがmax_bytes以下に収まる区切りのフレーム番号を、フレームサイズを積算して求める"""
+    cuts = []
+    part_bytes = 0
+    for frame_no, (offset, header) in enumerate(iter_frames(f, index['audio_start'], index['audio_end'])):
+        if part_bytes > 0 and part_bytes + header['frame_size'] > max_bytes:
+            cuts.append(frame_no)
+            part_bytes = 0
+        part_bytes += header['frame_size']
+    return cuts
+
+
+def _build_tag_frame(header, vbr, frame_count, stream_bytes, toc, lame, enc_delay, enc_padding, music_crc):
+    """分割パート用のXing/Info + LAMEタグフレームを作成"""
+    # タグが収まる最小のビットレートを選ぶ (パディングなし・CRCなし)
+    header_int = (header['template'] & ~0xF200) | 0x10000
+    xing_offset = 4 + header['side_info_size']
+    required = xing_offset + 120 + LAME_TAG_SIZE
+    for bitrate_index in range(1, 15):
+        candidate = header_int | (bitrate_index << 12)
+        info = parse_header(candidate)
+        if info['frame_size'] >= required:
+            break
+    header_int = candidate
+    frame_size = info['frame_size']
+
+    toc_bytes = bytes(toc)
+    frame = bytearray(frame_size)
+    frame[0:4] = header_int.to_bytes(4, 'big')
+    frame[xing_offset:xing_offset + 4] = b'Xing' if vbr else b'Info'
+    struct.pack_into('>III', frame, xing_offset + 4, 0x0F, frame_count, stream_bytes + frame_size)
+    frame[xing_offset + 16:xing_offset + 116] = toc_bytes
+    struct.pack_into('>I', frame, xing_offset + 116, 0)
+
+    # LAMEタグ (元ファイルのタグを引き継ぎ、パート固有の値を書き換える)
+    lame_offset = xing_offset + 120
+    tag = bytearray(lame if lame is not None else b'LAME3.100'.ljust(LAME_TAG_SIZE, b'\x00'))
+    tag[11:19] = bytes(8)  # ピーク・リプレイゲインはパート単位では無効
+    delay_bits = (min(enc_delay, 0xFFF) << 12) | min(enc_padding, 0xFFF)
+    tag[LAME_DELAY_OFFSET:LAME_DELAY_OFFSET + 3] = delay_bits.to_bytes(3, 'big')
+    struct.pack_into('>IH', tag, LAME_MUSIC_LENGTH_OFFSET, stream_bytes + frame_size, music_crc)
+    frame[lame_offset:lame_offset + LAME_TAG_SIZE] = tag
+    crc_pos = lame_offset + LAME_TAG_CRC_OFFSET
+    struct.pack_into('>H', frame, crc_pos, crc16(frame[:crc_pos]))
+    return bytes(frame)
+
+
+def write_part(f, index, first_frame, end_frame, output_path, id3v2_tag=b'', cancel=None):
+    """フレーム範囲 [first_frame, end_frame) をXing/LAMEタグ付きで書き出す (cancelを渡すとブロックごとに中断を確認)"""
+    start = frame_offset(f, index, first_frame)
+    end = frame_offset(f, index, end_frame)
+
+    # パート内のフレーム位置とビットレートを収集 (TOC・VBR判定用)
+    offsets = []
+    bitrates = set()
+    template = None
+    for offset, header in iter_frames(f, start, end):
+        if template is None:
+            f.seek(offset)
+            template = int.from_bytes(f.read(4), 'big')
+        offsets.append(offset - start)
+        bitrates.add(header['bitrate'])
+    if not offsets:
+        raise ValueError("書き出すフレームがありません")
+
+    stream_bytes = end - start
+    first_header = dict(parse_header(template), template=template)
+    lame = bytes.fromhex(index['lame_tag']) if index.get('lame_tag') else None
+    enc_delay = index['enc_delay'] if first_frame == 0 else 0
+    enc_padding = index['enc_padding'] if end_frame >= index['frame_count'] else 0
+
+    with open(output_path, 'wb') as out:
+        if id3v2_tag:
+            out.write(id3v2_tag)
+
+        # タグフレームのサイズはTOCに依存しないため、先に確定させてから書き込む
+        tag_size = len(_build_tag_frame(first_header, False, 0, 0, [0] * 100, lame, 0, 0, 0))
+        total = stream_bytes + tag_size
+        toc = []
+        for i in range(100):
+            frame_pos = tag_size + offsets[i * len(offsets) // 100]
+            toc.append(min(255, frame_pos * 256 // total))
+
+        # 音声データのCRCはPythonでの計算がディスク速度に追いつかないため0 (未設定) とする
+        out.write(_build_tag_frame(first_header, len(bitrates) > 1, len(offsets), stream_bytes,
+                                   toc, lame, enc_delay, enc_padding, 0))
+
+        f.seek(start)
+        remaining = stream_bytes
+        while remaining > 0:
+            if cancel is not None:
+                cancel.check()
+            block = f.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            out.write(block)
+            remaining -= len(block)
+
+    return len(offsets)
+
+
+def read_id3v2(f, index):
+    """元ファイル先頭のID3v2タグをそのまま取得"""
+    if not index.get('id3v2_size'):
+        return b''
+    f.seek(0)
+    return f.read(index['id3v2_size'])
@@ -0,0 +1,185 @@
+"""
+デコード済みPCMのキャッシュモジュール
+同じ音声を異なる分割時間で何度も分割する場合に、デコードを省いてメモリマップで再利用する
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import logging
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.path.join(script_dir, 'pcm_cache')
+
+# フィンガープリントに使う先頭・中央・末尾の読み取りサイズ (バイト)
+FINGERPRINT_SAMPLE_SIZE = 1024 * 1024
+
+
+def fingerprint(path):
+    """ファイル内容のフィンガープリントを作成 (サイズ・更新日時と先頭・中央・末尾のハッシュ)"""
+    stat = os.stat(path)
+    size = stat.st_size
+    # 読み取らない範囲だけを同じサイズのまま書き換えた場合も別のキーになるよう、更新日時も含める
+    digest = hashlib.blake2b(f"{size}:{stat.st_mtime_ns}".encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        for offset in (0, size // 2, size - FINGERPRINT_SAMPLE_SIZE):
+            f.seek(max(0, offset))
+            digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def _entry_paths(key):
+    """キャッシュエントリのPCMファイルとメタ情報ファイルのパス"""
+    return os.path.join(cache_dir, f"{key}.pcm"), os.path.join(cache_dir, f"{key}.json")
+
+
+def lookup(path, sample_rate=None, channels=None, sample_width=None):
+    """キャッシュ済みPCMを検索 (見つかれば (PCMファイルパス, メタ情報))"""
+    try:
+        pcm_path, meta_path = _entry_paths(fingerprint(path))
+        if not os.path.exists(pcm_path) or not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        # 要求されたPCM形式と異なるキャッシュは使わない
+        for name, value in (('sample_rate', sample_rate), ('channels', channels), ('sample_width', sample_width)):
+            if value is not None and meta[name] != value:
+                return None
+        # 最終利用日時を更新 (LRU削除の基準)
+        os.utime(pcm_path)
+        logging.info(f"デコード済みPCMのキャッシュを使用: {pcm_path}")
+        return pcm_path, meta
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"PCMキャッシュの読み込みに失敗: {str(e)}")
+        return None
+
+
+class CacheWriter:
+    """デコード結果を一時ファイルに書き込み、完了時にキャッシュとして登録する"""
+
+    def __init__(self, path, sample_rate, channels, sample_width, budget_bytes):
+        self.key = fingerprint(path)
+        self.meta = {
+            'source': os.path.realpath(path),
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'sample_width': sample_width
+        }
+        self.budget_bytes = budget_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.pcm_path, self.meta_path = _entry_paths(self.key)
+        self.temp_path = f"{self.pcm_path}.{os.getpid()}.tmp"
+        self.file = open(self.temp_path, 'wb')
+        self.size = 0
+
+    def write(self, data):
+        """PCMデータを追記"""
+        self.file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        """書き込みを完了してキャッシュに登録"""
+        self.file.close()
+        if self.size > self.budget_bytes:
+            logging.info("デコード結果がキャッシュ容量の上限を超えるため保存しません")
+            self.abort()
+            return
+        evict(self.budget_bytes - self.size)
+        os.replace(self.temp_path, self.pcm_path)
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        logging.info(f"デコード済みPCMをキャッシュに保存: {self.pcm_path} ({self.size / (1024 * 1024):.1f}MB)")
+
+    def abort(self):
+        """書き込みを中止して一時ファイルを削除"""
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+def evict(budget_bytes):
+    """合計サイズが上限に収まるまで最終利用の古いエントリから削除"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.pcm'):
+            pcm_path = os.path.join(cache_dir, name)
+            stat = os.stat(pcm_path)
+            entries.append((stat.st_mtime, stat.st_size, pcm_path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, pcm_path in sorted(entries):
+        if total <= budget_bytes:
+            break
+        for remove_path in (pcm_path, pcm_path[:-len('.pcm')] + '.json'):
+            try:
+                os.remove(remove_path)
+            except OSError:
+                pass
+        total -= size
+        logging.debug(f"PCMキャッシュを削除: {pcm_path}")
+
+
+def store_pcm(path, audio, budget_bytes):
+    """デコード済みのPCMAudioをキャッシュに保存"""
+    writer = CacheWriter(path, audio.sample_rate, audio.channels, audio.sample_width, budget_bytes)
+    try:
+        writer.write(audio.data)
+        writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+
+
+class PCMAudio:
+    """メモリ上のPCMをミリ秒単位で切り出す"""
+
+    def __init__(self, data, sample_rate, channels, sample_width=2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_bytes = self.channels * self.sample_width
+        self.data = data
+
+    def __len__(self):
+        """再生時間 (ミリ秒)"""
+        return round(len(self.data) / self.frame_bytes * 1000 / self.sample_rate)
+
+    def byte_offset(self, ms):
+        """時刻 (ミリ秒) に対応するバイト位置"""
+        return min(int(ms * self.sample_rate / 1000) * self.frame_bytes, len(self.data))
+
+    def pcm(self, start_ms, end_ms=None):
+        """指定区間のPCMを取り出す (end_msがNoneなら末尾まで)"""
+        start = self.byte_offset(start_ms)
+        end = len(self.data) if end_ms is None else self.byte_offset(end_ms)
+        return self.data[start:end]
+
+    def close(self):
+        """解放するリソースは無い (MappedAudioと同じように扱うため)"""
+
+
+class MappedAudio(PCMAudio):
+    """キャッシュ済みPCMをメモリマップし、PCMAudioと同様にミリ秒単位で切り出す"""
+
+    def __init__(self, pcm_path, meta):
+        self.file = open(pcm_path, 'rb')
+        data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(data, meta['sample_rate'], meta['channels'], meta['sample_width'])
+
+    def close(self):
+        """メモリマップを解放"""
+        self.data.close()
+        self.file.close()
+
+
+def load(path, sample_rate=None, channels=None, sample_width=None):
+    """キャッシュ済みPCMをMappedAudioとして開く (無ければNone)"""
+    found = lookup(path, sample_rate, channels, sample_width)
+    if found is None:
+        return None
+    return MappedAudio(*found)
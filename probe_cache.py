@@ -0,0 +1,93 @@
+"""
+音声ファイル情報の永続キャッシュモジュール
+解析結果をパス・サイズ・更新日時をキーにSQLiteへ保存し、同じファイルの再解析を省く
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import closing
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+cache_file = os.path.join(script_dir, 'probe_cache.sqlite3')
+
+# キャッシュ全体のデータサイズ上限 (バイト)、超えた分は最終利用が古いものから削除
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+
+def _connect():
+    """キャッシュDBに接続 (テーブルが無ければ作成)"""
+    conn = sqlite3.connect(cache_file, timeout=5)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            path TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (path, kind)
+        )
+    """)
+    return conn
+
+
+def _file_key(file_path):
+    """キャッシュのキー (絶対パス, サイズ, 更新日時) を取得"""
+    resolved = os.path.realpath(file_path)
+    stat = os.stat(resolved)
+    return resolved, stat.st_size, stat.st_mtime_ns
+
+
+def get(file_path, kind):
+    """キャッシュされた値を取得 (無い場合やファイルが変更されている場合はNone)"""
+    try:
+        path, size, mtime_ns = _file_key(file_path)
+        with closing(_connect()) as conn, conn:
+            row = conn.execute("SELECT size, mtime_ns, data FROM entries WHERE path = ? AND kind = ?",
+                               (path, kind)).fetchone()
+            if row is None:
+                return None
+            if row[0] != size or row[1] != mtime_ns:
+                conn.execute("DELETE FROM entries WHERE path = ? AND kind = ?", (path, kind))
+                return None
+            conn.execute("UPDATE entries SET last_used = ? WHERE path = ? AND kind = ?",
+                         (time.time(), path, kind))
+            logging.debug(f"キャッシュを使用: {kind} {path}")
+            return json.loads(row[2])
+    except (OSError, sqlite3.Error, ValueError) as e:
+        logging.warning(f"キャッシュの読み込みに失敗: {str(e)}")
+        return None
+
+
+def put(file_path, kind, value):
+    """値をキャッシュに保存し、上限を超えた古いエントリを削除"""
+    try:
+        path, size, mtime_ns = _file_key(file_path)
+        data = json.dumps(value, ensure_ascii=False)
+        with closing(_connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                         (path, kind, size, mtime_ns, data, time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM entries").fetchone()[0]
+            if total > MAX_CACHE_BYTES:
+                # 最終利用が古いものから上限に収まるまで削除 (LRU)
+                rows = conn.execute("SELECT path, kind, LENGTH(data) FROM entries ORDER BY last_used").fetchall()
+                for old_path, old_kind, length in rows:
+                    if total <= MAX_CACHE_BYTES:
+                        break
+                    conn.execute("DELETE FROM entries WHERE path = ? AND kind = ?", (old_path, old_kind))
+                    total -= length
+                    logging.debug(f"キャッシュを削除: {old_kind} {old_path}")
+    except (OSError, sqlite3.Error, TypeError, ValueError) as e:
+        logging.warning(f"キャッシュの保存に失敗: {str(e)}")
+
+
+def cached(file_path, kind, compute):
+    """キャッシュがあればそれを返し、無ければcomputeで計算して保存"""
+    value = get(file_path, kind)
+    if value is None:
+        value = compute(file_path)
+        put(file_path, kind, value)
+    return value
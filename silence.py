@@ -0,0 +1,276 @@
+"""
+無音検出モジュール
+低サンプリングレートのモノラルPCMからNumPyでRMSエンベロープを計算し、分割位置を無音に合わせる
+"""
+
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# 解析用のPCM形式 (話し声の無音判定には8kHzモノラルで十分)
+ANALYSIS_RATE = 8000
+# エンベロープの1フレームの長さ (ミリ秒)
+FRAME_MS = 10
+FRAME_SAMPLES = ANALYSIS_RATE * FRAME_MS // 1000
+# 子音の一瞬の途切れを無音と誤判定しないよう、この長さで平滑化する (ミリ秒)
+SMOOTH_MS = 50
+# 入力側シークの直後はデコーダの立ち上がりで無音 (MP3で約40ms) が出るため、区間の手前から余分にデコードして捨てる (ミリ秒)
+PREROLL_MS = 500
+
+
+def require_numpy():
+    """NumPyを読み込む (起動時には読み込まず、無音位置の検出を使う時だけ読み込む、無い場合はエラー)"""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("無音位置の検出にはNumPyが必要です (pip install numpy)")
+    return numpy
+
+
+def analysis_command(input_path, start_ms=0, duration_ms=None):
+    """解析用に低サンプリングレートのモノラルPCMを標準出力へ流すFFmpegコマンドを作成"""
+    ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+    cmd = [ffmpeg_path, '-v', 'error']
+    if start_ms > 0:
+        cmd += ['-ss', f"{start_ms / 1000:.3f}"]
+    if duration_ms is not None:
+        cmd += ['-t', f"{duration_ms / 1000:.3f}"]
+    return cmd + [
+        '-i', input_path,
+        '-map', '0:a:0', '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', str(ANALYSIS_RATE), '-ac', '1',
+        'pipe:1'
+    ]
+
+
+def rms_envelope(samples):
+    """PCMサンプル列からフレームごとのRMSレベル (dBFS) を計算 (端数のサンプルは切り捨て)"""
+    np = require_numpy()
+    frame_count = len(samples) // FRAME_SAMPLES
+    frames = samples[:frame_count * FRAME_SAMPLES].astype(np.float32).reshape(frame_count, FRAME_SAMPLES)
+    rms = np.sqrt(np.mean(np.square(frames / 32768.0), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+
+def smooth(envelope, width_ms=SMOOTH_MS, mode='same'):
+    """エンベロープを移動平均で平滑化 (mode='valid'は両端の窓が欠ける位置を含めない)"""
+    np = require_numpy()
+    width = max(1, width_ms // FRAME_MS)
+    if width == 1 or len(envelope) < width:
+        return envelope
+    return np.convolve(envelope, np.ones(width, dtype=np.float32) / width, mode=mode)
+
+
+def window_envelope(input_path, start_ms, duration_ms, cancel):
+    """指定区間だけをデコードしてエンベロープを計算 (シーク直後のデコーダの立ち上がり分は捨てる)"""
+    np = require_numpy()
+    preroll_ms = min(start_ms, PREROLL_MS) // FRAME_MS * FRAME_MS
+    try:
+        stdout = cancel.run(analysis_command(input_path, start_ms - preroll_ms, duration_ms + preroll_ms))
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"無音検出用のデコードに失敗しました: {e.stderr}")
+    return rms_envelope(np.frombuffer(stdout, dtype='<i2'))[preroll_ms // FRAME_MS:]
+
+
+def quietest_point(input_path, boundary_ms, window_ms, total_ms, cancel):
+    """分割位置の前後window_msの範囲で最も静かな時刻 (ミリ秒) を探す"""
+    np = require_numpy()
+    start_ms = max(0, boundary_ms - window_ms)
+    end_ms = min(total_ms, boundary_ms + window_ms)
+    raw = window_envelope(input_path, start_ms, end_ms - start_ms, cancel)
+    # 区間外を0として平均すると両端のレベルが歪むため、窓が区間内に収まる位置だけを使う
+    envelope = smooth(raw, mode='valid')
+    if len(envelope) == 0:
+        return boundary_ms
+    # 同じレベルなら元の分割位置に近い方を選ぶ
+    first_frame = (len(raw) - len(envelope)) // 2
+    offsets = start_ms + (first_frame + np.arange(len(envelope))) * FRAME_MS + FRAME_MS // 2
+    order = np.lexsort((np.abs(offsets - boundary_ms), np.round(envelope, 1)))
+    return int(offsets[order[0]])
+
+
+def snap_parts(input_path, parts, window_ms, total_ms, cancel, jobs=1):
+    """各分割位置を前後window_msの範囲で最も静かな時刻に移動した区間リストを返す"""
+    require_numpy()
+    if window_ms <= 0 or len(parts) < 2:
+        return parts
+    boundaries = [part['end_ms'] for part in parts[:-1]]
+
+    # 各分割位置の周辺だけをデコードするため、長時間の音声でも数秒で終わる
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [executor.submit(quietest_point, input_path, boundary_ms, window_ms, total_ms, cancel)
+                   for boundary_ms in boundaries]
+        snapped = []
+        # 中断時は未実行の解析を取り消す (実行中のFFmpegはトークンが終了させる)
+        with cancel.callback(lambda: [future.cancel() for future in futures]):
+            for future in futures:
+                cancel.check()
+                snapped.append(future.result())
+
+    # 隣の分割位置と前後が入れ替わらないようにする
+    new_parts = []
+    start_ms = 0
+    for part, end_ms in zip(parts, snapped + [total_ms]):
+        end_ms = min(max(end_ms, start_ms + FRAME_MS), total_ms)
+        new_parts.append({**part, 'start_ms': start_ms, 'end_ms': end_ms})
+        start_ms = end_ms
+    for old, new in zip(boundaries, snapped):
+        logging.debug(f"分割位置を無音に調整: {old}ms -> {new}ms ({new - old:+d}ms)")
+    new_parts = [part for part in new_parts if part['end_ms'] > part['start_ms']]
+    return [{**part, 'index': i + 1} for i, part in enumerate(new_parts)]
+
+
+# 無音区間の判定: 平滑化したレベルが全体の中央値よりこのdB以上低く、この長さ以上続く区間
+SILENCE_DROP_DB = 16
+MIN_SILENCE_MS = 300
+# 全体解析でFFmpegから一度に読み込むPCMの長さ (秒)
+BLOCK_SECONDS = 60
+# 分割1箇所あたりのコスト (dB換算)、パート数が不必要に増えないようにする
+CUT_PENALTY_DB = 6
+
+
+def stream_envelope(input_path, total_ms, progress, cancel):
+    """音声全体をブロックごとにデコードしてエンベロープを計算 (PCM全体はメモリに載せない)"""
+    np = require_numpy()
+    block_bytes = BLOCK_SECONDS * ANALYSIS_RATE * 2
+    process = cancel.popen(analysis_command(input_path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    envelopes = []
+    carry = b''
+    analysed_ms = 0
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            # 中断でデコーダが終了した場合は、途中までの解析結果を使わずに抜ける
+            cancel.check()
+            if not data:
+                break
+            data = carry + data
+            # フレーム境界に揃わない端数は次のブロックに回す
+            usable = len(data) - len(data) % (FRAME_SAMPLES * 2)
+            carry = data[usable:]
+            envelopes.append(rms_envelope(np.frombuffer(data[:usable], dtype='<i2')))
+            analysed_ms += usable // 2 * 1000 // ANALYSIS_RATE
+            if total_ms > 0:
+                progress(10 + min(analysed_ms / total_ms, 1) * 8, "無音位置を解析中...")
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"無音検出用のデコードに失敗しました: {stderr.decode(errors='replace')}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+        cancel.release(process)
+    if not envelopes:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(envelopes)
+
+
+def silence_candidates(envelope):
+    """無音区間の中央を分割候補とし、(時刻ミリ秒の配列, コストの配列) を返す"""
+    np = require_numpy()
+    if len(envelope) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), 0.0
+    floor_db = float(np.min(envelope))
+    quiet = envelope <= float(np.median(envelope)) - SILENCE_DROP_DB
+    # 無音区間の開始・終了フレームを差分で求める
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * FRAME_MS >= MIN_SILENCE_MS
+    starts, ends = starts[keep], ends[keep]
+
+    points = (starts + ends) // 2 * FRAME_MS
+    # 区間内の平均レベルが低いほど良い分割位置とする
+    sums = np.concatenate(([0], np.cumsum(envelope, dtype=np.float64)))
+    costs = (sums[ends] - sums[starts]) / (ends - starts) - floor_db
+    return points, np.maximum(costs, 0), floor_db
+
+
+def fill_gaps(envelope, points, costs, floor_db, total_ms, step_ms):
+    """無音が見つからない長い区間に、step_msごとの最も静かな位置を予備の分割候補として加える"""
+    np = require_numpy()
+    bounds = np.concatenate(([0], points, [total_ms]))
+    extra_points = []
+    extra_costs = []
+    for gap_start, gap_end in zip(bounds[:-1], bounds[1:]):
+        if gap_end - gap_start <= step_ms * 2:
+            continue
+        for chunk_start in range(int(gap_start) + step_ms // 2, int(gap_end) - step_ms // 2, step_ms):
+            # 推定の長さより実際のデコード結果が短い場合 (XingヘッダのないVBRのMP3など) は、デコードできた範囲だけを探す
+            first = chunk_start // FRAME_MS
+            last = min(min(chunk_start + step_ms, int(gap_end)) // FRAME_MS, len(envelope))
+            if last <= first:
+                continue
+            frame = first + int(np.argmin(envelope[first:last]))
+            extra_points.append(frame * FRAME_MS + FRAME_MS // 2)
+            # 無音ではない位置なので、無音区間の候補より優先度を下げる
+            extra_costs.append(max(float(envelope[frame]) - floor_db, 0) + SILENCE_DROP_DB)
+    if not extra_points:
+        return points, costs
+    points = np.concatenate((points, extra_points))
+    costs = np.concatenate((costs, extra_costs))
+    order = np.argsort(points, kind='stable')
+    return points[order], costs[order]
+
+
+def choose_cuts(points, costs, total_ms, min_ms, max_ms):
+    """全パートが最短・最長の範囲に収まり、分割コストの合計が最小になる分割位置を動的計画法で選ぶ"""
+    np = require_numpy()
+    positions = np.concatenate(([0], points, [total_ms])).astype(np.int64)
+    cut_costs = np.concatenate(([0], costs + CUT_PENALTY_DB, [0]))
+    count = len(positions)
+    best = np.full(count, np.inf)
+    previous = np.full(count, -1, dtype=np.int64)
+    best[0] = 0
+
+    for k in range(1, count):
+        # 直前の分割位置として使えるのは、距離が最短〜最長の範囲にある候補
+        lo = np.searchsorted(positions, positions[k] - max_ms, side='left')
+        hi = np.searchsorted(positions, positions[k] - min_ms, side='right')
+        if lo >= min(hi, k):
+            continue
+        j = lo + int(np.argmin(best[lo:min(hi, k)]))
+        if np.isfinite(best[j]):
+            best[k] = best[j] + cut_costs[k]
+            previous[k] = j
+
+    end = count - 1
+    if not np.isfinite(best[end]):
+        # 最後のパートだけは最短より短くてもよいものとして選び直す
+        lo = np.searchsorted(positions, total_ms - max_ms, side='left')
+        if lo < end and np.isfinite(best[lo:end]).any():
+            previous[end] = lo + int(np.argmin(best[lo:end]))
+        else:
+            return None
+
+    cuts = []
+    k = previous[end]
+    while k > 0:
+        cuts.append(int(positions[k]))
+        k = previous[k]
+    return cuts[::-1]
+
+
+def plan_silence_parts(input_path, total_ms, min_ms, max_ms, progress, cancel):
+    """無音位置だけで区切り、各パートを最短・最長の範囲に収めた区間リストを作成"""
+    require_numpy()
+    if max_ms <= 0 or min_ms >= max_ms:
+        raise ValueError("パートの最長は最短より長く設定してください")
+    if total_ms <= max_ms:
+        return [{'index': 1, 'start_ms': 0, 'end_ms': total_ms}]
+
+    envelope = smooth(stream_envelope(input_path, total_ms, progress, cancel))
+    points, costs, floor_db = silence_candidates(envelope)
+    logging.info(f"無音区間の候補: {len(points)}箇所 (最小レベル {floor_db:.1f}dBFS)")
+    points, costs = fill_gaps(envelope, points, costs, floor_db, total_ms, max(1000, (max_ms - min_ms) // 2))
+
+    cuts = choose_cuts(points, costs, total_ms, min_ms, max_ms)
+    if cuts is None:
+        raise RuntimeError("最短・最長の条件を満たす分割位置が見つかりません")
+    bounds = [0] + cuts + [total_ms]
+    return [{'index': i + 1, 'start_ms': start_ms, 'end_ms': end_ms}
+            for i, (start_ms, end_ms) in enumerate(zip(bounds[:-1], bounds[1:]))]
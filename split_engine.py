@@ -0,0 +1,805 @@
+"""
+音声ファイル分割エンジン
+GUI (tkinter) に依存せず、GUI版とCLI版の両方から利用する分割処理
+"""
+
+import os
+import logging
+import subprocess
+import shutil
+import locale
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import mp3_frames
+import audio_probe
+import probe_cache
+import pcm_cache
+import silence
+import cutlist
+import encoders
+import manifest
+
+# システムのデフォルトエンコーディングを取得
+SYSTEM_ENCODING = locale.getpreferredencoding()
+
+def check_ffmpeg():
+    """FFmpegが利用可能かチェック"""
+    try:
+        ffmpeg_path = shutil.which('ffmpeg')
+        if not ffmpeg_path:
+            logging.error("FFmpegが見つかりません")
+            return False
+        
+        result = subprocess.run([ffmpeg_path, '-version'], 
+                              capture_output=True, 
+                              encoding=SYSTEM_ENCODING,
+                              errors='replace',
+                              check=True)
+        logging.info(f"FFmpegバージョン: {result.stdout.splitlines()[0]}")
+        return True
+    except (subprocess.SubprocessError, FileNotFoundError) as e:
+        logging.error(f"FFmpegの確認に失敗: {str(e)}")
+        return False
+
+# 分割エンジン (設定値: 表示名)
+SPLIT_ENGINES = {
+    'reencode': '再エンコード (全体を読み込み)',
+    'copy': 'ストリームコピー (無劣化・高速)',
+    'native': 'MP3フレーム分割 (FFmpeg不要・最速)',
+    'parallel': '並列再エンコード (FFmpeg)',
+    'stream': 'ストリーミング再エンコード (省メモリ)',
+    'segment': '一括セグメント出力 (FFmpeg 1回起動)',
+    'clips': 'クリップ一括抽出 (1回のデコードで多数の区間)',
+}
+
+# ストリーミング分割で一度に読み込むPCMブロックのサイズ (バイト)
+PCM_BLOCK_SIZE = 256 * 1024
+
+# 分割位置の決め方
+SPLIT_MODES = {
+    'duration': '一定時間ごと',
+    'silence': '無音位置 (パートの長さの範囲内)',
+    'size': '最大ファイルサイズ',
+    'cutlist': 'カットリスト (CSV・JSON・キューシート)',
+}
+
+# カットリストの範囲は重複・不連続があり得るため、範囲ごとにシークするか1回のデコードから切り出せる方式だけを使う
+CUTLIST_ENGINES = ('copy', 'native', 'parallel', 'clips')
+
+# 再エンコードせずに入力の圧縮フレームを書き出す方式 (出力形式はMP3以外を選ぶと使えない)
+PASSTHROUGH_ENGINES = ('copy', 'native')
+
+# ファイルサイズ基準の分割で使う1MB (アップロード上限の表記に合わせて10進数)
+BYTES_PER_MB = 1000 * 1000
+# タグ・コンテナなど音声データ以外に見込むサイズ (バイト)
+PART_OVERHEAD_BYTES = 64 * 1024
+# ビットレートから見積もる場合の余裕 (平均ビットレートからの揺らぎを吸収する)
+SIZE_SAFETY_RATIO = 0.97
+
+def plan_parts(total_ms, chunk_duration_ms):
+    """分割区間のリストを作成"""
+    parts = []
+    start_ms = 0
+    while start_ms < total_ms:
+        end_ms = min(start_ms + chunk_duration_ms, total_ms)
+        parts.append({'index': len(parts) + 1, 'start_ms': start_ms, 'end_ms': end_ms})
+        start_ms = end_ms
+    return parts
+
+def part_filename(input_path, part, extension):
+    """パートの出力ファイル名 (カットリストで名前が付いていれば末尾に付ける)"""
+    stem = Path(input_path).stem
+    if part.get('name'):
+        return f"{stem}_part{part['index']:02d}_{part['name']}{extension}"
+    return f"{stem}_part{part['index']:02d}{extension}"
+
+def runs_to_end(part, parts):
+    """パートを音声の末尾まで書き出すかどうか (通常は最終パートのみ)"""
+    return part.get('to_end', part is parts[-1])
+
+def plan_size_parts(input_path, engine, total_ms, max_bytes, encoding, index=None, info=None):
+    """各パートのファイルサイズがmax_bytes未満になる区間リストを作成 (試し書き出しはしない)"""
+    if max_bytes <= PART_OVERHEAD_BYTES:
+        raise ValueError("最大ファイルサイズが小さすぎます")
+
+    if index is not None:
+        # MP3をそのまま切り出す方式はフレームサイズの積算で区切る (VBRでも正確)
+        with open(input_path, 'rb') as f:
+            cuts = mp3_frames.size_limited_cuts(f, index, max_bytes - index['id3v2_size'] - PART_OVERHEAD_BYTES)
+        bounds = [0] + [mp3_frames.frame_to_ms(index, frame_no) for frame_no in cuts] + [total_ms]
+        return [{'index': i + 1, 'start_ms': start_ms, 'end_ms': end_ms}
+                for i, (start_ms, end_ms) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+    # 再エンコードする方式は出力ビットレート、それ以外は入力の平均ビットレートから見積もる
+    if engine in ('copy', 'native'):
+        bit_rate = (info or {}).get('bit_rate')
+        if not bit_rate:
+            raise ValueError("ビットレートが取得できないため、ファイルサイズ基準で分割できません")
+    else:
+        info = info or {}
+        bit_rate = encoders.estimated_bit_rate(encoding, info.get('sample_rate') or 44100, info.get('channels') or 2)
+    chunk_duration_ms = int((max_bytes - PART_OVERHEAD_BYTES) * SIZE_SAFETY_RATIO * 8 * 1000 / bit_rate)
+    return plan_parts(total_ms, chunk_duration_ms)
+
+def parse_renditions(text):
+    """同時出力の指定 ("mp3:320k,opus:64k:mono,wav:16000hz:mono") を解析"""
+    renditions = []
+    for spec in (text or '').split(','):
+        fields = [field.strip().lower() for field in spec.split(':') if field.strip()]
+        if not fields:
+            continue
+        if fields[0] not in encoders.ENCODERS:
+            raise ValueError(f"同時出力の形式が不明です: {fields[0]} (対応形式: {', '.join(encoders.ENCODERS)})")
+        rendition = {'name': '_'.join(fields), 'format': fields[0],
+                     'bitrate': None, 'sample_rate': None, 'channels': None}
+        for field in fields[1:]:
+            if field.endswith('k') and field[:-1].isdigit():
+                rendition['bitrate'] = field
+            elif field.endswith('hz') and field[:-2].isdigit():
+                rendition['sample_rate'] = int(field[:-2])
+            elif field in ('mono', 'stereo'):
+                rendition['channels'] = 1 if field == 'mono' else 2
+            else:
+                raise ValueError(f"同時出力の指定が正しくありません: {spec.strip()}")
+        renditions.append(rendition)
+    return renditions
+
+def rendition_encoder_args(rendition, encoding):
+    """同時出力1つ分のエンコーダ引数 (サンプリングレート・チャンネル数の変換を含む)"""
+    bitrate = rendition['bitrate']
+    if not bitrate and encoding['source_bit_rate']:
+        # 指定が無ければ出力形式と同じく入力のビットレートに合わせる (低ビットレートの入力を膨らませない)
+        bitrate = encoders.matched_bitrate(rendition['format'], encoding['source_bit_rate'],
+                                           encoding['preserve_quality'])
+    codec_args = encoders.encoder_args(rendition['format'], bitrate, preserve_quality=encoding['preserve_quality'],
+                                       preset=encoding['preset'])
+    if rendition['sample_rate']:
+        codec_args += ['-ar', str(rendition['sample_rate'])]
+    if rendition['channels']:
+        codec_args += ['-ac', str(rendition['channels'])]
+    return codec_args
+
+def part_output_dirs(input_path, output_path, engine, encoding, renditions):
+    """分割方式ごとの書き出し先 [(出力フォルダ, 拡張子)] (書き出し済みのパートの判定用)"""
+    if engine == 'copy':
+        return [(output_path, Path(input_path).suffix or '.mp3')]
+    if engine == 'native':
+        return [(output_path, '.mp3')]
+    return [(target_path, extension) for _, target_path, extension in output_targets(output_path, renditions, encoding)]
+
+def output_targets(output_path, renditions, encoding):
+    """書き出し先のリスト [(エンコーダ引数, 出力フォルダ, 拡張子)] (同時出力は形式ごとのサブフォルダ)"""
+    if not renditions:
+        return [(encoding['codec_args'], output_path, encoding['extension'])]
+    targets = []
+    for rendition in renditions:
+        rendition_path = os.path.join(output_path, rendition['name'])
+        os.makedirs(rendition_path, exist_ok=True)
+        extension = encoders.ENCODERS[rendition['format']]['extension']
+        targets.append((rendition_encoder_args(rendition, encoding), rendition_path, extension))
+    return targets
+
+def part_command(input_path, part, is_last, output_file_path, codec_args):
+    """1パート分を書き出すFFmpegコマンドを作成 (-ssで入力側シーク)"""
+    ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+    ffmpeg_cmd = [
+        ffmpeg_path, '-y', '-v', 'error',
+        '-ss', f"{part['start_ms'] / 1000:.3f}",
+        '-i', input_path
+    ]
+    # 最終パートは末尾まで書き出す
+    if not is_last:
+        ffmpeg_cmd += ['-t', f"{(part['end_ms'] - part['start_ms']) / 1000:.3f}"]
+    ffmpeg_cmd += ['-map', '0:a', *codec_args, '-map_metadata', '0', output_file_path]
+    return ffmpeg_cmd
+
+def run_ffmpeg(ffmpeg_cmd, cancel):
+    """FFmpegコマンドを実行 (最後の引数の出力ファイルは完了まで書きかけとして扱う)"""
+    logging.debug(f"FFmpegコマンド: {' '.join(ffmpeg_cmd)}")
+    with cancel.writing(ffmpeg_cmd[-1]):
+        cancel.run(ffmpeg_cmd)
+
+def run_part_commands(commands, jobs, progress, cancel, action_text):
+    """パートごとのFFmpegコマンドをワーカープールで並列実行"""
+    total_chunks = len(commands)
+    # 各ワーカーはFFmpegの子プロセスを待つだけなので、スレッドで十分並列化できる
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+    try:
+        futures = {executor.submit(run_ffmpeg, ffmpeg_cmd, cancel): part_index
+                   for part_index, ffmpeg_cmd in commands}
+        done_count = 0
+        # 中断時は待機中のジョブを取り消す (実行中のFFmpegはトークンが終了させる)
+        with cancel.callback(lambda: [future.cancel() for future in futures]):
+            for future in as_completed(futures):
+                cancel.check()
+                future.result()
+                done_count += 1
+                logging.debug(f"パート{futures[future]:02d}の書き出し完了")
+                progress(20 + (done_count / total_chunks) * 70, f"{action_text}... ({done_count}/{total_chunks})")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def split_copy(input_path, output_path, parts, progress, cancel, jobs=1):
+    """FFmpegの-c copyで再エンコードせずに分割"""
+    # 圧縮フレームをそのまま書き出すため、拡張子は入力ファイルに合わせる
+    extension = Path(input_path).suffix or '.mp3'
+    commands = []
+    for part in parts:
+        output_file_path = os.path.join(output_path, part_filename(input_path, part, extension))
+        commands.append((part['index'], part_command(input_path, part, runs_to_end(part, parts),
+                                                     output_file_path, ['-c', 'copy'])))
+    run_part_commands(commands, jobs, progress, cancel, "コピー中")
+
+def split_parallel(input_path, output_path, parts, progress, cancel, jobs, encoding):
+    """各パートの時間範囲を個別のFFmpegで並列に再エンコード"""
+    commands = []
+    for part in parts:
+        output_file_path = os.path.join(output_path, part_filename(input_path, part, encoding['extension']))
+        commands.append((part['index'], part_command(input_path, part, runs_to_end(part, parts),
+                                                     output_file_path, encoding['codec_args'])))
+    run_part_commands(commands, jobs, progress, cancel, "分割中")
+
+def pcm_decoder_command(input_path, sample_rate, channels):
+    """入力をPCM (s16le) に変換して標準出力へ流すFFmpegコマンドを作成"""
+    ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+    return [
+        ffmpeg_path, '-v', 'error',
+        '-i', input_path,
+        '-map', '0:a:0', '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate), '-ac', str(channels),
+        'pipe:1'
+    ]
+
+def pcm_encoder_command(sample_rate, channels, codec_args, output_file_path):
+    """標準入力のPCM (s16le) をエンコードするFFmpegコマンドを作成"""
+    ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+    return [
+        ffmpeg_path, '-y', '-v', 'error',
+        '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels),
+        '-i', 'pipe:0',
+        *codec_args,
+        output_file_path
+    ]
+
+def finish_process(process, name):
+    """子プロセスの終了を待ち、失敗していれば例外を送出"""
+    if process.stdin:
+        process.stdin.close()
+    stderr = process.stderr.read() if process.stderr else b''
+    returncode = process.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, name,
+                                            stderr=stderr.decode(SYSTEM_ENCODING, errors='replace'))
+
+def finish_outputs(encoders, output_files, cancel):
+    """パートのエンコーダをすべて終了させ、出力を書き出し済みにする (リストは空にする)"""
+    for encoder in encoders:
+        try:
+            finish_process(encoder, 'ffmpeg (encoder)')
+        except (OSError, subprocess.CalledProcessError):
+            # 中断でエンコーダが終了していた場合は、失敗ではなく中断として扱う
+            cancel.check()
+            raise
+        finally:
+            cancel.release(encoder)
+    cancel.check()
+    for output_file_path in output_files:
+        cancel.output_done(output_file_path)
+    encoders.clear()
+    output_files.clear()
+
+def split_stream(input_path, output_path, parts, progress, cancel, encoding, info=None,
+                 pcm_cache_bytes=0, renditions=None):
+    """デコーダの出力をブロック単位でパートごとのエンコーダへ流す (メモリ使用量一定、同時出力は全エンコーダへ分配)"""
+    if info is None:
+        info = audio_probe.probe(input_path, cancel)
+    sample_rate = info.get('sample_rate') or 44100
+    channels = info.get('channels') or 2
+    frame_bytes = 2 * channels
+    targets = output_targets(output_path, renditions, encoding)
+    total_chunks = len(parts)
+
+    # キャッシュ済みPCMがあればデコードせずにメモリマップから読む
+    decoder = None
+    mapped = None
+    cache_writer = None
+    cached = pcm_cache.lookup(input_path, sample_rate, channels, 2) if pcm_cache_bytes else None
+    if cached is not None:
+        mapped = pcm_cache.MappedAudio(*cached)
+        read_block = lambda position: mapped.data[position:position + PCM_BLOCK_SIZE]
+    else:
+        decoder_cmd = pcm_decoder_command(input_path, sample_rate, channels)
+        logging.debug(f"デコーダコマンド: {' '.join(decoder_cmd)}")
+        decoder = cancel.popen(decoder_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        read_block = lambda position: decoder.stdout.read(PCM_BLOCK_SIZE)
+        if pcm_cache_bytes:
+            cache_writer = pcm_cache.CacheWriter(input_path, sample_rate, channels, 2, pcm_cache_bytes)
+    encoders = []
+    output_files = []
+    part_i = 0
+    position = 0
+    decoded_all = False
+    try:
+        while part_i < total_chunks or cache_writer is not None:
+            block = read_block(position)
+            # 中断でデコーダが終了した場合もここで抜ける (読み込み途中の末尾をパートとして確定させない)
+            cancel.check()
+            if not block:
+                decoded_all = True
+                break
+            if cache_writer is not None:
+                cache_writer.write(block)
+                # 全パート書き出し後もキャッシュ用に末尾までデコードを続ける
+                if part_i >= total_chunks:
+                    position += len(block)
+                    continue
+
+            view = memoryview(block)
+            while view and part_i < total_chunks:
+                part = parts[part_i]
+                # 前のパートとの間 (再開時に飛ばす書き出し済みのパート) のデータは捨てる
+                start = part['start_ms'] * sample_rate // 1000 * frame_bytes
+                if position < start:
+                    skip = min(len(view), start - position)
+                    position += skip
+                    view = view[skip:]
+                    continue
+                if not encoders:
+                    for codec_args, target_path, extension in targets:
+                        output_file_path = os.path.join(target_path, part_filename(input_path, part, extension))
+                        encoder_cmd = pcm_encoder_command(sample_rate, channels, codec_args, output_file_path)
+                        logging.debug(f"エンコーダコマンド: {' '.join(encoder_cmd)}")
+                        cancel.track_output(output_file_path)
+                        output_files.append(output_file_path)
+                        encoders.append(cancel.popen(encoder_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE))
+                    progress(20 + (part_i / total_chunks) * 70, f"分割中... ({part_i + 1}/{total_chunks})")
+
+                # パート境界 (サンプル単位) までを現在のエンコーダへ書き込む (最終パートは末尾まで)
+                if not runs_to_end(part, parts):
+                    boundary = part['end_ms'] * sample_rate // 1000 * frame_bytes
+                    size = min(len(view), boundary - position)
+                else:
+                    boundary = None
+                    size = len(view)
+                # 1回のデコード結果を全エンコーダで共有する (各エンコーダは別プロセスで並行に動く)
+                try:
+                    for encoder in encoders:
+                        encoder.stdin.write(view[:size])
+                except BrokenPipeError:
+                    cancel.check()
+                    raise
+                position += size
+                view = view[size:]
+
+                if boundary is not None and position >= boundary:
+                    finish_outputs(encoders, output_files, cancel)
+                    logging.debug(f"パート{part['index']:02d}の書き出し完了")
+                    part_i += 1
+
+        finish_outputs(encoders, output_files, cancel)
+        if decoder is not None:
+            if decoded_all:
+                finish_process(decoder, 'ffmpeg (decoder)')
+            else:
+                # 再開時に末尾のパートが書き出し済みなら、残りのパートより後はデコードしない
+                decoder.kill()
+                decoder.wait()
+        if cache_writer is not None:
+            cache_writer.commit()
+            cache_writer = None
+        if part_i < total_chunks - 1:
+            logging.warning(f"デコード結果が想定より短いため、{part_i + 1}個のパートで終了しました")
+    finally:
+        # 中断・エラー時は残っている子プロセスを終了させ、書きかけのキャッシュを破棄
+        for process in (*encoders, decoder):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+            if process is not None:
+                cancel.release(process)
+        if cache_writer is not None:
+            cache_writer.abort()
+        if mapped is not None:
+            mapped.close()
+
+def encode_pcm(pcm, sample_rate, channels, codec_args, output_file_path, cancel):
+    """メモリ上のPCMを1ファイルにエンコード"""
+    encoder_cmd = pcm_encoder_command(sample_rate, channels, codec_args, output_file_path)
+    with cancel.writing(output_file_path):
+        cancel.run(encoder_cmd, input=pcm)
+
+def split_clips(input_path, output_path, parts, progress, cancel, jobs, encoding, info=None,
+                pcm_cache_bytes=0, renditions=None):
+    """入力を先頭から1回だけデコードし、区間をバッファから切り出してワーカープールでエンコード (多数の短い区間向け)"""
+    if info is None:
+        info = audio_probe.probe(input_path, cancel)
+    sample_rate = info.get('sample_rate') or 44100
+    channels = info.get('channels') or 2
+    frame_bytes = 2 * channels
+    total_bytes = max(1, info['duration_ms'] * sample_rate // 1000 * frame_bytes)
+    targets = output_targets(output_path, renditions, encoding)
+    total_chunks = len(parts) * len(targets)
+
+    def byte_position(ms):
+        return ms * sample_rate // 1000 * frame_bytes
+
+    # 開始位置順に並べ、未処理の区間の先頭より前のデータはバッファから捨てていく
+    pending = sorted(parts, key=lambda part: (part['start_ms'], part['end_ms']))
+
+    decoder = None
+    mapped = None
+    cached = pcm_cache.lookup(input_path, sample_rate, channels, 2) if pcm_cache_bytes else None
+    if cached is not None:
+        mapped = pcm_cache.MappedAudio(*cached)
+        read_block = lambda position: mapped.data[position:position + PCM_BLOCK_SIZE]
+    else:
+        decoder_cmd = pcm_decoder_command(input_path, sample_rate, channels)
+        logging.debug(f"デコーダコマンド: {' '.join(decoder_cmd)}")
+        decoder = cancel.popen(decoder_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        read_block = lambda position: decoder.stdout.read(PCM_BLOCK_SIZE)
+
+    buffer = bytearray()
+    buffer_start = 0
+    position = 0
+    futures = []
+    done_count = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+    # 中断時はエンコード待ちの区間を取り消す (実行中のFFmpegはトークンが終了させる)
+    cancel_pending = lambda: [future.cancel() for future in list(futures)]
+    cancel.on_cancel(cancel_pending)
+
+    def submit_ready(at_end):
+        """バッファ内で終端まで揃った区間をエンコードに回す"""
+        nonlocal pending
+        remaining = []
+        for part in pending:
+            to_end = runs_to_end(part, parts)
+            end = position if to_end else byte_position(part['end_ms'])
+            # 末尾まで読み終えたら、デコード結果が想定より短くても手元のデータで書き出す
+            if at_end or (not to_end and end <= position):
+                end = min(end, position)
+                start = min(byte_position(part['start_ms']), end)
+                pcm = bytes(buffer[start - buffer_start:end - buffer_start])
+                for codec_args, target_path, extension in targets:
+                    output_file_path = os.path.join(target_path, part_filename(input_path, part, extension))
+                    futures.append(executor.submit(encode_pcm, pcm, sample_rate, channels, codec_args,
+                                                   output_file_path, cancel))
+            else:
+                remaining.append(part)
+        pending = remaining
+
+    def collect(limit):
+        """エンコード待ちがlimit件以下になるまで完了を待つ (メモリ使用量を抑える)"""
+        nonlocal done_count
+        while len(futures) > limit:
+            cancel.check()
+            futures.pop(0).result()
+            done_count += 1
+            progress(20 + min(position / total_bytes, 1) * 60 + (done_count / total_chunks) * 10,
+                     f"切り出し中... ({done_count}/{total_chunks})")
+
+    try:
+        while pending:
+            block = read_block(position)
+            # 中断でデコーダが終了した場合は、読み込み途中の区間を書き出さずに抜ける
+            cancel.check()
+            if not block:
+                break
+            # 次の区間がまだ先なら、その開始位置まではバッファに溜めない
+            keep_from = max(position, byte_position(pending[0]['start_ms']))
+            if keep_from < position + len(block):
+                if not buffer:
+                    buffer_start = keep_from
+                buffer += block[keep_from - position:]
+            position += len(block)
+
+            submit_ready(at_end=False)
+            # 未処理の区間で最も早い開始位置より前は不要
+            drop_to = byte_position(pending[0]['start_ms']) if pending else position
+            if drop_to > buffer_start:
+                del buffer[:min(drop_to, position) - buffer_start]
+                buffer_start = min(drop_to, position)
+            collect(max(1, jobs) * 2 * len(targets))
+
+        if decoder is not None:
+            # 全区間を切り出した後の残りはデコードしない
+            if pending:
+                finish_process(decoder, 'ffmpeg (decoder)')
+            else:
+                decoder.kill()
+                decoder.wait()
+        if pending:
+            submit_ready(at_end=True)
+        collect(0)
+    finally:
+        if decoder is not None and decoder.poll() is None:
+            decoder.kill()
+            decoder.wait()
+        if decoder is not None:
+            decoder.stdout.close()
+            decoder.stderr.close()
+            cancel.release(decoder)
+        executor.shutdown(wait=True, cancel_futures=True)
+        cancel.remove_callback(cancel_pending)
+        if mapped is not None:
+            mapped.close()
+
+def split_segment(input_path, output_path, parts, progress, cancel, encoding):
+    """FFmpegのsegmentマクサーで1回の起動ですべてのパートを書き出す"""
+    ffmpeg_path = shutil.which('ffmpeg') or 'ffmpeg'
+    # 出力ファイル名は連番テンプレートになるため、ファイル名中の%をエスケープ
+    input_filename = Path(input_path).stem.replace('%', '%%')
+    total_chunks = len(parts)
+    total_ms = parts[-1]['end_ms'] if parts else 0
+    boundaries = [part['end_ms'] for part in parts[:-1]]
+
+    ffmpeg_cmd = [
+        ffmpeg_path, '-y', '-v', 'error', '-nostats',
+        '-progress', 'pipe:1',
+        '-i', input_path,
+        '-map', '0:a', '-vn',
+        *encoding['codec_args'],
+        '-map_metadata', '0',
+        '-f', 'segment',
+        '-segment_start_number', str(parts[0]['index'] if parts else 1),
+        '-reset_timestamps', '1'
+    ]
+    if boundaries:
+        ffmpeg_cmd += ['-segment_times', ','.join(f"{ms / 1000:.3f}" for ms in boundaries)]
+    ffmpeg_cmd.append(os.path.join(output_path, f"{input_filename}_part%02d{encoding['extension']}"))
+    logging.debug(f"FFmpegコマンド: {' '.join(ffmpeg_cmd)}")
+
+    # 1つのFFmpegが全パートを書くため、中断時に備えて全パートの出力を書きかけとして登録する
+    output_files = [os.path.join(output_path, part_filename(input_path, part, encoding['extension'])) for part in parts]
+    for output_file_path in output_files:
+        cancel.track_output(output_file_path)
+    process = cancel.popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           encoding='utf-8', errors='replace')
+    try:
+        current_part = 0
+        # -progressの出力 (key=value形式) から現在の書き出し位置を取得
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            # out_time_ms も実際にはマイクロ秒単位 (古いFFmpegはこちらのみ出力)
+            if key not in ('out_time_us', 'out_time_ms') or not value.isdigit():
+                continue
+            position_ms = int(value) // 1000
+            part_i = sum(1 for ms in boundaries if ms <= position_ms)
+            if part_i != current_part:
+                logging.debug(f"パート{parts[current_part]['index']:02d}の書き出し完了")
+                for output_file_path in output_files[current_part:part_i]:
+                    cancel.output_done(output_file_path)
+                current_part = part_i
+            progress(20 + min(position_ms / max(total_ms, 1), 1) * 70,
+                     f"分割中... ({min(part_i, total_chunks - 1) + 1}/{total_chunks})")
+
+        stderr = process.stderr.read()
+        returncode = process.wait()
+        cancel.check()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, ffmpeg_cmd, stderr=stderr)
+        for output_file_path in output_files:
+            cancel.output_done(output_file_path)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        cancel.release(process)
+
+def split_native(input_path, output_path, parts, progress, cancel, index=None):
+    """MP3をフレーム境界のバイト範囲で分割 (デコード・サブプロセスなし)"""
+    if Path(input_path).suffix.lower() != '.mp3':
+        raise ValueError("MP3フレーム分割はMP3ファイルのみ対応しています")
+    if index is None:
+        index = mp3_frames.build_index(input_path)
+    total_chunks = len(parts)
+
+    with open(input_path, 'rb') as f:
+        id3v2_tag = mp3_frames.read_id3v2(f, index)
+        for part_i, part in enumerate(parts):
+            cancel.check()
+
+            output_filename = part_filename(input_path, part, '.mp3')
+            output_file_path = os.path.join(output_path, output_filename)
+            progress(20 + (part_i / total_chunks) * 70, f"分割中... ({part_i + 1}/{total_chunks})")
+
+            # 各境界に最も近いフレームで切る (最終パートは末尾まで)
+            first_frame = mp3_frames.ms_to_frame(index, part['start_ms'])
+            if not runs_to_end(part, parts):
+                end_frame = mp3_frames.ms_to_frame(index, part['end_ms'])
+            else:
+                end_frame = index['frame_count']
+            with cancel.writing(output_file_path):
+                frames = mp3_frames.write_part(f, index, first_frame, end_frame, output_file_path, id3v2_tag, cancel)
+            logging.debug(f"分割ファイル作成完了: {output_filename} ({frames}フレーム)")
+
+def load_audio(input_path, info, cancel, pcm_cache_bytes=0):
+    """入力全体をPCMとして読み込む (キャッシュ済みPCMがあればデコードを省略)"""
+    sample_rate = info.get('sample_rate') or 44100
+    channels = info.get('channels') or 2
+    audio = pcm_cache.load(input_path, sample_rate, channels, 2) if pcm_cache_bytes else None
+    if audio is None:
+        logging.debug("音声ファイルの読み込み開始")
+        # デコーダもトークンに登録し、読み込み中でも中断・一時停止できるようにする
+        decoder_cmd = pcm_decoder_command(input_path, sample_rate, channels)
+        decoder = cancel.popen(decoder_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            data = decoder.stdout.read()
+            # 中断でデコーダが終了した場合は、途中までのデータを使わない
+            cancel.check()
+            finish_process(decoder, 'ffmpeg (decoder)')
+        finally:
+            if decoder.poll() is None:
+                decoder.kill()
+                decoder.wait()
+            decoder.stdout.close()
+            decoder.stderr.close()
+            cancel.release(decoder)
+        audio = pcm_cache.PCMAudio(data, sample_rate, channels)
+        logging.debug("音声ファイルの読み込み完了")
+        if pcm_cache_bytes:
+            pcm_cache.store_pcm(input_path, audio, pcm_cache_bytes)
+    return audio
+
+def split_reencode(audio, input_path, output_path, parts, progress, cancel, encoding):
+    """読み込み済みの音声をパートごとにFFmpegでエンコードして書き出す"""
+    total_chunks = len(parts)
+
+    for part_i, part in enumerate(parts):
+        cancel.check()
+
+        pcm = audio.pcm(part['start_ms'], None if runs_to_end(part, parts) else part['end_ms'])
+
+        # 出力ファイル名
+        output_filename = part_filename(input_path, part, encoding['extension'])
+        output_file_path = os.path.join(output_path, output_filename)
+
+        logging.debug(f"分割ファイル作成中: {output_filename}")
+        progress(20 + (part_i / total_chunks) * 70, f"分割中... ({part_i + 1}/{total_chunks})")
+
+        # エンコーダはトークン経由で起動するため、書き出し中でも中断・一時停止できる
+        encode_pcm(pcm, audio.sample_rate, audio.channels, encoding['codec_args'], output_file_path, cancel)
+        logging.debug(f"分割ファイル作成完了: {output_filename}")
+
+def split_file(input_path, output_path, settings, progress, cancel):
+    """設定に従って音声ファイルを分割 (作成したパート数を返し、中断時はNone)"""
+    try:
+        return run_split(input_path, output_path, settings, progress, cancel)
+    except Exception:
+        # 中断・エラーで書きかけになった出力は残さない
+        cancel.remove_partial_outputs()
+        # 中断で子プロセスが終了したことによるエラーは中断として扱う
+        if cancel.cancelled:
+            logging.info("処理がキャンセルされました")
+            return None
+        raise
+
+def run_split(input_path, output_path, settings, progress, cancel):
+    """分割の本体 (中断時はCancelledなどの例外を送出)"""
+    engine = settings['split_engine']
+    if engine not in SPLIT_ENGINES:
+        raise ValueError(f"不明な分割方式です: {engine}")
+    if settings['split_mode'] not in SPLIT_MODES:
+        raise ValueError(f"不明な分割基準です: {settings['split_mode']}")
+    if settings['output_target'] == 'dataset':
+        # 音声ファイルではなく学習用の窓を.npyシャードに書き出す (戻り値は窓の数)
+        # datasetはsplit_engineを使うため、ここで読み込む (循環importを避ける)
+        import dataset
+        return dataset.export(input_path, output_path, settings, progress, cancel)
+    encoding = encoders.resolve(settings)
+    if encoding['format'] != 'mp3' and engine in PASSTHROUGH_ENGINES:
+        # 出力形式に変換するため、範囲ごとにシークして再エンコードする
+        logging.info(f"{encoders.ENCODERS[encoding['format']]['label']}の出力では{SPLIT_ENGINES[engine]}の代わりに"
+                     f"{SPLIT_ENGINES['parallel']}を使用します")
+        engine = 'parallel'
+    renditions = parse_renditions(settings['renditions'])
+    if renditions and engine not in ('stream', 'clips'):
+        # 同時出力はデコード結果を共有できる方式でのみ行う
+        fallback = 'clips' if settings['split_mode'] == 'cutlist' else 'stream'
+        logging.info(f"同時出力では{SPLIT_ENGINES[engine]}の代わりに{SPLIT_ENGINES[fallback]}を使用します")
+        engine = fallback
+    if settings['split_mode'] == 'cutlist' and engine not in CUTLIST_ENGINES:
+        # 先頭から順にデコードする方式ではなく、範囲ごとにシークして並列に再エンコードする
+        logging.info(f"カットリストでは{SPLIT_ENGINES[engine]}の代わりに{SPLIT_ENGINES['parallel']}を使用します")
+        engine = 'parallel'
+    chunk_duration_ms = settings['split_duration'] * 60 * 1000
+    pcm_cache_bytes = settings['pcm_cache_mb'] * 1024 * 1024 if settings['pcm_cache'] else 0
+
+    # 出力ディレクトリ作成
+    os.makedirs(output_path, exist_ok=True)
+
+    # 区間はヘッダ情報だけで計画し、全体を読み込む方式も書き出し済みのパートを確認してから読み込む
+    info = index = None
+    progress(10, "音声ファイル情報を取得中...")
+    if engine == 'native':
+        index = probe_cache.cached(input_path, 'mp3_index', mp3_frames.build_index)
+        total_ms = index['duration_ms']
+    else:
+        info = audio_probe.probe(input_path, cancel)
+        total_ms = info['duration_ms']
+        # MP3のストリームコピーもフレーム単位で切れるため、サイズ基準ではフレームの目次を使う
+        if settings['split_mode'] == 'size' and engine == 'copy' and Path(input_path).suffix.lower() == '.mp3':
+            index = probe_cache.cached(input_path, 'mp3_index', mp3_frames.build_index)
+    if info is not None and engine not in PASSTHROUGH_ENGINES:
+        encoding = encoders.resolve(settings, info)
+        logging.info(f"出力のエンコーダ引数: {' '.join(encoding['codec_args'])} (入力: {audio_probe.format_info(info)})")
+
+    # 前回と同じ入力・設定で書き出した出力フォルダなら、同じ区間で続きを書き出すため保存済みの分割計画を使う
+    output_manifest = manifest.Manifest(input_path, output_path, settings)
+    resumed = output_manifest.plan is not None
+    if resumed:
+        parts = output_manifest.plan
+    elif settings['split_mode'] == 'silence':
+        parts = silence.plan_silence_parts(input_path, total_ms, settings['min_part_minutes'] * 60 * 1000,
+                                           settings['max_part_minutes'] * 60 * 1000, progress, cancel)
+    elif settings['split_mode'] == 'cutlist':
+        parts = cutlist.load(settings['cutlist_path'], total_ms)
+    elif settings['split_mode'] == 'size':
+        parts = plan_size_parts(input_path, engine, total_ms, settings['max_part_mb'] * BYTES_PER_MB,
+                                encoding, index, info)
+    else:
+        parts = plan_parts(total_ms, chunk_duration_ms)
+    if (not resumed and settings['split_mode'] == 'duration' and settings['snap_window_sec'] > 0
+            and len(parts) > 1):
+        progress(15, "分割位置を無音に合わせています...")
+        parts = silence.snap_parts(input_path, parts, settings['snap_window_sec'] * 1000, total_ms,
+                                   cancel, settings['jobs'])
+    total_chunks = len(parts)
+    if not resumed:
+        output_manifest.start(parts)
+    else:
+        outputs = part_output_dirs(input_path, output_path, engine, encoding, renditions)
+
+        def written(part):
+            # 書き出し完了時のサイズ・ハッシュと一致しないもの (書きかけ・削除・変更されたもの) は書き出し直す
+            return all(output_manifest.verified(os.path.join(target_path, part_filename(input_path, part, extension)))
+                       for target_path, extension in outputs)
+
+        # 末尾まで書き出すパートは飛ばした後も末尾まで書き出すよう、先に確定させる
+        parts = [{**part, 'to_end': runs_to_end(part, parts)} for part in parts if not written(part)]
+        logging.info(f"書き出し済みの{total_chunks - len(parts)}個のパートを飛ばして再開します")
+        if not parts:
+            output_manifest.save('complete')
+            return total_chunks
+        if len(parts) < total_chunks and engine == 'segment':
+            # 一括セグメント出力は先頭から全パートを書き出すため、残りのパートだけを区間ごとにシークして書き出す
+            logging.info(f"再開時は{SPLIT_ENGINES[engine]}の代わりに{SPLIT_ENGINES['parallel']}を使用します")
+            engine = 'parallel'
+    logging.info(f"分割数: {total_chunks}個 ({SPLIT_ENGINES[engine]})")
+    progress(20, f"{len(parts)}個のファイルに分割します")
+
+    jobs = settings['jobs']
+    try:
+        # 書き出しが完了したファイルはサイズ・ハッシュをマニフェストに記録する
+        with cancel.output_callback(output_manifest.add_output):
+            if engine == 'reencode':
+                progress(20, "音声ファイルを読み込み中...")
+                audio = load_audio(input_path, info, cancel, pcm_cache_bytes)
+                try:
+                    split_reencode(audio, input_path, output_path, parts, progress, cancel, encoding)
+                finally:
+                    # キャッシュ済みPCMのメモリマップを解放する (一括処理・監視で1ファイルごとに残さない)
+                    audio.close()
+            elif engine == 'native':
+                split_native(input_path, output_path, parts, progress, cancel, index)
+            elif engine == 'copy':
+                split_copy(input_path, output_path, parts, progress, cancel, jobs)
+            elif engine == 'segment':
+                split_segment(input_path, output_path, parts, progress, cancel, encoding)
+            elif engine == 'clips':
+                split_clips(input_path, output_path, parts, progress, cancel, jobs, encoding,
+                            info, pcm_cache_bytes, renditions)
+            elif engine == 'stream':
+                split_stream(input_path, output_path, parts, progress, cancel, encoding,
+                             info, pcm_cache_bytes, renditions)
+            else:
+                split_parallel(input_path, output_path, parts, progress, cancel, jobs, encoding)
+    finally:
+        # 中断・エラーでも記録済みの書き出し状態を残し、再実行時に続きから書き出せるようにする
+        output_manifest.save()
+
+    output_manifest.save('complete')
+    logging.info("分割処理が正常に完了")
+    return total_chunks
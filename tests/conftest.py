@@ -0,0 +1,21 @@
+"""
+テスト共通設定
+リポジトリ直下のモジュールをインポートできるようにし、キャッシュの保存先を一時フォルダに切り替える
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pcm_cache  # noqa: E402
+import probe_cache  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """プローブ・PCMキャッシュをテストごとの一時フォルダに書き出す (リポジトリ内に残さない)"""
+    monkeypatch.setattr(probe_cache, 'cache_file', str(tmp_path / 'probe_cache.sqlite3'))
+    monkeypatch.setattr(pcm_cache, 'cache_dir', str(tmp_path / 'pcm_cache'))
@@ -0,0 +1,24 @@
+"""
+処理の中断・一時停止モジュールのテスト
+"""
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from cancel_token import CancelToken
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="子プロセスの回収はPOSIXで確認する")
+def test_run_reaps_process_killed_after_error(monkeypatch):
+    """待機中の例外で強制終了させた子プロセスを回収し、ゾンビプロセスを残さない"""
+    def fail(self, input=None):
+        raise RuntimeError("communicate failed")
+
+    monkeypatch.setattr(subprocess.Popen, 'communicate', fail)
+    with pytest.raises(RuntimeError):
+        CancelToken().run([sys.executable, '-c', 'import time; time.sleep(30)'])
+    with pytest.raises(ChildProcessError):
+        os.waitpid(-1, os.WNOHANG)
@@ -0,0 +1,81 @@
+"""
+カットリスト読み込みモジュールのテスト
+"""
+
+import json
+
+import pytest
+
+import cutlist
+
+
+def write(path, text, encoding='utf-8'):
+    with open(path, 'w', encoding=encoding) as f:
+        f.write(text)
+    return str(path)
+
+
+def test_csv_skips_header_and_comments(tmp_path):
+    """CSVの見出し行・コメント行は読み飛ばし、終了が空欄の範囲は末尾まで書き出す"""
+    path = write(tmp_path / 'cuts.csv', "start,end,name\n# メモ\n0:05,1:00.5,Intro\n01:02:03,,Outro\n")
+    parts = cutlist.load(path, 4 * 3600 * 1000)
+    assert parts == [
+        {'index': 1, 'start_ms': 5000, 'end_ms': 60500, 'name': 'Intro', 'to_end': False},
+        {'index': 2, 'start_ms': 3723000, 'end_ms': 4 * 3600 * 1000, 'name': 'Outro', 'to_end': True},
+    ]
+
+
+def test_csv_reports_line_of_invalid_range(tmp_path):
+    """見出し行以外の不正な行は行番号付きのエラーにする"""
+    path = write(tmp_path / 'cuts.csv', "10,20,a\n30,25,b\n")
+    with pytest.raises(ValueError, match='2行目'):
+        cutlist.load(path, 60000)
+
+
+def test_json_objects_and_arrays(tmp_path):
+    """JSONはオブジェクト・配列のどちらの形式の範囲も読み込み、音声の長さを超える終了は末尾までにする"""
+    data = {'ranges': [{'start': 1.5, 'end': '0:03', 'title': 'a'}, [10, 99], ['0:20']]}
+    path = write(tmp_path / 'cuts.json', json.dumps(data))
+    parts = cutlist.load(path, 30000)
+    assert [(p['start_ms'], p['end_ms'], p['name'], p['to_end']) for p in parts] == [
+        (1500, 3000, 'a', False),
+        (10000, 30000, '', True),
+        (20000, 30000, '', True),
+    ]
+
+
+def test_cue_tracks_end_at_next_pregap(tmp_path):
+    """キューシートの各トラックは次のトラックのINDEX 00 (無ければINDEX 01) まで、最終トラックは末尾まで"""
+    text = (
+        'FILE "album.wav" WAVE\n'
+        '  TRACK 01 AUDIO\n'
+        '    TITLE "曲/その1"\n'
+        '    INDEX 01 00:00:00\n'
+        '  TRACK 02 AUDIO\n'
+        '    TITLE "Two"\n'
+        '    INDEX 00 02:59:50\n'
+        '    INDEX 01 03:00:00\n'
+        '  TRACK 03 AUDIO\n'
+        '    INDEX 01 05:00:45\n'
+    )
+    path = write(tmp_path / 'album.cue', text, encoding='cp932')
+    parts = cutlist.load(path, 400000)
+    assert [(p['start_ms'], p['end_ms'], p['name'], p['to_end']) for p in parts] == [
+        (0, 179666, '曲_その1', False),
+        (180000, 300600, 'Two', False),
+        (300600, 400000, '', True),
+    ]
+
+
+def test_safe_name_removes_unsafe_characters():
+    """ファイル名に使えない文字は置き換え、前後の空白・ドットは取り除く"""
+    assert cutlist.safe_name(' ..a:b*c?<d>|e. ') == 'a_b_c__d__e'
+    assert cutlist.safe_name('x' * 200) == 'x' * 100
+    assert cutlist.safe_name(None) == ''
+
+
+def test_start_beyond_duration_is_rejected(tmp_path):
+    """開始が音声の長さを超える範囲はエラーにする"""
+    path = write(tmp_path / 'cuts.csv', "70,,late\n")
+    with pytest.raises(ValueError, match='1番目'):
+        cutlist.load(path, 60000)
@@ -0,0 +1,101 @@
+"""
+出力形式のエンコーダ登録モジュールのテスト
+"""
+
+import pytest
+
+import encoders
+import split_engine
+from app_settings import load_settings
+
+
+def make_settings(**overrides):
+    return {**load_settings(), 'output_bitrate': '', 'output_vbr_quality': '', 'output_speed': '',
+            'output_sample_rate': '', 'output_channels': '', 'encoder_preset': 'balanced', **overrides}
+
+
+def test_encoder_args_bitrate_and_vbr():
+    """ビットレート・VBR品質は形式ごとのオプションで指定し、VBR品質を優先する"""
+    assert encoders.encoder_args('mp3', '192k') == ['-c:a', 'libmp3lame', '-b:a', '192k', '-compression_level', '3']
+    assert encoders.encoder_args('mp3', '192k', vbr_quality='2') == [
+        '-c:a', 'libmp3lame', '-q:a', '2', '-compression_level', '3']
+    assert encoders.encoder_args('aac', vbr_quality='1.5')[:4] == ['-c:a', 'aac', '-q:a', '1.5']
+
+
+@pytest.mark.parametrize('args, message', [
+    (('flac', '320k'), 'ビットレートの指定に対応していません'),
+    (('opus', '', '5'), 'VBR品質の指定に対応していません'),
+    (('mp3', '', '10'), '0〜9の範囲'),
+    (('aac', '', '', '3'), 'エンコード速度の指定に対応していません'),
+    (('ogg',), '出力形式が不明'),
+])
+def test_encoder_args_rejects_unsupported_options(args, message):
+    """形式が対応していない指定・範囲外の値はエラーにする"""
+    with pytest.raises(ValueError, match=message):
+        encoders.encoder_args(*args)
+
+
+def test_resolve_sample_rate_and_channels():
+    """サンプリングレート・チャンネル数は指定した場合だけ変換する"""
+    encoding = encoders.resolve(make_settings(output_format='wav', output_sample_rate='16000', output_channels='1'))
+    assert encoding['extension'] == '.wav'
+    assert encoding['codec_args'] == ['-c:a', 'pcm_s16le', '-ar', '16000', '-ac', '1']
+    with pytest.raises(ValueError, match='1以上'):
+        encoders.resolve(make_settings(output_format='wav', output_channels='0'))
+
+
+@pytest.mark.parametrize('source_bit_rate, preserve_quality, expected', [
+    (128000, False, '128k'),
+    # VBR・コンテナのオーバーヘッドによる揺らぎは許容して標準的なビットレートに合わせる
+    (131000, False, '128k'),
+    (105000, False, '112k'),
+    (64000, True, '64k'),
+    # 上限は目安の値 (高品質時は高品質の値)
+    (320000, False, '128k'),
+    (320000, True, '320k'),
+    (2000000, True, '320k'),
+])
+def test_matched_bitrate_snaps_and_caps(source_bit_rate, preserve_quality, expected):
+    """入力のビットレート以上で最も近い標準のビットレートにし、上限を超えない"""
+    assert encoders.matched_bitrate('mp3', source_bit_rate, preserve_quality) == expected
+
+
+def test_matched_bitrate_without_bitrate_option():
+    """ビットレートを指定できない形式・入力のビットレートが不明な場合は指定しない"""
+    assert encoders.matched_bitrate('flac', 128000, True) == ''
+    assert encoders.matched_bitrate('mp3', None, True) == ''
+    assert encoders.matched_bitrate('opus', 320000, True) == '192k'
+
+
+def test_resolve_matches_source_bitrate():
+    """ビットレート・VBR品質の指定が無い場合だけ入力のビットレートに合わせる"""
+    source = {'bit_rate': 96000}
+    settings = make_settings(output_format='mp3', match_source=True, preserve_quality=True)
+    assert '96k' in encoders.resolve(settings, source)['codec_args']
+    assert '320k' in encoders.resolve({**settings, 'match_source': False}, source)['codec_args']
+    assert '192k' in encoders.resolve({**settings, 'output_bitrate': '192k'}, source)['codec_args']
+    assert '-b:a' not in encoders.resolve({**settings, 'output_vbr_quality': '2'}, source)['codec_args']
+
+
+def test_renditions_match_source_bitrate():
+    """同時出力もビットレートの指定が無ければ入力のビットレートに合わせる"""
+    encoding = encoders.resolve(make_settings(output_format='mp3', match_source=True, preserve_quality=True),
+                                {'bit_rate': 96000})
+    renditions = split_engine.parse_renditions('mp3,opus:64k,flac')
+    assert split_engine.rendition_encoder_args(renditions[0], encoding)[:4] == ['-c:a', 'libmp3lame', '-b:a', '96k']
+    assert split_engine.rendition_encoder_args(renditions[1], encoding)[:4] == ['-c:a', 'libopus', '-b:a', '64k']
+    assert '-b:a' not in split_engine.rendition_encoder_args(renditions[2], encoding)
+
+
+@pytest.mark.parametrize('output_format', [name for name, encoder in encoders.ENCODERS.items() if encoder['presets']])
+def test_presets_differ(output_format):
+    """プリセットに対応する形式では、高速・標準・高品質がそれぞれ異なる引数になる"""
+    args = {preset: tuple(encoders.encoder_args(output_format, preset=preset)) for preset in encoders.ENCODER_PRESETS}
+    assert len(set(args.values())) == len(encoders.ENCODER_PRESETS)
+
+
+def test_speed_overrides_preset():
+    """エンコード速度の個別指定はプリセットより優先する"""
+    assert encoders.encoder_args('flac', speed='3', preset='archival') == ['-c:a', 'flac', '-compression_level', '3']
+    with pytest.raises(ValueError, match='プリセットが不明'):
+        encoders.encoder_args('flac', preset='best')
@@ -0,0 +1,100 @@
+"""
+出力マニフェストモジュールのテスト
+"""
+
+import os
+
+import manifest
+from app_settings import load_settings
+
+
+def make_input(tmp_path, content=b'audio'):
+    input_path = str(tmp_path / 'input.wav')
+    with open(input_path, 'wb') as f:
+        f.write(content)
+    return input_path
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def start_manifest(input_path, output_path, settings):
+    """分割計画を記録して保存したマニフェスト"""
+    os.makedirs(output_path, exist_ok=True)
+    output_manifest = manifest.Manifest(input_path, output_path, settings)
+    output_manifest.start([{'index': 1, 'start_ms': 0, 'end_ms': 1000}])
+    return output_manifest
+
+
+def test_plan_is_reused_for_same_input_and_settings(tmp_path):
+    """同じ入力・出力に影響する設定なら、保存済みの分割計画を使う (並列数などの違いは影響しない)"""
+    input_path = make_input(tmp_path)
+    output_path = str(tmp_path / 'output')
+    settings = load_settings()
+    start_manifest(input_path, output_path, settings)
+    reloaded = manifest.Manifest(input_path, output_path, {**settings, 'jobs': settings['jobs'] + 1})
+    assert reloaded.plan == [{'index': 1, 'start_ms': 0, 'end_ms': 1000}]
+    assert os.path.basename(reloaded.path) == '.input.audio-splitter.json'
+
+
+def test_plan_is_discarded_when_input_or_settings_change(tmp_path):
+    """入力の内容・更新日時や出力に影響する設定が変わった場合は最初から書き出す"""
+    input_path = make_input(tmp_path)
+    output_path = str(tmp_path / 'output')
+    settings = load_settings()
+    start_manifest(input_path, output_path, settings)
+    assert manifest.Manifest(input_path, output_path, {**settings, 'output_format': 'flac'}).plan is None
+
+    bump_mtime(input_path)
+    assert manifest.Manifest(input_path, output_path, settings).plan is None
+
+
+def test_plan_is_discarded_when_cutlist_is_edited(tmp_path):
+    """同じパスのカットリストが編集された場合も最初から書き出す"""
+    input_path = make_input(tmp_path)
+    output_path = str(tmp_path / 'output')
+    cutlist_path = str(tmp_path / 'cuts.csv')
+    with open(cutlist_path, 'w') as f:
+        f.write("0,1\n")
+    settings = {**load_settings(), 'split_mode': 'cutlist', 'cutlist_path': cutlist_path}
+    start_manifest(input_path, output_path, settings)
+    assert manifest.Manifest(input_path, output_path, settings).plan is not None
+
+    bump_mtime(cutlist_path)
+    assert manifest.Manifest(input_path, output_path, settings).plan is None
+
+
+def test_corrupt_manifest_is_ignored(tmp_path):
+    """壊れたマニフェストは無視して最初から書き出す"""
+    input_path = make_input(tmp_path)
+    output_path = str(tmp_path / 'output')
+    os.makedirs(output_path)
+    with open(manifest.manifest_path(input_path, output_path), 'w') as f:
+        f.write('{"key": ')
+    assert manifest.Manifest(input_path, output_path, load_settings()).plan is None
+
+
+def test_verified_checks_size_and_hash(tmp_path):
+    """書き出し完了時と同じサイズ・内容のファイルだけを書き出し済みとする"""
+    input_path = make_input(tmp_path)
+    output_path = str(tmp_path / 'output')
+    settings = load_settings()
+    output_manifest = start_manifest(input_path, output_path, settings)
+    part_path = os.path.join(output_path, 'input_part01.wav')
+    with open(part_path, 'wb') as f:
+        f.write(b'part one')
+    output_manifest.add_output(part_path)
+    output_manifest.save('complete')
+
+    reloaded = manifest.Manifest(input_path, output_path, settings)
+    assert reloaded.verified(part_path)
+    assert not reloaded.verified(os.path.join(output_path, 'input_part02.wav'))
+
+    # 同じサイズのまま内容が変わったファイルは書き出し直す
+    with open(part_path, 'wb') as f:
+        f.write(b'part two')
+    assert not reloaded.verified(part_path)
+    os.remove(part_path)
+    assert not reloaded.verified(part_path)
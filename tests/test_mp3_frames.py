@@ -0,0 +1,57 @@
+"""
+MP3フレーム分割モジュールのテスト
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+import mp3_frames
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="FFmpegが必要です")
+
+
+def test_ms_to_frame_keeps_first_frame():
+    """エンコーダ遅延があっても0msはフレーム0に対応する"""
+    index = {'sample_rate': 44100, 'samples_per_frame': 1152, 'enc_delay': 576, 'frame_count': 100}
+    assert mp3_frames.ms_to_frame(index, 0) == 0
+    assert mp3_frames.ms_to_frame(index, 1000) == round((44100 + 576) / 1152)
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('codec_args', [['-b:a', '128k'], ['-q:a', '4']], ids=['cbr', 'vbr'])
+def test_first_part_keeps_encoder_delay(tmp_path, codec_args):
+    """最初のパートはフレーム0から書き出し、ギャップレス再生用のエンコーダ遅延を引き継ぐ"""
+    path = str(tmp_path / 'input.mp3')
+    subprocess.run([
+        shutil.which('ffmpeg'), '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100:duration=5',
+        '-c:a', 'libmp3lame', *codec_args, path
+    ], check=True)
+    index = mp3_frames.build_index(path)
+    assert index['enc_delay'] > 0
+
+    part_path = str(tmp_path / 'part01.mp3')
+    with open(path, 'rb') as f:
+        end_frame = mp3_frames.ms_to_frame(index, 2000)
+        frames = mp3_frames.write_part(f, index, mp3_frames.ms_to_frame(index, 0), end_frame, part_path)
+    assert frames == end_frame
+    assert mp3_frames.build_index(part_path)['enc_delay'] == index['enc_delay']
+
+
+@requires_ffmpeg
+def test_write_part_checks_cancel(tmp_path):
+    """書き出し中に中断されたら、パートの途中でも例外を送出する"""
+    from cancel_token import CancelToken, Cancelled
+
+    path = str(tmp_path / 'input.mp3')
+    subprocess.run([
+        shutil.which('ffmpeg'), '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100:duration=5', path
+    ], check=True)
+    index = mp3_frames.build_index(path)
+    cancel = CancelToken()
+    cancel.cancel()
+    with open(path, 'rb') as f, pytest.raises(Cancelled):
+        mp3_frames.write_part(f, index, 0, index['frame_count'], str(tmp_path / 'part01.mp3'), cancel=cancel)
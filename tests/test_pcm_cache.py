@@ -0,0 +1,95 @@
+"""
+デコード済みPCMのキャッシュモジュールのテスト
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import pcm_cache
+import split_engine
+from app_settings import load_settings
+from cancel_token import Cancelled, CancelToken
+
+
+def test_fingerprint_changes_when_unsampled_region_is_edited(tmp_path):
+    """先頭・中央・末尾以外を同じサイズのまま書き換えても、別のフィンガープリントになる"""
+    path = str(tmp_path / 'input.wav')
+    size = pcm_cache.FINGERPRINT_SAMPLE_SIZE * 8
+    with open(path, 'wb') as f:
+        f.write(b'\x01' * size)
+    before = pcm_cache.fingerprint(path)
+
+    # 読み取られない範囲 (先頭と中央の間) だけを無音にする
+    with open(path, 'r+b') as f:
+        f.seek(pcm_cache.FINGERPRINT_SAMPLE_SIZE * 2)
+        f.write(b'\x00' * pcm_cache.FINGERPRINT_SAMPLE_SIZE)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert pcm_cache.fingerprint(path) != before
+
+
+def test_mapped_audio_close_releases_mapping(tmp_path):
+    """MappedAudioはcloseでメモリマップとファイルを解放する"""
+    pcm_path = str(tmp_path / 'entry.pcm')
+    with open(pcm_path, 'wb') as f:
+        f.write(b'\x00' * 4 * 44100)
+    audio = pcm_cache.MappedAudio(pcm_path, {'sample_rate': 44100, 'channels': 2, 'sample_width': 2})
+    assert len(audio) == 1000
+    assert len(audio.pcm(0, 500)) == 4 * 22050
+    audio.close()
+    assert audio.data.closed
+    assert audio.file.closed
+
+
+def make_tone(path, duration_sec):
+    """テスト用の正弦波の音声を作成"""
+    subprocess.run([
+        shutil.which('ffmpeg'), '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={duration_sec}",
+        path
+    ], check=True)
+
+
+def fail_with_error(*args):
+    raise RuntimeError("エンコードに失敗")
+
+
+def fail_with_cancel(*args):
+    raise Cancelled()
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="FFmpegが必要です")
+@pytest.mark.parametrize('encode', [None, fail_with_error, fail_with_cancel], ids=['success', 'error', 'cancel'])
+def test_reencode_closes_mapped_audio(tmp_path, monkeypatch, encode):
+    """再エンコード方式はキャッシュ済みPCMのメモリマップを、成功・エラー・中断のいずれでも解放する"""
+    input_path = str(tmp_path / 'input.wav')
+    make_tone(input_path, 90)
+    settings = {**load_settings(), 'split_engine': 'reencode', 'split_duration': 1, 'split_mode': 'duration',
+                'snap_window_sec': 0, 'output_format': 'wav', 'renditions': '',
+                'pcm_cache': True, 'pcm_cache_mb': 64}
+    # 1回目でPCMをキャッシュし、2回目はメモリマップしたキャッシュから読み込む
+    split_engine.split_file(input_path, str(tmp_path / 'first'), settings, lambda *args: None, CancelToken())
+
+    loaded = []
+    original_load = pcm_cache.load
+
+    def load(*args):
+        audio = original_load(*args)
+        loaded.append(audio)
+        return audio
+
+    monkeypatch.setattr(pcm_cache, 'load', load)
+    if encode is not None:
+        monkeypatch.setattr(split_engine, 'encode_pcm', encode)
+        with pytest.raises((RuntimeError, Cancelled)):
+            split_engine.split_file(input_path, str(tmp_path / 'second'), settings, lambda *args: None, CancelToken())
+    else:
+        assert split_engine.split_file(input_path, str(tmp_path / 'second'), settings,
+                                       lambda *args: None, CancelToken()) == 2
+
+    assert len(loaded) == 1 and isinstance(loaded[0], pcm_cache.MappedAudio)
+    assert loaded[0].data.closed
+    assert loaded[0].file.closed
@@ -0,0 +1,34 @@
+"""
+同時出力の指定の解析のテスト
+"""
+
+import pytest
+
+import split_engine
+
+
+def test_parse_renditions():
+    """形式・ビットレート・サンプリングレート・チャンネル数を解析し、名前を出力フォルダ名にする"""
+    renditions = split_engine.parse_renditions(' MP3:320k , opus:64k:mono,, wav:16000Hz:mono ')
+    assert renditions == [
+        {'name': 'mp3_320k', 'format': 'mp3', 'bitrate': '320k', 'sample_rate': None, 'channels': None},
+        {'name': 'opus_64k_mono', 'format': 'opus', 'bitrate': '64k', 'sample_rate': None, 'channels': 1},
+        {'name': 'wav_16000hz_mono', 'format': 'wav', 'bitrate': None, 'sample_rate': 16000, 'channels': 1},
+    ]
+
+
+@pytest.mark.parametrize('text', ['', None, ' , '])
+def test_parse_renditions_empty(text):
+    """空欄は同時出力なし"""
+    assert split_engine.parse_renditions(text) == []
+
+
+@pytest.mark.parametrize('text, message', [
+    ('ogg:96k', '形式が不明'),
+    ('mp3:loud', '指定が正しくありません'),
+    ('mp3:12.5k', '指定が正しくありません'),
+])
+def test_parse_renditions_rejects_invalid(text, message):
+    """不明な形式・解釈できない指定はエラーにする"""
+    with pytest.raises(ValueError, match=message):
+        split_engine.parse_renditions(text)
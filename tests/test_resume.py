@@ -0,0 +1,57 @@
+"""
+出力マニフェストによる再開のテスト
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import split_engine
+from app_settings import load_settings
+from cancel_token import CancelToken
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="FFmpegが必要です")
+
+
+def make_tone(path, duration_sec):
+    """テスト用の正弦波の音声を作成"""
+    subprocess.run([
+        shutil.which('ffmpeg'), '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={duration_sec}",
+        path
+    ], check=True)
+
+
+def read_outputs(output_path):
+    """出力フォルダの音声ファイルの内容"""
+    return {name: open(os.path.join(output_path, name), 'rb').read()
+            for name in sorted(os.listdir(output_path)) if name.endswith('.wav')}
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('engine', ['stream', 'reencode', 'parallel'])
+@pytest.mark.parametrize('damaged', [['02'], ['02', '03']], ids=['middle', 'middle-and-last'])
+def test_rerun_rewrites_only_missing_parts(tmp_path, engine, damaged):
+    """同じ設定での再実行は、削除・書きかけのパートだけを先頭から通しで書き出したものと同じ内容で書き直す"""
+    input_path = str(tmp_path / 'input.wav')
+    output_path = str(tmp_path / 'output')
+    make_tone(input_path, 150)
+    settings = {**load_settings(), 'split_engine': engine, 'split_duration': 1, 'split_mode': 'duration',
+                'snap_window_sec': 0, 'output_format': 'wav', 'renditions': '', 'pcm_cache': False}
+
+    assert split_engine.split_file(input_path, output_path, settings, lambda *args: None, CancelToken()) == 3
+    expected = read_outputs(output_path)
+    assert len(expected) == 3
+
+    # 削除されたパートと書きかけのパートを作る
+    os.remove(os.path.join(output_path, 'input_part02.wav'))
+    if '03' in damaged:
+        with open(os.path.join(output_path, 'input_part03.wav'), 'wb') as f:
+            f.write(b'partial')
+    first_mtime = os.stat(os.path.join(output_path, 'input_part01.wav')).st_mtime_ns
+
+    assert split_engine.split_file(input_path, output_path, settings, lambda *args: None, CancelToken()) == 3
+    assert read_outputs(output_path) == expected
+    assert os.stat(os.path.join(output_path, 'input_part01.wav')).st_mtime_ns == first_mtime
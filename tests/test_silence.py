@@ -0,0 +1,62 @@
+"""
+無音検出モジュールのテスト
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import silence
+from cancel_token import CancelToken
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="FFmpegが必要です")
+
+
+def make_tone_with_pause(path, duration_sec, pause_start_sec, pause_end_sec):
+    """正弦波の途中に無音区間 (実際の録音の無音と同様に完全な無音ではない-60dB) を入れたテスト音声を作成"""
+    subprocess.run([
+        shutil.which('ffmpeg'), '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={duration_sec}",
+        '-af', f"volume=enable='between(t,{pause_start_sec},{pause_end_sec})':volume=0.001",
+        path
+    ], check=True)
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize('extension', ['.mp3', '.wav'])
+def test_quietest_point_lands_inside_pause(tmp_path, extension):
+    """シーク直後のデコーダの立ち上がりの無音ではなく、実際の無音区間に分割位置を合わせる"""
+    path = str(tmp_path / f"pause{extension}")
+    make_tone_with_pause(path, 70, 55, 56)
+    point = silence.quietest_point(path, 60000, 10000, 70000, CancelToken())
+    assert 55000 <= point <= 56000
+
+
+def test_smooth_valid_mode_drops_edges():
+    """mode='valid'では窓が収まらない両端を含めない"""
+    envelope = np.zeros(20, dtype=np.float32)
+    width = silence.SMOOTH_MS // silence.FRAME_MS
+    assert len(silence.smooth(envelope, mode='valid')) == len(envelope) - width + 1
+    assert len(silence.smooth(envelope)) == len(envelope)
+
+
+def test_silence_candidates_empty_envelope():
+    """デコード結果が空でも例外にせず、候補なしとして扱う"""
+    points, costs, floor_db = silence.silence_candidates(np.zeros(0, dtype=np.float32))
+    assert len(points) == 0
+    assert len(costs) == 0
+
+
+def test_fill_gaps_envelope_shorter_than_duration():
+    """推定の長さより短いエンベロープでは、デコードできた範囲だけから予備の候補を選ぶ"""
+    envelope = np.full(1000, -20, dtype=np.float32)
+    envelope[500] = -60
+    points, costs, floor_db = silence.silence_candidates(envelope)
+    # エンベロープは10秒分だが、推定の長さは60秒
+    points, costs = silence.fill_gaps(envelope, points, costs, floor_db, 60000, 2000)
+    assert len(points) > 0
+    assert points.max() < len(envelope) * silence.FRAME_MS
+    assert 5005 in points
@@ -0,0 +1,76 @@
+"""
+監視フォルダ常駐モジュールのテスト
+"""
+
+import os
+
+import watch_folder
+
+
+class RecordingExecutor:
+    """投入されたジョブを記録するだけのワーカープール"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append(args)
+
+
+def make_daemon(tmp_path):
+    """一括処理の並列数だけを設定した監視デーモン"""
+    watch_dir = tmp_path / 'watch'
+    watch_dir.mkdir()
+    daemon = watch_folder.WatchDaemon(str(watch_dir), str(tmp_path / 'output'), {'batch_jobs': 1})
+    daemon.executor = RecordingExecutor()
+    return daemon
+
+
+def write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_same_stem_gets_separate_output_dirs(tmp_path):
+    """拡張子だけが異なる入力は別の出力フォルダに書き出し、記録済みの出力フォルダを使い続ける"""
+    daemon = make_daemon(tmp_path)
+    mp3 = write_file(tmp_path / 'watch' / 'a.mp3', b'1')
+    wav = write_file(tmp_path / 'watch' / 'a.wav', b'2')
+    daemon.submit(mp3, daemon.file_signature(mp3))
+    daemon.submit(wav, daemon.file_signature(wav))
+    outputs = [output for _, output in daemon.executor.jobs]
+    assert outputs == [os.path.join(daemon.output_root, 'a'), os.path.join(daemon.output_root, 'a_2')]
+    assert daemon.state.assign_output(wav, daemon.output_root) == outputs[1]
+
+
+def test_in_flight_file_is_not_submitted_twice(tmp_path):
+    """待機中・処理中のファイルは再投入せず、内容が変わった場合だけ完了後に1回処理し直す"""
+    daemon = make_daemon(tmp_path)
+    path = write_file(tmp_path / 'watch' / 'a.mp3', b'1')
+    signature = daemon.file_signature(path)
+    daemon.submit(path, signature)
+    daemon.submit(path, signature)
+    assert len(daemon.executor.jobs) == 1
+
+    daemon.submit(path, (signature[0] + 1, signature[1]))
+    daemon.submit(path, (signature[0] + 2, signature[1]))
+    assert len(daemon.executor.jobs) == 1
+
+    # 処理が終わると、最後に検出した内容で1回だけ処理し直す
+    daemon.split_job = lambda path, output_path: None
+    daemon.run_job(*daemon.executor.jobs[0])
+    assert len(daemon.executor.jobs) == 2
+    assert daemon.state.get(path)['signature'] == [signature[0] + 2, signature[1]]
+
+
+def test_replaced_or_failed_file_is_reprocessed(tmp_path):
+    """停止中に置き換えられたファイルは、処理済み・エラーでも処理し直す"""
+    daemon = make_daemon(tmp_path)
+    path = write_file(tmp_path / 'watch' / 'a.mp3', b'1')
+    daemon.state.update(path, status='error', signature=list(daemon.file_signature(path)))
+    assert not daemon.changed_since_last_run(path)
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert daemon.changed_since_last_run(path)
@@ -0,0 +1,295 @@
+"""
+監視フォルダ常駐モジュール
+inotifyで書き込みが完了したファイルを検出し、分割エンジンで自動的に分割する
+"""
+
+import os
+import json
+import time
+import errno
+import ctypes
+import select
+import struct
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+import job_state
+import split_engine
+from cancel_token import CancelToken
+
+# inotifyのイベントマスク (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# 書き込み完了後、サイズと更新日時がこの秒数変化しなければ処理を開始する
+SETTLE_SECONDS = 2.0
+
+# ジョブ状態ファイル名 (監視フォルダ内に保存)
+STATE_FILENAME = '.audio-splitter-watch.json'
+
+
+class Inotify:
+    """libcのinotify APIをctypesで呼び出す最小限のラッパー"""
+
+    def __init__(self):
+        try:
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            self.libc.inotify_init1
+        except (OSError, AttributeError):
+            raise RuntimeError("inotifyはLinuxでのみ利用できます")
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path, mask):
+        """フォルダを監視対象に追加"""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read_events(self, timeout):
+        """イベントを (マスク, ファイル名) のリストで取得 (timeout秒待っても無ければ空)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = os.fsdecode(data[pos:pos + name_len].rstrip(b'\0'))
+            pos += name_len
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        """inotifyを閉じる"""
+        os.close(self.fd)
+
+
+class JobState:
+    """ジョブ状態をJSONファイルに保存し、異常終了後も未完了のジョブを再開できるようにする"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.jobs = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"ジョブ状態ファイルの読み込みに失敗したため新規作成します: {str(e)}")
+
+    def update(self, input_path, **fields):
+        """ジョブの状態を更新して保存"""
+        with self.lock:
+            job = self.jobs.setdefault(input_path, {})
+            job.update(fields, updated=time.time())
+            self._save()
+
+    def get(self, input_path):
+        """ジョブの状態を取得"""
+        with self.lock:
+            return dict(self.jobs.get(input_path, {}))
+
+    def assign_output(self, input_path, output_root):
+        """入力ファイルの出力フォルダを決める (記録済みならそのまま使い、同名の別ファイルとは連番で区別)"""
+        with self.lock:
+            output_path = self.jobs.get(input_path, {}).get('output')
+            if output_path and os.path.dirname(output_path) == output_root:
+                return output_path
+            used = {job.get('output') for path, job in self.jobs.items() if path != input_path}
+            stem = Path(input_path).stem
+            output_path = os.path.join(output_root, stem)
+            number = 1
+            while output_path in used:
+                number += 1
+                output_path = os.path.join(output_root, f"{stem}_{number}")
+            return output_path
+
+    def unfinished(self):
+        """未完了 (待機中・処理中に終了した) ジョブの一覧"""
+        with self.lock:
+            return [path for path, job in self.jobs.items() if job.get('status') in ('pending', 'running')]
+
+    def _save(self):
+        job_state.write_json_atomic(self.path, self.jobs)
+
+
+class WatchDaemon:
+    """監視フォルダに置かれた音声ファイルを検出し、ワーカープールで分割する"""
+
+    def __init__(self, watch_dir, output_root, settings, on_event=None):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.output_root = output_root
+        self.settings = settings
+        self.on_event = on_event or (lambda event, **fields: None)
+        self.state = JobState(os.path.join(self.watch_dir, STATE_FILENAME))
+        self.candidates = {}
+        self.cancel = CancelToken()
+        self.executor = None
+        # 待機中・処理中のファイル (同じファイルを同時に分割しない) と、処理中に内容が変わったため完了後に処理し直すファイル
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.reruns = {}
+
+    def is_target(self, path):
+        """分割対象の音声ファイルかどうか (隠しファイル・一時ファイルは除く)"""
+        name = os.path.basename(path)
+        return not name.startswith('.') and Path(name).suffix.lower() in batch.AUDIO_EXTENSIONS
+
+    def file_signature(self, path):
+        """ファイルのサイズと更新日時"""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def add_candidate(self, path):
+        """書き込み完了の候補として登録 (サイズが安定するまで待つ)"""
+        try:
+            self.candidates[path] = (self.file_signature(path), time.monotonic())
+        except FileNotFoundError:
+            self.candidates.pop(path, None)
+
+    def settled_candidates(self):
+        """一定時間サイズと更新日時が変化していない候補を取り出す"""
+        now = time.monotonic()
+        settled = []
+        for path, (signature, seen_at) in list(self.candidates.items()):
+            if now - seen_at < SETTLE_SECONDS:
+                continue
+            try:
+                current = self.file_signature(path)
+            except FileNotFoundError:
+                del self.candidates[path]
+                continue
+            if current != signature:
+                self.candidates[path] = (current, now)
+                continue
+            del self.candidates[path]
+            # 処理済み・エラーで内容が変わっていないファイルは再処理しない
+            job = self.state.get(path)
+            if job.get('status') in ('done', 'error') and job.get('signature') == list(current):
+                continue
+            settled.append((path, current))
+        return settled
+
+    def changed_since_last_run(self, path):
+        """記録が無いか、記録時から内容が変わった (停止中に置き換えられた) ファイルかどうか"""
+        job = self.state.get(path)
+        return not job or job.get('signature') != list(self.file_signature(path))
+
+    def submit(self, path, signature):
+        """ジョブを待機中として記録してワーカープールに投入 (待機中・処理中のファイルは完了後に1回だけ処理し直す)"""
+        signature = list(signature)
+        with self.lock:
+            if path in self.in_flight:
+                if self.in_flight[path] != signature:
+                    self.reruns[path] = signature
+                return
+            self.in_flight[path] = signature
+        output_path = self.state.assign_output(path, self.output_root)
+        self.state.update(path, status='pending', signature=signature, output=output_path, error=None)
+        self.on_event('queued', input=path, output=output_path)
+        self.executor.submit(self.run_job, path, output_path)
+
+    def run_job(self, path, output_path):
+        """1ファイルを分割してジョブ状態を更新"""
+        try:
+            self.split_job(path, output_path)
+        finally:
+            with self.lock:
+                del self.in_flight[path]
+                rerun = self.reruns.pop(path, None)
+            if rerun is not None and not self.cancel.cancelled:
+                logging.info(f"処理中に内容が変更されたため再処理します: {path}")
+                self.submit(path, rerun)
+
+    def split_job(self, path, output_path):
+        """1ファイルを分割 (結果はジョブ状態に記録する)"""
+        if self.cancel.cancelled:
+            return
+        self.state.update(path, status='running')
+        self.on_event('start', input=path, output=output_path)
+        job_cancel = CancelToken(self.cancel)
+        try:
+            parts = split_engine.split_file(
+                path, output_path, self.settings,
+                lambda progress, text: self.on_event('progress', input=path, percent=round(progress, 1), message=text),
+                job_cancel
+            )
+        except Exception as e:
+            logging.error(f"分割処理中にエラーが発生: {path}: {str(e)}", exc_info=True)
+            self.state.update(path, status='error', error=str(e))
+            self.on_event('error', input=path, message=str(e))
+            return
+        finally:
+            job_cancel.close()
+        if parts is None:
+            # 停止による中断は次回起動時に再処理する
+            self.state.update(path, status='pending')
+            return
+        self.state.update(path, status='done', parts=parts)
+        self.on_event('done', input=path, output=output_path, parts=parts)
+
+    def run(self):
+        """監視を開始 (stop()が呼ばれるまで戻らない)"""
+        inotify = Inotify()
+        inotify.add_watch(self.watch_dir, IN_CLOSE_WRITE | IN_MOVED_TO)
+        logging.info(f"監視を開始: {self.watch_dir} -> {self.output_root}")
+        self.on_event('watching', watch_dir=self.watch_dir, output=self.output_root)
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, self.settings['batch_jobs']))
+        try:
+            # 前回終了時に未完了だったジョブと、停止中に置かれた・置き換えられたファイルを再投入
+            for path in self.state.unfinished():
+                if os.path.isfile(path):
+                    logging.info(f"未完了のジョブを再開: {path}")
+                    self.submit(path, self.file_signature(path))
+            for entry in os.scandir(self.watch_dir):
+                if entry.is_file() and self.is_target(entry.path) and self.changed_since_last_run(entry.path):
+                    self.add_candidate(entry.path)
+
+            while not self.cancel.cancelled:
+                for mask, name in inotify.read_events(timeout=0.5):
+                    if mask & IN_Q_OVERFLOW:
+                        # イベントが溢れた場合はフォルダを走査し直す
+                        logging.warning("inotifyのイベントキューが溢れたためフォルダを再走査します")
+                        for entry in os.scandir(self.watch_dir):
+                            if entry.is_file() and self.is_target(entry.path):
+                                self.add_candidate(entry.path)
+                    elif mask & IN_IGNORED:
+                        raise RuntimeError(f"監視フォルダが削除されました: {self.watch_dir}")
+                    elif name:
+                        path = os.path.join(self.watch_dir, name)
+                        if self.is_target(path):
+                            self.add_candidate(path)
+                for path, signature in self.settled_candidates():
+                    self.submit(path, signature)
+        finally:
+            self.cancel.cancel()
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            inotify.close()
+            logging.info("監視を終了")
+
+    def stop(self):
+        """監視を停止 (処理中のジョブは中断され、次回起動時に再処理される)"""
+        self.cancel.cancel()